@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import pickle
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pipeline
+import build_knowledge_base
+from embedding_quantization import save_quantized_embeddings
+from encoders import selected_backend, entry_backend
+from metadata_generator import disambiguate
+import profiling
+from xlsx_reader import XLSX_EXTENSIONS
+
+# Corpus layout under the output directory:
+#   workbooks/<workbook>/      one pipeline output dir per workbook (meta_data.json, row_values.json, graph/, ...)
+#   parse_cache.pkl            formula parses shared by all workbooks
+#   definitions_cache.json     definitions shared by all workbooks
+#   corpus_meta_data.json      workbook -> meta_data, with each row's computed "value"
+#   corpus.json                workbook -> source file and row/table counts
+#   knowledge_layer/           one knowledge base for the corpus, entries tagged with their workbook
+WORKBOOK_EXTENSIONS = (".json",) + XLSX_EXTENSIONS
+
+# The last per-workbook stage; embeddings are built once for the whole corpus
+LAST_WORKBOOK_STAGE = "definitions"
+
+def discover_workbooks(input_dir):
+    """
+    Lists the workbook exports (.json) and .xlsx files in a directory.
+
+    Returns:
+        dict: workbook id (the file name without extension) -> path.
+    """
+    workbooks = {}
+    for file_name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, file_name)
+        if os.path.isfile(path) and file_name.lower().endswith(WORKBOOK_EXTENSIONS):
+            workbooks[disambiguate(os.path.splitext(file_name)[0], workbooks)] = path
+    return workbooks
+
+def corpus_paths(output_dir):
+    return {
+        "workbooks": os.path.join(output_dir, "workbooks"),
+        "parse_cache": os.path.join(output_dir, "parse_cache.pkl"),
+        "definitions_cache": os.path.join(output_dir, "definitions_cache.json"),
+        "meta_data": os.path.join(output_dir, "corpus_meta_data.json"),
+        "corpus": os.path.join(output_dir, "corpus.json"),
+        "knowledge_base": os.path.join(output_dir, "knowledge_layer", "knowledge_base.json"),
+    }
+
+def load_parse_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def load_definitions_cache(path):
+    """Loads the shared definitions as metadata_generator's (sheet, table, row) -> {"definition"} cache."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding='utf-8') as f:
+        return {(item["sheet"], item["table"], item["term"]): {"definition": item["definition"]}
+                for item in json.load(f)}
+
+def save_definitions_cache(cache, path):
+    items = [{"sheet": sheet, "table": table, "term": term, "definition": value["definition"]}
+             for (sheet, table, term), value in cache.items()]
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(items, f, indent=2)
+
+def harvest_definitions(meta_data, cache):
+    """Adds a workbook's definitions to the shared cache, so later workbooks reuse them."""
+    for sheet_name, sheet_data in meta_data.items():
+        for table_name, table_data in sheet_data.get("tables", {}).items():
+            for row_name, row_data in table_data.get("rows", {}).items():
+                if row_data.get("definition"):
+                    cache[(sheet_name, table_name, row_name)] = {"definition": row_data["definition"]}
+
+def add_row_values(meta_data, values):
+    """Copies the 'values' stage's computed row values into the rows of meta_data."""
+    for sheet_name, tables in values.items():
+        for table_name, rows in tables.items():
+            for row_name, value in rows.items():
+                row = meta_data.get(sheet_name, {}).get("tables", {}).get(table_name, {}).get("rows", {}).get(row_name)
+                if row is not None:
+                    row["value"] = value
+
+# --- Structural stages (parallel) ---
+# Each worker process loads the shared parse cache once and keeps it across
+# the workbooks it handles; new entries are sent back to be saved.
+
+_worker_parse_cache = None
+
+def _init_worker(parse_cache_path):
+    global _worker_parse_cache
+    _worker_parse_cache = load_parse_cache(parse_cache_path)
+
+def _run_structural(workbook, export_path, output_dir, force):
+    known = len(_worker_parse_cache)
+    started = time.perf_counter()
+    report = pipeline.run_pipeline(export_path, output_dir, force, until="values",
+                                   shared={"parse_cache": _worker_parse_cache})
+    # Dicts keep insertion order, so the entries this run added are at the end
+    new_entries = dict(islice(_worker_parse_cache.items(), known, None))
+    return workbook, report, new_entries, time.perf_counter() - started
+
+def run_batch(input_dir, output_dir, jobs=None, force=(), workbooks=None):
+    """
+    Ingests a directory of workbooks into one corpus.
+
+    The structural stages (load → values) run for several workbooks at once in
+    worker processes, sharing a formula parse cache. Definitions then run one
+    workbook at a time against a shared definitions cache, so a term that
+    appears in many models is sent to the AI once. Finally every workbook's
+    metadata is combined into corpus_meta_data.json and one knowledge base,
+    with embeddings shared between identical definitions.
+
+    Each workbook keeps its own pipeline cache under workbooks/<id>/, so
+    rerunning the batch only reprocesses workbooks that changed.
+
+    Args:
+        input_dir (str): Directory of workbook export JSONs and/or .xlsx files.
+        output_dir (str): Corpus output directory.
+        jobs (int): Worker processes for the structural stages (default: one per CPU).
+        force (iterable): Stage names to rerun for every workbook.
+        workbooks (iterable): Optional workbook ids to ingest; all by default.
+
+    Returns:
+        dict: workbook id -> list of {"stage", "status", "seconds"} records.
+    """
+    paths = corpus_paths(output_dir)
+    os.makedirs(paths["workbooks"], exist_ok=True)
+    sources = discover_workbooks(input_dir)
+    if workbooks is not None:
+        sources = {wb: path for wb, path in sources.items() if wb in set(workbooks)}
+    if not sources:
+        raise FileNotFoundError(f"No workbook exports or .xlsx files found in {input_dir}")
+    workbook_dirs = {wb: os.path.join(paths["workbooks"], wb) for wb in sources}
+    reports = {wb: [] for wb in sources}
+
+    print(f"Ingesting {len(sources)} workbooks from {input_dir}...")
+    with profiling.stage("structural stages"):
+        parse_cache = load_parse_cache(paths["parse_cache"])
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(paths["parse_cache"],)) as executor:
+            futures = [executor.submit(_run_structural, wb, os.path.abspath(path), workbook_dirs[wb], set(force))
+                       for wb, path in sources.items()]
+            for future in futures:
+                wb, report, new_entries, seconds = future.result()
+                reports[wb].extend(report)
+                parse_cache.update(new_entries)
+                profiling.count("workbooks processed")
+                profiling.count("new formula parses", len(new_entries))
+                print(f"  - {wb}: structure ready in {seconds:.1f}s")
+        with open(paths["parse_cache"], "wb") as f:
+            pickle.dump(parse_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    with profiling.stage("shared definitions"):
+        definitions_cache = load_definitions_cache(paths["definitions_cache"])
+        shared = {"definitions_cache": definitions_cache, "project_root": pipeline.PROJECT_ROOT}
+        corpus = {}
+        for wb, path in sources.items():
+            # The structural stages are cached by now, so this only runs 'definitions'
+            report = pipeline.run_pipeline(os.path.abspath(path), workbook_dirs[wb], set(force),
+                                           until=LAST_WORKBOOK_STAGE, shared=shared)
+            reports[wb].extend(record for record in report if record["stage"] == LAST_WORKBOOK_STAGE)
+            with open(pipeline.output_paths(workbook_dirs[wb])["meta_data"], "r", encoding='utf-8') as f:
+                corpus[wb] = json.load(f)
+            harvest_definitions(corpus[wb], definitions_cache)
+            with open(pipeline.output_paths(workbook_dirs[wb])["values"], "r", encoding='utf-8') as f:
+                add_row_values(corpus[wb], json.load(f))
+        save_definitions_cache(definitions_cache, paths["definitions_cache"])
+
+    with profiling.stage("corpus store"):
+        with open(paths["meta_data"], "w", encoding='utf-8') as f:
+            json.dump(corpus, f, indent=2)
+        summary = {wb: {"source": os.path.abspath(sources[wb]),
+                        "sheets": len(meta_data),
+                        "tables": sum(len(s.get("tables", {})) for s in meta_data.values()),
+                        "rows": sum(len(t.get("rows", {})) for s in meta_data.values()
+                                    for t in s.get("tables", {}).values())}
+                   for wb, meta_data in corpus.items()}
+        with open(paths["corpus"], "w", encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    with profiling.stage("corpus knowledge base"):
+        build_corpus_knowledge_base(corpus, paths["knowledge_base"])
+    return reports
+
+def build_corpus_knowledge_base(corpus, kb_path):
+    """
+    Builds one knowledge base for the whole corpus: the pipeline's entries plus
+    a "workbook" field. Embeddings are reused by definition text, from the
+    existing corpus knowledge base and across workbooks, so a definition shared
+    by many models is encoded once. Existing embeddings made with another
+    backend than the selected one are not reused.
+    """
+    existing, _ = build_knowledge_base.load_existing_knowledge_base(kb_path)
+    backend = selected_backend()
+    embeddings = {item["definition"]: item["embedding"] for item in existing
+                  if item.get("definition") and entry_backend(item) == backend}
+    embedding_model = None
+    entries = []
+    for wb, meta_data in corpus.items():
+        for sheet_name, sheet_data in meta_data.items():
+            for table_name, table_data in sheet_data.get("tables", {}).items():
+                for row_name, row_data in table_data.get("rows", {}).items():
+                    term = row_name.strip()
+                    definition = row_data.get("definition")
+                    if not term or not definition:
+                        continue
+                    if definition in embeddings:
+                        profiling.count("embedding cache hits")
+                    else:
+                        if embedding_model is None:
+                            embedding_model = build_knowledge_base.load_embedding_model(backend)
+                        embeddings[definition] = embedding_model.encode(definition).tolist()
+                        profiling.count("embeddings computed")
+                    entries.append({
+                        "workbook": wb,
+                        "term": term,
+                        "source_sheet": sheet_name,
+                        "source_table": table_name,
+                        "source_cell": row_data.get("source_cell"),
+                        "definition": definition,
+                        "embedding": embeddings[definition],
+                        "encoder": backend,
+                    })
+
+    os.makedirs(os.path.dirname(kb_path), exist_ok=True)
+    with open(kb_path, "w", encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+    if entries and build_knowledge_base.EMBEDDING_QUANTIZATION:
+        save_quantized_embeddings(os.path.dirname(kb_path), [item["embedding"] for item in entries],
+                                  build_knowledge_base.EMBEDDING_QUANTIZATION, encoder=backend)
+    return entries
+
+# --- Corpus queries ---
+
+def _number(value):
+    """A row's value as a float ('25%', '0.25', 0.25 -> 0.25), or None for text and formulas."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().replace(",", "")
+    try:
+        return float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    except ValueError:
+        return None
+
+def find_rows(corpus, term, value=None, tolerance=1e-9):
+    """
+    Finds rows across every workbook of a corpus by name and, optionally, value.
+
+        find_rows(corpus, "tax rate", value=0.25)   # which models use a 25% tax rate row?
+
+    Args:
+        corpus (dict): corpus_meta_data.json (workbook -> meta_data).
+        term (str): Case-insensitive regular expression matched against row names.
+        value (float): Only rows whose computed value (or, without one, constant
+            value) equals this.
+        tolerance (float): Absolute tolerance for the value comparison.
+
+    Returns:
+        list: {"workbook", "sheet", "table", "row", "source_cell", "value"} dicts.
+    """
+    pattern = re.compile(term, re.IGNORECASE)
+    matches = []
+    for wb, meta_data in corpus.items():
+        for sheet_name, sheet_data in meta_data.items():
+            for table_name, table_data in sheet_data.get("tables", {}).items():
+                for row_name, row_data in table_data.get("rows", {}).items():
+                    if not pattern.search(row_name):
+                        continue
+                    if value is not None:
+                        number = _number(row_data.get("value", row_data.get("R1C1")))
+                        if number is None or abs(number - value) > tolerance:
+                            continue
+                    matches.append({"workbook": wb, "sheet": sheet_name, "table": table_name, "row": row_name,
+                                    "source_cell": row_data.get("source_cell"),
+                                    "value": row_data.get("value", row_data.get("R1C1"))})
+    return matches
+
+def load_corpus(output_dir):
+    with open(corpus_paths(output_dir)["meta_data"], "r", encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of workbooks into one corpus, or query it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Run the pipeline for every workbook in a directory")
+    ingest.add_argument("input_dir", help="Directory of workbook export JSONs and/or .xlsx files")
+    ingest.add_argument("--output-dir", default=os.path.join(pipeline.PROJECT_ROOT, "corpus"))
+    ingest.add_argument("--jobs", type=int, help="Worker processes for the structural stages (default: one per CPU)")
+    ingest.add_argument("--workbooks", nargs="*", help="Only ingest these workbook ids")
+    ingest.add_argument("--force", nargs="*", default=[], choices=[s["name"] for s in pipeline.STAGES],
+                        help="Stages to rerun for every workbook")
+    ingest.add_argument("--profile-report", help="Write a JSON run report here")
+
+    rows = subparsers.add_parser("rows", help="Find rows by name (and value) across the corpus")
+    rows.add_argument("term", help="Regular expression matched against row names, e.g. 'tax rate'")
+    rows.add_argument("--value", help="Only rows with this computed value, e.g. 0.25 or 25%%")
+    rows.add_argument("--output-dir", default=os.path.join(pipeline.PROJECT_ROOT, "corpus"))
+    args = parser.parse_args()
+
+    if args.command == "rows":
+        value = _number(args.value) if args.value is not None else None
+        matches = find_rows(load_corpus(args.output_dir), args.term, value)
+        for match in matches:
+            print(f"{match['workbook']}: {match['sheet']} / {match['table']} / {match['row']} "
+                  f"({match['source_cell']}) = {match['value']}")
+        print(f"{len(matches)} rows in {len({m['workbook'] for m in matches})} workbooks")
+        return
+
+    profiling.reset()
+    reports = run_batch(args.input_dir, args.output_dir, args.jobs, args.force, args.workbooks)
+    print(f"\n{'Workbook':<30}{'Ran':>6}{'Cached':>8}{'Time':>12}")
+    for wb, report in reports.items():
+        ran = sum(1 for r in report if r["status"] == "ran")
+        seconds = sum(r["seconds"] for r in report)
+        print(f"{wb:<30}{ran:>6}{len(report) - ran:>8}{seconds * 1000:>10.1f}ms")
+    profiling.print_report()
+    if args.profile_report:
+        print(f"Run report saved to {profiling.save_report(args.profile_report)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from encoders import BACKENDS, load_encoder
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_KB_PATH = os.path.join(PROJECT_ROOT, "knowledge_layer", "knowledge_base.json")
+
+def load_definitions(kb_path):
+    with open(kb_path, "r", encoding='utf-8') as f:
+        return [item["definition"] for item in json.load(f) if item.get("definition")]
+
+def benchmark_backend(backend, sentences, batch_size=32, repeats=3):
+    """
+    Loads one encoder backend and encodes the sentences.
+
+    Returns:
+        tuple: ({"backend", "load_seconds", "sentences_per_second", "query_ms"},
+        embeddings of the sentences)
+    """
+    started = time.perf_counter()
+    encoder = load_encoder(backend)
+    load_seconds = time.perf_counter() - started
+
+    encoder.encode(sentences[:batch_size], batch_size=batch_size)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        embeddings = encoder.encode(sentences, batch_size=batch_size)
+        timings.append(time.perf_counter() - started)
+
+    # Search encodes one query at a time
+    query_timings = []
+    for sentence in sentences[:50]:
+        started = time.perf_counter()
+        encoder.encode(sentence)
+        query_timings.append(time.perf_counter() - started)
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "sentences_per_second": len(sentences) / min(timings),
+        "query_ms": statistics.median(query_timings) * 1000,
+    }, np.asarray(embeddings, dtype=np.float32)
+
+def agreement(embeddings, reference, k=5):
+    """
+    Cosine similarity between each embedding and its reference (PyTorch)
+    embedding, and how often the top-k nearest definitions agree when every
+    definition is used as a query.
+    """
+    def normalize(x):
+        return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+    embeddings, reference = normalize(embeddings), normalize(reference)
+    cosines = np.sum(embeddings * reference, axis=1)
+    k = min(k, len(reference) - 1)
+    top = np.argsort(-(embeddings @ embeddings.T), axis=1)[:, 1:k + 1]
+    top_reference = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top, top_reference)]) if k > 0 else 1.0
+    return {"cosine_min": float(cosines.min()), "cosine_mean": float(cosines.mean()), f"top{k}_overlap": float(overlap)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the embedding backends on the knowledge base definitions.")
+    parser.add_argument("--kb", default=DEFAULT_KB_PATH, help="Knowledge base whose definitions are encoded")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per backend; the best one is kept")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sentences = load_definitions(args.kb)
+    print(f"Encoding {len(sentences)} definitions from {args.kb}\n")
+
+    # PyTorch is the reference the other backends are compared against
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results, reference = [], None
+    print(f"{'Backend':<12}{'Load':>9}{'Sent/s':>10}{'Query':>10}{'Cos min':>10}{'Cos mean':>10}{'Top-5':>8}")
+    for backend in backends:
+        result, embeddings = benchmark_backend(backend, sentences, args.batch_size, args.repeats)
+        if reference is None:
+            reference = embeddings
+        result.update(agreement(embeddings, reference))
+        results.append(result)
+        overlap = next(value for key, value in result.items() if key.endswith("_overlap"))
+        print(f"{backend:<12}{result['load_seconds']:>8.2f}s{result['sentences_per_second']:>10.0f}"
+              f"{result['query_ms']:>8.1f}ms{result['cosine_min']:>10.4f}{result['cosine_mean']:>10.4f}{overlap:>8.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import time
+
+from compact_store import save_compact, CompactReader
+from extraction import scan_workbook, TableExtractor, DependencyExtractor
+from pipeline import load_script
+from synthetic_workbook import generate_workbook
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+
+def best_time(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def synthetic_documents(**config):
+    """Builds meta_data and its dependency graph for a synthetic workbook."""
+    tables = TableExtractor()
+    meta_data = scan_workbook(generate_workbook(**config), [tables, DependencyExtractor(tables)])["tables"]
+    for sheet_data in meta_data.values():
+        for table_data in sheet_data["tables"].values():
+            for row in table_data["rows"].values():
+                row.pop("_term", None)
+    graph_module = load_script(os.path.join("script folder", "graph", "graph.py"), "graph")
+    return meta_data, graph_module.build_dependency_graph(meta_data)
+
+def benchmark_document(label, obj, kind, tmp):
+    json_path = os.path.join(tmp, f"{label}.json")
+    with open(json_path, "w", encoding='utf-8') as f:
+        json.dump(obj, f, indent=2)
+    packed_path = os.path.join(tmp, f"{label}.mdb")
+    save_compact(obj, packed_path, kind)
+
+    def load_json():
+        with open(json_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_packed():
+        with CompactReader(packed_path) as reader:
+            return reader.load()
+
+    assert load_packed() == obj
+
+    with CompactReader(packed_path) as reader:
+        sheet = reader.sheets()[len(reader.sheets()) // 2]
+        table = reader.tables(sheet)[0] if kind == "meta_data" else None
+    part_label = "one table" if table else "one sheet"
+
+    def load_part():
+        with CompactReader(packed_path) as reader:
+            return reader.load_table(sheet, table) if table else reader.load_sheet(sheet)
+
+    print(f"\n{label}")
+    print(f"  {'size':<22}{'json (indent=2)':>18}{'compact':>14}")
+    print(f"  {'bytes':<22}{os.path.getsize(json_path):>18,}{os.path.getsize(packed_path):>14,}")
+    print(f"  {'full load':<22}{best_time(load_json) * 1000:>16.2f}ms{best_time(load_packed) * 1000:>12.2f}ms")
+    print(f"  {part_label + ' (json: full)':<22}{best_time(load_json) * 1000:>16.2f}ms{best_time(load_part) * 1000:>12.2f}ms")
+
+def main():
+    """Compares size and load time of the JSON and compact formats for meta_data and the graph."""
+    with open(os.path.join(PROJECT_ROOT, "meta_data.json"), "r", encoding='utf-8') as f:
+        meta_data = json.load(f)
+    graph_module = load_script(os.path.join("script folder", "graph", "graph.py"), "graph")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        benchmark_document("sample meta_data", meta_data, "meta_data", tmp)
+        benchmark_document("sample graph", graph_module.build_dependency_graph(meta_data), "graph", tmp)
+
+        large_meta, large_graph = synthetic_documents(sheets=20, tables_per_sheet=8, rows_per_table=15, timeline_columns=120)
+        benchmark_document("synthetic meta_data (20 sheets)", large_meta, "meta_data", tmp)
+        benchmark_document("synthetic graph (20 sheets)", large_graph, "graph", tmp)
+
+if __name__ == "__main__":
+    main()
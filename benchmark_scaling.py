@@ -0,0 +1,180 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import metadata_generator
+from formulas_extraction import get_absolute_references
+from formula_engine import compile_workbook, evaluate
+from formula_audit import audit_workbook
+from pipeline import load_script
+from synthetic_workbook import generate_workbook, estimate_cells
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_RESULTS_PATH = os.path.join(PROJECT_ROOT, "benchmark_results", "scaling.json")
+
+# Workbook sizes, from roughly the sample workbook up to our largest models
+SIZES = {
+    "small": {"sheets": 10, "tables_per_sheet": 3, "rows_per_table": 4, "timeline_columns": 40},
+    "medium": {"sheets": 10, "tables_per_sheet": 6, "rows_per_table": 12, "timeline_columns": 60},
+    "large": {"sheets": 20, "tables_per_sheet": 8, "rows_per_table": 15, "timeline_columns": 120},
+    "xlarge": {"sheets": 25, "tables_per_sheet": 10, "rows_per_table": 20, "timeline_columns": 100},
+}
+
+# A run is flagged when a stage is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.25
+
+def parse_all_formulas(data):
+    """Runs formulas_extraction over every formula cell in the workbook, not only the value column."""
+    count = 0
+    for ws in data["worksheets"]:
+        for cell in ws["cells"].values():
+            formula = cell.get("formulaR1C1")
+            if isinstance(formula, str) and formula.startswith("="):
+                count += len(get_absolute_references(formula, cell["rowIndex"], cell["columnIndex"]))
+    return count
+
+def build_stages(export_path):
+    """
+    Returns the benchmarked stages as (name, fn) pairs. Each fn takes the
+    previous stages' outputs (a dict) and returns its own output.
+    """
+    graph_module = load_script(os.path.join("script folder", "graph", "graph.py"), "graph")
+
+    def json_load(_):
+        with open(export_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+
+    return [
+        ("json load", json_load),
+        ("table detection", lambda out: metadata_generator.extract_tables(out["json load"])),
+        ("row dependencies", lambda out: metadata_generator.add_dependencies(out["table detection"])),
+        ("formula parsing (all cells)", lambda out: parse_all_formulas(out["json load"])),
+        ("dependency graph", lambda out: graph_module.build_dependency_graph(out["row dependencies"])),
+        ("formula audit", lambda out: audit_workbook(out["json load"])),
+        ("engine compile", lambda out: compile_workbook(out["json load"])),
+        ("engine evaluate", lambda out: evaluate(out["engine compile"])),
+    ]
+
+def measure(fn, outputs, repeats):
+    """
+    Times a stage (best of `repeats`) and then measures its peak Python memory
+    in one extra run under tracemalloc, so tracing overhead never skews the time.
+
+    Returns:
+        tuple: (output, seconds, peak MB)
+    """
+    best = None
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        output = fn(outputs)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    fn(outputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return output, best, peak / 2**20
+
+def run_size(size_name, config, repeats, skip=()):
+    """Generates one workbook size and benchmarks every stage on it."""
+    data = generate_workbook(**config)
+    cells = sum(len(ws["cells"]) for ws in data["worksheets"])
+    formulas = sum(1 for ws in data["worksheets"] for cell in ws["cells"].values()
+                   if isinstance(cell["formulaR1C1"], str) and cell["formulaR1C1"].startswith("="))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, f"{size_name}.json")
+        with open(export_path, "w", encoding='utf-8') as f:
+            json.dump(data, f)
+        del data
+
+        results, outputs = [], {}
+        for stage, fn in build_stages(export_path):
+            record = {"size": size_name, "cells": cells, "formulas": formulas, "stage": stage}
+            if stage in skip:
+                record["error"] = "skipped"
+            else:
+                try:
+                    outputs[stage], record["seconds"], record["peak_mb"] = measure(fn, outputs, repeats)
+                except Exception as e:  # record the failure and keep benchmarking the other stages
+                    record["error"] = f"{type(e).__name__}: {e}"[:200]
+            results.append(record)
+            status = record.get("error") or f"{record['seconds'] * 1000:>10.1f} ms {record['peak_mb']:>9.1f} MB"
+            print(f"  {stage:<30}{status}")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_with_baseline(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints each stage's time relative to a previous results file.
+
+    Returns:
+        list: (size, stage, ratio) for every stage slower than the threshold.
+    """
+    with open(baseline_path, "r", encoding='utf-8') as f:
+        baseline = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for record in results:
+        before = baseline.get((record["size"], record["stage"]))
+        if not before or "seconds" not in before or "seconds" not in record:
+            continue
+        ratio = record["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = "  <-- slower" if ratio > threshold else ""
+        print(f"  {record['size']:<8}{record['stage']:<30}{ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append((record["size"], record["stage"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each processing stage on synthetic workbooks of increasing size.")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"], choices=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage; the best one is kept")
+    parser.add_argument("--skip", nargs="*", default=[], help="Stages to skip (e.g. 'dependency graph')")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="Where to store the results JSON")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    all_results = []
+    for size_name in args.sizes:
+        config = SIZES[size_name]
+        print(f"\n{size_name}: ~{estimate_cells(**config):,} cells {config}")
+        all_results.extend(run_size(size_name, config, args.repeats, set(args.skip)))
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sizes": {name: SIZES[name] for name in args.sizes},
+        "results": all_results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(all_results, args.baseline)
+        if regressions:
+            print(f"⚠️  {len(regressions)} stage(s) slower than {REGRESSION_THRESHOLD}x the baseline")
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
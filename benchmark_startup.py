@@ -0,0 +1,56 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that make startup slow when imported eagerly
+HEAVY_MODULES = ["torch", "sentence_transformers", "onnxruntime", "xai_sdk", "sklearn", "pandas"]
+
+# name -> Python snippet run in a fresh interpreter
+COMMANDS = {
+    "import metadata_generator": "import metadata_generator",
+    "import build_knowledge_base": "import build_knowledge_base",
+    "import formula_engine": "import formula_engine",
+    "parse sample workbook": (
+        "import formula_engine as fe; "
+        "fe.compile_workbook(fe.load_workbook_export('jsonformatter.JSON'))"
+    ),
+}
+
+def time_command(snippet, project_root, repeats=5):
+    """
+    Runs a snippet in a fresh interpreter several times.
+
+    Returns:
+        tuple: (median wall time in seconds, heavy modules the snippet imported),
+        or (None, error message) if the snippet failed.
+    """
+    probe = (
+        "import sys, time; _t = time.perf_counter(); "
+        f"{snippet}; "
+        "print(time.perf_counter() - _t); "
+        f"print('heavy:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    timings, heavy = [], ""
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", probe], cwd=project_root, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+        lines = result.stdout.splitlines()
+        timings.append(float(lines[-2]))
+        heavy = lines[-1][len("heavy:"):]
+    return statistics.median(timings), heavy
+
+def main():
+    """Measures how long common entry points take to start in a fresh interpreter."""
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    print(f"{'Command':<30}{'Median':>10}  Heavy modules loaded")
+    for name, snippet in COMMANDS.items():
+        seconds, heavy = time_command(snippet, project_root)
+        if seconds is None:
+            print(f"{name:<30}{'error':>10}  {heavy}")
+        else:
+            print(f"{name:<30}{seconds * 1000:>8.0f}ms  {heavy or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 import os
 import json
-from dotenv import load_dotenv
-from xai_sdk import Client
-from xai_sdk.chat import user, system
-from sentence_transformers import SentenceTransformer
+from embedding_quantization import save_quantized_embeddings
+from encoders import selected_backend, entry_backend
+from knowledge_log import EntryLog, compact
+from profiling import stage, count, timed, configure_from_env, print_report, save_report
+
+# Quantized copies of the embeddings saved next to the knowledge base for fast search.
+# Any of "int8" (4x smaller) and "binary" (32x smaller); set to () to skip.
+EMBEDDING_QUANTIZATION = ("int8", "binary")
 
 def get_ai_client(project_root):
     """Initializes and returns the X.AI client."""
+    # Imported here so fully cached runs never load the SDK
+    from dotenv import load_dotenv
+    from xai_sdk import Client
+
     dotenv_path = os.path.join(project_root, '.env')
  
     if not os.path.exists(dotenv_path):
@@ -21,6 +29,7 @@ def get_ai_client(project_root):
 
 def get_definition(client, term, table_name, sheet_name):
     """Gets a definition for a financial term from the AI."""
+    from xai_sdk.chat import user, system
     try:
         chat = client.chat.create(model="grok-3-mini")
         chat.append(system(
@@ -38,6 +47,19 @@ def get_definition(client, term, table_name, sheet_name):
         print(f"An error occurred while getting definition for '{term}': {e}")
         return None
 
+def load_embedding_model(backend=None):
+    """
+    Loads the all-MiniLM-L6-v2 encoder. The backend ("torch", "onnx" or
+    "onnx-int8") defaults to $EMBEDDING_BACKEND, else PyTorch; see encoders.py.
+    """
+    from encoders import load_encoder
+
+    # This will download the model on first run.
+    print("Loading embedding model...")
+    model = load_encoder(backend)
+    print(f"Embedding model loaded ({model.backend}).")
+    return model
+
 def load_existing_knowledge_base(path):
     """Loads an existing knowledge base and creates a lookup cache."""
     if not os.path.exists(path):
@@ -59,6 +81,7 @@ def main():
     found in the project's metadata.
     """
     print("Building knowledge layer...")
+    report_path = configure_from_env()
 
     # --- 1. Setup ---
     # Define paths based on the script's location.
@@ -69,73 +92,137 @@ def main():
     os.makedirs(output_dir, exist_ok=True) # Ensure the output directory exists
     output_path = os.path.join(output_dir, "knowledge_base.json")
 
-    # Initialize AI client
-    ai_client = get_ai_client(project_root)
+    # The AI client and embedding model are created on the first term that is
+    # not cached, so reruns with nothing new skip loading torch entirely.
+    ai_client = None
+    embedding_model = None
 
-    # Load sentence transformer model for embeddings
-    # This will download the model on first run.
-    print("Loading embedding model...")
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    print("Embedding model loaded.")
- 
     # Load metadata
     if not os.path.exists(meta_data_path):
         raise FileNotFoundError(f"Metadata file not found. Please generate it first: {meta_data_path}")
     
-    with open(meta_data_path, 'r', encoding='utf-8') as f:
+    with stage("metadata load"), open(meta_data_path, 'r', encoding='utf-8') as f:
         meta_data = json.load(f)
 
     # Load existing knowledge base to implement caching
     print(f"Checking for existing knowledge base at {output_path}...")
-    knowledge_base, kb_cache = load_existing_knowledge_base(output_path)
+    with stage("knowledge base load"):
+        knowledge_base, kb_cache = load_existing_knowledge_base(output_path)
     print(f"Found {len(knowledge_base)} existing entries.")
+    existing_count = len(knowledge_base)
+
+    # New entries are streamed to an append-only log as they are generated, so
+    # an interrupted run resumes from its last checkpoint instead of starting over
+    log = EntryLog(output_dir)
+    with stage("entry log replay"):
+        for entry in log.entries():
+            cache_key = (entry['term'], entry['source_table'], entry['source_sheet'])
+            if cache_key not in kb_cache:
+                knowledge_base.append(entry)
+                kb_cache[cache_key] = entry
+    if len(knowledge_base) > existing_count:
+        print(f"Resumed {len(knowledge_base) - existing_count} entries from an interrupted run.")
+
+    # Embeddings from different backends are not comparable, so entries made
+    # with another backend than the selected one are re-embedded (their
+    # definitions are kept; no API calls are made)
+    backend = selected_backend()
+    stale = [item for item in knowledge_base if entry_backend(item) != backend]
+    if stale:
+        print(f"Re-embedding {len(stale)} entries made with another backend than '{backend}'...")
+        with stage("embedding model load"):
+            embedding_model = load_embedding_model(backend)
+        with stage("embedding"), timed("embedding encode"):
+            embeddings = embedding_model.encode([item['definition'] for item in stale])
+        for item, embedding in zip(stale, embeddings):
+            item['embedding'] = embedding.tolist()
+            item['encoder'] = backend
+        count("embeddings computed", len(stale))
 
     # --- 2. Process Metadata and Build Knowledge Base ---
     print("Processing metadata and generating definitions...")
     # NOTE: This can be slow and costly as it makes an API call for each term.
     # Caching is now implemented to avoid re-processing existing terms.
-    for sheet_name, sheet_data in meta_data.items():
-        for table_name, table_data in sheet_data.get("tables", {}).items():
-            for row_name, row_data in table_data.get("rows", {}).items():
-                term = row_name.strip()
-                if not term:
-                    continue
-
-                # Check if this specific term combination is already in our cache
-                cache_key = (term, table_name, sheet_name)
-                if cache_key in kb_cache:
-                    # print(f"  - Skipping (cached): '{term}' from sheet: '{sheet_name}', table: '{table_name}'")
-                    continue
-
-                print(f"  - Processing (new): '{term}' from sheet: '{sheet_name}', table: '{table_name}'")
-
-                # Get definition from AI
-                definition = get_definition(ai_client, term, table_name, sheet_name)
-                if not definition:
-                    print(f"    -> Failed to get definition for '{term}'. Skipping.")
-                    continue
+    try:
+        for sheet_name, sheet_data in meta_data.items():
+            for table_name, table_data in sheet_data.get("tables", {}).items():
+                for row_name, row_data in table_data.get("rows", {}).items():
+                    term = row_name.strip()
+                    if not term:
+                        continue
+
+                    # Check if this specific term combination is already in our cache
+                    cache_key = (term, table_name, sheet_name)
+                    if cache_key in kb_cache:
+                        # print(f"  - Skipping (cached): '{term}' from sheet: '{sheet_name}', table: '{table_name}'")
+                        count("cache hits")
+                        continue
+                    count("cache misses")
+
+                    print(f"  - Processing (new): '{term}' from sheet: '{sheet_name}', table: '{table_name}'")
+
+                    if ai_client is None:
+                        with stage("AI client init"):
+                            ai_client = get_ai_client(project_root)
+
+                    # Get definition from AI
+                    with stage("definitions"), timed("definition API call"):
+                        definition = get_definition(ai_client, term, table_name, sheet_name)
+                    count("API calls")
+                    if not definition:
+                        print(f"    -> Failed to get definition for '{term}'. Skipping.")
+                        continue
                 
-                print(f"    -> Definition: {definition[:50]}...")
-
-                # Generate embedding for the definition
-                embedding = embedding_model.encode(definition).tolist()
-
-                knowledge_base.append({
-                    "term": term,
-                    "source_sheet": sheet_name,
-                    "source_table": table_name,
-                    "source_cell": row_data.get("cell_name"),
-                    "definition": definition,
-                    "embedding": embedding
-                })
+                    print(f"    -> Definition: {definition[:50]}...")
+
+                    if embedding_model is None:
+                        with stage("embedding model load"):
+                            embedding_model = load_embedding_model(backend)
+
+                    # Generate embedding for the definition
+                    with stage("embedding"), timed("embedding encode"):
+                        embedding = embedding_model.encode(definition).tolist()
+                    count("embeddings computed")
+
+                    knowledge_base.append({
+                        "term": term,
+                        "source_sheet": sheet_name,
+                        "source_table": table_name,
+                        "source_cell": row_data.get("source_cell") or row_data.get("cell_name"),
+                        "definition": definition,
+                        "embedding": embedding,
+                        "encoder": backend
+                    })
+                    log.append(knowledge_base[-1])
+    finally:
+        # Commits whatever was appended, also on Ctrl+C or an unexpected error
+        log.checkpoint()
 
     # --- 3. Save Knowledge Base ---
-    print(f"\nSaving knowledge base to {output_path}...")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(knowledge_base, f, indent=2)
-
-    print("✅ Knowledge layer construction complete.")
-    print(f"Output saved to {output_path}")
+    index_path = os.path.join(output_dir, "embeddings_index.json")
+    if len(knowledge_base) == existing_count and not stale and os.path.exists(output_path) \
+            and (not EMBEDDING_QUANTIZATION or os.path.exists(index_path)):
+        print("\nNo new terms; knowledge base is already up to date.")
+        log.clear()
+    else:
+        # Compaction: the logged entries are folded into knowledge_base.json,
+        # which is replaced atomically, and the log is removed
+        print(f"\nSaving knowledge base to {output_path}...")
+        with stage("save"):
+            compact(knowledge_base, output_path, log)
+
+        if EMBEDDING_QUANTIZATION and knowledge_base:
+            print(f"Saving quantized embeddings ({', '.join(EMBEDDING_QUANTIZATION)})...")
+            with stage("quantized index save"):
+                save_quantized_embeddings(output_dir, [item['embedding'] for item in knowledge_base],
+                                          EMBEDDING_QUANTIZATION, encoder=backend)
+
+        print("✅ Knowledge layer construction complete.")
+        print(f"Output saved to {output_path}")
+
+    print_report()
+    if report_path:
+        print(f"Run report saved to {save_report(report_path)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+import json
+import os
+import struct
+import tempfile
+import zlib
+from contextlib import contextmanager
+
+# Compact, indexed alternative to the indent=2 JSON files.
+#
+# Layout: MAGIC, a little-endian uint32 header length, the JSON header, then
+# the chunks. Every chunk is zlib-compressed compact JSON. The header maps each
+# sheet (and, for metadata, each table) to its chunk's (offset, length) in the
+# body, so one sheet or table can be read without decoding the rest.
+MAGIC = b"XLMETA1\n"
+COMPRESSION_LEVEL = 6
+COMPACT_EXTENSION = ".mdb"
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Opens a temporary file next to path and renames it over path once the
+    block succeeds, so readers see either the old file or the complete new
+    one, never a half-written file. On error the temporary file is removed.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def compact_path(json_path):
+    """meta_data.json -> meta_data.mdb"""
+    return os.path.splitext(json_path)[0] + COMPACT_EXTENSION
+
+def _encode(obj):
+    return zlib.compress(json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), COMPRESSION_LEVEL)
+
+def _decode(raw):
+    return json.loads(zlib.decompress(raw).decode("utf-8"))
+
+def _pack_table(table):
+    """
+    Stores each row's dependencies as [sheet index, row, col] triples against a
+    per-table sheet list, which is smaller and faster to decode than dicts.
+    """
+    sheets, sheet_ids = [], {}
+    rows = {}
+    for row_name, row in table.get("rows", {}).items():
+        row = dict(row)
+        if "dependencies" in row:
+            packed = []
+            for dep in row["dependencies"]:
+                if dep["sheet"] not in sheet_ids:
+                    sheet_ids[dep["sheet"]] = len(sheets)
+                    sheets.append(dep["sheet"])
+                packed.append([sheet_ids[dep["sheet"]], dep["row"], dep["col"]])
+            row["dependencies"] = packed
+        rows[row_name] = row
+    return {**table, "rows": rows, "_sheets": sheets}
+
+def _unpack_table(packed):
+    sheets = packed.pop("_sheets")
+    for row in packed["rows"].values():
+        if "dependencies" in row:
+            row["dependencies"] = [{"sheet": sheets[s], "row": r, "col": c} for s, r, c in row["dependencies"]]
+    return packed
+
+def _graph_sheet(cell_name):
+    return cell_name.rpartition("!")[0]
+
+def save_compact(obj, path, kind):
+    """
+    Writes metadata or a dependency graph in the compact format.
+
+    Args:
+        obj (dict): meta_data (sheet -> {"tables": {...}}) or a graph ({"sheet!A1": [...]}).
+        path (str): Output file, usually compact_path() of the JSON file.
+        kind (str): "meta_data" or "graph".
+
+    Returns:
+        int: The file size in bytes.
+    """
+    chunks, index = [], {}
+    offset = 0
+
+    def add(obj):
+        nonlocal offset
+        raw = _encode(obj)
+        chunks.append(raw)
+        entry = [offset, len(raw)]
+        offset += len(raw)
+        return entry
+
+    if kind == "meta_data":
+        for sheet_name, sheet_data in obj.items():
+            tables = sheet_data.get("tables", {})
+            extra = {key: value for key, value in sheet_data.items() if key != "tables"}
+            index[sheet_name] = {
+                "extra": add(extra) if extra else None,
+                "tables": {table_name: add(_pack_table(table)) for table_name, table in tables.items()},
+            }
+    elif kind == "graph":
+        by_sheet = {}
+        for cell, deps in obj.items():
+            by_sheet.setdefault(_graph_sheet(cell), {})[cell] = deps
+        index = {sheet: add(cells) for sheet, cells in by_sheet.items()}
+    else:
+        raise ValueError(f"Unknown compact file kind: {kind}")
+
+    header = json.dumps({"kind": kind, "index": index}, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    with atomic_write(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for raw in chunks:
+            f.write(raw)
+    return os.path.getsize(path)
+
+class CompactReader:
+    """
+    Reads a compact file lazily: the header is parsed on open and each chunk
+    is only read and decompressed when asked for.
+
+        with CompactReader("meta_data.mdb") as reader:
+            table = reader.load_table("operation", "TRAFFIC & REVENUE ASSUMPTIONS")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a compact metadata file")
+        (header_length,) = struct.unpack("<I", self._file.read(4))
+        header = json.loads(self._file.read(header_length).decode("utf-8"))
+        self.kind = header["kind"]
+        self.index = header["index"]
+        self._body = len(MAGIC) + 4 + header_length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _read(self, entry):
+        offset, length = entry
+        self._file.seek(self._body + offset)
+        return _decode(self._file.read(length))
+
+    def sheets(self):
+        return list(self.index)
+
+    def tables(self, sheet):
+        if self.kind != "meta_data":
+            raise ValueError("Only metadata files have tables")
+        return list(self.index[sheet]["tables"])
+
+    def load_table(self, sheet, table):
+        """One table of one sheet, in the same shape as in meta_data.json."""
+        return _unpack_table(self._read(self.index[sheet]["tables"][table]))
+
+    def load_sheet(self, sheet):
+        """One sheet: {"tables": {...}} for metadata, {"sheet!A1": [...]} for a graph."""
+        if self.kind == "graph":
+            return self._read(self.index[sheet])
+        entry = self.index[sheet]
+        sheet_data = self._read(entry["extra"]) if entry["extra"] else {}
+        sheet_data["tables"] = {table: self.load_table(sheet, table) for table in entry["tables"]}
+        return sheet_data
+
+    def load(self):
+        """The whole document, equal to what the JSON file holds."""
+        if self.kind == "graph":
+            graph = {}
+            for sheet in self.index:
+                graph.update(self.load_sheet(sheet))
+            return graph
+        return {sheet: self.load_sheet(sheet) for sheet in self.index}
+
+def save_document(obj, json_path, kind, formats=("json",)):
+    """
+    Writes a metadata or graph document in each requested format: "json" to
+    json_path (indent=2, as before), "compact" next to it with the .mdb
+    extension and, for metadata, "sqlite" as an indexed metadata_store
+    database (.sqlite). Each file is replaced atomically.
+
+    Returns:
+        list: The paths written.
+    """
+    written = []
+    if "json" in formats:
+        with atomic_write(json_path) as f:
+            json.dump(obj, f, indent=2)
+        written.append(json_path)
+    if "compact" in formats:
+        save_compact(obj, compact_path(json_path), kind)
+        written.append(compact_path(json_path))
+    if "sqlite" in formats and kind == "meta_data":
+        from metadata_store import save_sqlite, sqlite_path
+        save_sqlite(obj, sqlite_path(json_path))
+        written.append(sqlite_path(json_path))
+    return written
@@ -0,0 +1,142 @@
+import os
+import json
+import numpy as np
+
+from compact_store import atomic_write
+
+# Number of set bits for every possible byte value, used for Hamming distances
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+QUANTIZATION_METHODS = ("int8", "binary")
+
+def quantize_int8(embeddings):
+    """
+    Scalar-quantizes float embeddings to int8 with a per-dimension range.
+
+    Returns:
+        tuple: (codes, offset, scale) where embeddings ~= offset + scale * (codes + 128).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    offset = embeddings.min(axis=0)
+    scale = (embeddings.max(axis=0) - offset) / 255.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint((embeddings - offset) / scale) - 128, -128, 127).astype(np.int8)
+    return codes, offset.astype(np.float32), scale.astype(np.float32)
+
+def quantize_binary(embeddings):
+    """Packs the sign of every dimension into bits (1 bit per dimension)."""
+    return np.packbits(np.asarray(embeddings) > 0, axis=1)
+
+def int8_scores(query, codes, offset, scale, block_size=65536):
+    """Approximate dot products between a float query and int8 codes."""
+    query = np.asarray(query, dtype=np.float32)
+    scaled_query = query * scale
+    constant = float(query @ offset) + 128.0 * float(scaled_query.sum())
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    # Convert codes to float in blocks so the full float matrix is never held in memory
+    for start in range(0, codes.shape[0], block_size):
+        block = codes[start:start + block_size].astype(np.float32)
+        scores[start:start + block_size] = block @ scaled_query + constant
+    return scores
+
+def hamming_distances(query_bits, codes):
+    """Hamming distance between one packed query and every packed code."""
+    return POPCOUNT_TABLE[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+def save_quantized_embeddings(output_dir, embeddings, methods=QUANTIZATION_METHODS, encoder=None):
+    """
+    Saves the embeddings next to the knowledge base for quantized search.
+
+    Writes `embeddings_float32.npy` (memory-mapped at search time, used only to
+    re-rank candidates) and one file per requested method: `embeddings_int8.npz`
+    and/or `embeddings_binary.npy`. Files are replaced atomically, so a search
+    that already memory-mapped the old float32 file keeps reading it intact.
+    encoder, the backend that made the embeddings, is recorded in
+    `embeddings_index.json` so queries can be encoded the same way.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    with atomic_write(os.path.join(output_dir, "embeddings_float32.npy"), "wb") as f:
+        np.save(f, embeddings)
+
+    if "int8" in methods:
+        codes, offset, scale = quantize_int8(embeddings)
+        with atomic_write(os.path.join(output_dir, "embeddings_int8.npz"), "wb") as f:
+            np.savez(f, codes=codes, offset=offset, scale=scale)
+    if "binary" in methods:
+        with atomic_write(os.path.join(output_dir, "embeddings_binary.npy"), "wb") as f:
+            np.save(f, quantize_binary(embeddings))
+
+    with atomic_write(os.path.join(output_dir, "embeddings_index.json")) as f:
+        json.dump({"count": int(embeddings.shape[0]), "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+                   "methods": list(methods), "encoder": encoder}, f, indent=2)
+
+def load_quantized_index(output_dir, method="int8"):
+    """
+    Loads a quantized index saved by save_quantized_embeddings.
+
+    The quantized codes are loaded into memory; the float32 embeddings are only
+    memory-mapped, so re-ranking reads just the candidate rows from disk.
+
+    Returns:
+        dict: The index, or None if it has not been built. Its "encoder" is
+        the backend recorded at save time (None for older indexes).
+    """
+    float_path = os.path.join(output_dir, "embeddings_float32.npy")
+    if not os.path.exists(float_path):
+        return None
+
+    encoder = None
+    meta_path = os.path.join(output_dir, "embeddings_index.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding='utf-8') as f:
+            encoder = json.load(f).get("encoder")
+    index = {"method": method, "full": np.load(float_path, mmap_mode="r"), "encoder": encoder}
+    if method == "int8":
+        path = os.path.join(output_dir, "embeddings_int8.npz")
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            index.update(codes=data["codes"], offset=data["offset"], scale=data["scale"])
+    elif method == "binary":
+        path = os.path.join(output_dir, "embeddings_binary.npy")
+        if not os.path.exists(path):
+            return None
+        index["codes"] = np.load(path)
+    else:
+        raise ValueError(f"Unknown quantization method '{method}'. Expected one of {QUANTIZATION_METHODS}.")
+    return index
+
+def quantized_search(query_embedding, index, top_k=5, rescore_multiplier=4):
+    """
+    Two-stage search: a fast pass over the quantized codes selects
+    top_k * rescore_multiplier candidates, which are then re-ranked with the
+    full-precision embeddings.
+
+    Returns:
+        tuple: (indices, scores) of the top_k results, best first. Scores are
+        full-precision cosine similarities.
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    codes = index["codes"]
+    n = codes.shape[0]
+    n_candidates = min(n, top_k * rescore_multiplier)
+    if n_candidates == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    if index["method"] == "int8":
+        approx = int8_scores(query, codes, index["offset"], index["scale"])
+        candidates = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+    else:
+        distances = hamming_distances(quantize_binary(query[None, :])[0], codes)
+        candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+
+    # Re-rank: read only the candidate rows from the memory-mapped float32 file
+    candidates.sort()
+    full = np.asarray(index["full"][candidates], dtype=np.float32)
+    norms = np.linalg.norm(full, axis=1)
+    norms[norms == 0] = 1.0
+    exact = (full @ query) / norms
+
+    order = np.argsort(-exact)[:top_k]
+    return candidates[order], exact[order]
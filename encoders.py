@@ -0,0 +1,136 @@
+import json
+import os
+
+import numpy as np
+
+# The sentence embedding model every knowledge base entry and query is encoded with
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256
+
+# "torch" runs the model through sentence_transformers (PyTorch); "onnx" runs
+# an exported ONNX graph with onnxruntime and "onnx-int8" the same graph with
+# dynamically quantized int8 weights. The ONNX backends only need onnxruntime
+# and tokenizers once exported (export_onnx, which needs PyTorch once).
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+
+# Where export_onnx writes the ONNX graphs and the tokenizer
+ONNX_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "models", "all-MiniLM-L6-v2")
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+class TorchEncoder:
+    """all-MiniLM-L6-v2 through sentence_transformers on the CPU."""
+
+    backend = "torch"
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME, device="cpu")
+
+    def encode(self, sentences, batch_size=32):
+        return self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=True)
+
+class OnnxEncoder:
+    """
+    all-MiniLM-L6-v2 as an ONNX graph run by onnxruntime. Reproduces the
+    sentence_transformers pipeline of the model: tokenize (truncated to
+    MAX_SEQ_LENGTH), run the transformer, mean-pool the token embeddings over
+    the attention mask and L2-normalize.
+    """
+
+    def __init__(self, backend="onnx-int8", model_dir=ONNX_DIR, threads=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.backend = backend
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, ONNX_FILES[backend]), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def encode(self, sentences, batch_size=32):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        embeddings = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + batch_size])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            tokens = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            embeddings.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        embeddings = np.concatenate(embeddings).astype(np.float32) if embeddings else np.zeros((0, 384), np.float32)
+        return embeddings[0] if single else embeddings
+
+def export_onnx(model_dir=ONNX_DIR, quantize=True):
+    """
+    Exports the model's transformer to model_dir/model.onnx (dynamic batch and
+    sequence axes), saves its tokenizer.json and, with quantize, writes
+    model.int8.onnx with onnxruntime's dynamic int8 quantization of the
+    weights. Needs PyTorch and transformers; run once per machine or copy
+    the folder.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    tokenizer.save_pretrained(model_dir)
+    model = AutoModel.from_pretrained(MODEL_NAME).eval()
+
+    sample = tokenizer(["A sample sentence to trace the graph."], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {"batch": 0, "sequence": 1}
+    onnx_path = os.path.join(model_dir, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in names), onnx_path,
+                          input_names=names, output_names=["token_embeddings"],
+                          dynamic_axes={**{name: dynamic for name in names}, "token_embeddings": dynamic},
+                          opset_version=14)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, os.path.join(model_dir, ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+
+    with open(os.path.join(model_dir, "export.json"), "w", encoding='utf-8') as f:
+        json.dump({"model": MODEL_NAME, "max_seq_length": MAX_SEQ_LENGTH, "quantized": quantize}, f, indent=2)
+    return model_dir
+
+def selected_backend(backend=None):
+    """The backend to use: the given one, else $EMBEDDING_BACKEND, else DEFAULT_BACKEND."""
+    backend = backend or os.getenv("EMBEDDING_BACKEND") or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'; choose one of {', '.join(BACKENDS)}")
+    return backend
+
+def entry_backend(entry):
+    """
+    The backend a knowledge base entry's embedding was made with. Entries
+    written before the backend was recorded were made with PyTorch.
+    """
+    return entry.get("encoder") or DEFAULT_BACKEND
+
+def load_encoder(backend=None, model_dir=ONNX_DIR):
+    """
+    Loads the sentence encoder for a backend (see selected_backend). Every
+    backend has encode(str) -> 1-D float32 array and encode(list) -> 2-D
+    array of normalized embeddings. The ONNX graphs are exported on first
+    use if model_dir does not have them yet.
+    """
+    backend = selected_backend(backend)
+    if backend == "torch":
+        return TorchEncoder()
+    if not os.path.exists(os.path.join(model_dir, ONNX_FILES[backend])):
+        print(f"Exporting {MODEL_NAME} to ONNX in {model_dir} (first use)...")
+        export_onnx(model_dir, quantize=backend == "onnx-int8")
+    return OnnxEncoder(backend, model_dir)
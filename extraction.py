@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from metadata_generator import table_header_name, build_sheet_tables, add_sheet_dependencies
+from profiling import stage, count
+from xlsx_reader import load_workbook_source
+
+class Extractor(ABC):
+    """
+    Base class for extractors fed by scan_workbook. Subclasses override the
+    hooks they need and must implement result(); an extractor that does not
+    override cell() is never called per cell.
+    """
+    name = None
+
+    def start_sheet(self, sheet):
+        pass
+
+    def cell(self, sheet, cell):
+        pass
+
+    def end_sheet(self, sheet):
+        pass
+
+    @abstractmethod
+    def result(self):
+        """What scan_workbook returns under the extractor's name."""
+
+def _is_label(value):
+    return isinstance(value, str) and not value.startswith("=")
+
+class SheetListExtractor(Extractor):
+    """The workbook's sheet names, in order (sheet_names.py)."""
+    name = "sheets"
+
+    def __init__(self):
+        self.sheets = []
+
+    def start_sheet(self, sheet):
+        self.sheets.append(sheet)
+
+    def result(self):
+        return self.sheets
+
+class RowNameExtractor(Extractor):
+    """Non-formula text in column B, by sheet; sheets without any are left out (raw_name.py)."""
+    name = "row_names"
+
+    def __init__(self, column=1):
+        self.column = column
+        self.names = {}
+
+    def cell(self, sheet, cell):
+        if cell.get("columnIndex") == self.column and _is_label(cell.get("formulaR1C1")):
+            self.names.setdefault(sheet, []).append(cell["formulaR1C1"])
+
+    def result(self):
+        return self.names
+
+class FormattedLabelExtractor(Extractor):
+    """
+    Non-formula text in cells with a given font and background colour, from a
+    minimum column per sheet onwards (formula_extract.py).
+    """
+    name = "labels"
+
+    def __init__(self, font_color="#000000", background_color="#FFFFFF", min_column_per_sheet=None):
+        self.font_color = font_color
+        self.background_color = background_color
+        self.min_column_per_sheet = min_column_per_sheet or {"default": 0}
+        self.labels = {}
+
+    def start_sheet(self, sheet):
+        self.labels[sheet] = []
+        self.min_col = self.min_column_per_sheet.get(sheet, self.min_column_per_sheet.get("default", 0))
+
+    def cell(self, sheet, cell):
+        fmt = cell.get("format", {})
+        if (fmt.get("font", {}).get("color") == self.font_color and
+                fmt.get("backgroundColor") == self.background_color and
+                cell.get("columnIndex", -1) >= self.min_col and
+                _is_label(cell.get("formulaR1C1"))):
+            self.labels[sheet].append(cell["formulaR1C1"])
+
+    def result(self):
+        return self.labels
+
+class TableExtractor(Extractor):
+    """
+    Tables and their named rows, as in meta_data.json (metadata_generator.py).
+    Rows keep the internal '_term' key that add_definitions consumes.
+    """
+    name = "tables"
+
+    def __init__(self):
+        self.sheets = {}
+
+    def start_sheet(self, sheet):
+        self.cell_map = {}
+        self.row_cols = defaultdict(set)
+        self.header_positions = []
+        self.max_row = 0
+
+    def cell(self, sheet, cell):
+        r = cell.get("rowIndex")
+        c = cell.get("columnIndex")
+        if r is None or c is None:
+            return
+        self.cell_map[(r, c)] = cell
+        self.row_cols[r].add(c)
+        if r > self.max_row:
+            self.max_row = r
+        name = table_header_name(cell)
+        if name:
+            self.header_positions.append((r, c, name))
+
+    def end_sheet(self, sheet):
+        tables = build_sheet_tables(sheet, self.cell_map, self.row_cols, self.max_row, self.header_positions)
+        self.sheets[sheet] = {"tables": tables}
+        self.cell_map = self.row_cols = None
+
+    def result(self):
+        return self.sheets
+
+class DependencyExtractor(Extractor):
+    """
+    Adds each table row's formula references as 'dependencies'. Runs at the end
+    of every sheet on the tables the given TableExtractor just built, so it
+    must come after it in the extractor list.
+    """
+    name = "dependencies"
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def end_sheet(self, sheet):
+        add_sheet_dependencies(sheet, self.tables.sheets[sheet]["tables"])
+
+    def result(self):
+        return self.tables.sheets
+
+def default_extractors():
+    """One of each extractor, in a valid order."""
+    tables = TableExtractor()
+    return [SheetListExtractor(), RowNameExtractor(), FormattedLabelExtractor(), tables, DependencyExtractor(tables)]
+
+def scan_workbook(data, extractors):
+    """
+    Walks every cell of a workbook export once, feeding each cell to every
+    extractor, so adding an output never adds another pass over the cells.
+
+    Args:
+        data (dict): Workbook export ({"worksheets": [{"name", "cells"}]}).
+        extractors (list): Extractor instances, called in list order.
+
+    Returns:
+        dict: extractor name -> its result.
+    """
+    # Only extractors that override cell() are called for every cell
+    cell_hooks = [ex.cell for ex in extractors if type(ex).cell is not Extractor.cell]
+
+    with stage("cell scan"):
+        for ws in data.get("worksheets", []):
+            sheet = ws.get("name")
+            if not sheet:
+                continue
+            for ex in extractors:
+                ex.start_sheet(sheet)
+            cells = ws.get("cells", {})
+            if cell_hooks:
+                count("cells scanned", len(cells))
+                for cell in cells.values():
+                    for hook in cell_hooks:
+                        hook(sheet, cell)
+            for ex in extractors:
+                ex.end_sheet(sheet)
+
+    return {ex.name: ex.result() for ex in extractors}
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract sheet names, row names, labels, tables and dependencies in one pass.")
+    parser.add_argument("export", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "jsonformatter.JSON"))
+    parser.add_argument("--output-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction"))
+    args = parser.parse_args()
+
+    data = load_workbook_source(args.export, streaming=True)
+
+    results = scan_workbook(data, default_extractors())
+    # The tables are annotated in place by the dependency extractor; write them once
+    results.pop("tables")
+    for sheet_data in results["dependencies"].values():
+        for table_data in sheet_data["tables"].values():
+            for row in table_data["rows"].values():
+                row.pop("_term", None)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, result in results.items():
+        output_path = os.path.join(args.output_dir, f"{name}.json")
+        with open(output_path, "w", encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"✅ {name} saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from compact_store import atomic_write
+from metadata_generator import a1_to_coords, r1c1_to_a1
+from profiling import stage, count
+
+# Rows are audited per segment of adjacent filled cells. Segments shorter than
+# this (a total column, a single input) have no run to break.
+MIN_SEGMENT_CELLS = 3
+
+# Formula id given to numbers typed into a row
+CONSTANT = -1
+
+AUDIT_FILE = "formula_audit.json"
+
+def _cell_arrays(worksheet, formula_ids):
+    """
+    (rows, cols, ids) arrays of a sheet's formula and number cells. Identical
+    R1C1 formula texts share an id from formula_ids; numbers get CONSTANT.
+    Text and blank cells are left out, so they end a segment.
+    """
+    rows, cols, ids = [], [], []
+    for cell in worksheet.get("cells", {}).values():
+        r, c, value = cell.get("rowIndex"), cell.get("columnIndex"), cell.get("formulaR1C1")
+        if r is None or c is None:
+            continue
+        if isinstance(value, str) and value.startswith("="):
+            ids.append(formula_ids.setdefault(value, len(formula_ids)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            ids.append(CONSTANT)
+        else:
+            continue
+        rows.append(r)
+        cols.append(c)
+    return (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(ids, dtype=np.int64))
+
+def audit_cells(rows, cols, ids, min_segment=MIN_SEGMENT_CELLS):
+    """
+    Finds the runs of cells whose formula differs from the rest of their row.
+
+    Cells are sorted by (row, column) and split into segments of adjacent
+    cells and, within those, runs of one formula id, with array operations
+    only. Each segment's expected formula is its most common one (ties go to
+    the lower id); every other run in a segment of at least min_segment cells
+    where the expected formula fills two or more cells is reported.
+
+    Returns:
+        list: (row, first col, last col, id, expected id, kind) tuples, 0-based,
+        where kind is "first" or "last" for a run at either end of the segment
+        (the first or last period differs) and "break" for one inside it.
+    """
+    if not len(ids):
+        return []
+    order = np.lexsort((cols, rows))
+    rows, cols, ids = rows[order], cols[order], ids[order]
+    n = len(ids)
+
+    new_segment = np.ones(n, dtype=bool)
+    new_segment[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1] + 1)
+    segment = np.cumsum(new_segment) - 1
+    segment_starts = np.flatnonzero(new_segment)
+    segment_ends = np.append(segment_starts[1:], n) - 1
+
+    new_run = new_segment.copy()
+    new_run[1:] |= ids[1:] != ids[:-1]
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], n) - 1
+    run_segment = segment[run_starts]
+
+    # Expected formula per segment: count each (segment, formula) pair, order
+    # by segment, then most cells, then id, and keep the first pair of each segment
+    is_formula = ids != CONSTANT
+    pairs, counts = np.unique(np.stack([segment[is_formula], ids[is_formula]], axis=1), axis=0, return_counts=True)
+    best = np.lexsort((pairs[:, 1], -counts, pairs[:, 0]))
+    first = best[np.flatnonzero(np.diff(pairs[best, 0], prepend=-1))]
+    expected = np.full(len(segment_starts), CONSTANT)
+    expected_cells = np.zeros(len(segment_starts), dtype=np.int64)
+    expected[pairs[first, 0]] = pairs[first, 1]
+    expected_cells[pairs[first, 0]] = counts[first]
+
+    audited = (segment_ends - segment_starts + 1 >= min_segment) & (expected_cells >= 2)
+    flagged = np.flatnonzero(audited[run_segment] & (ids[run_starts] != expected[run_segment]))
+
+    findings = []
+    for k in flagged:
+        start, end, seg = run_starts[k], run_ends[k], run_segment[k]
+        if start == segment_starts[seg]:
+            kind = "first"
+        elif end == segment_ends[seg]:
+            kind = "last"
+        else:
+            kind = "break"
+        findings.append((int(rows[start]), int(cols[start]), int(cols[end]), int(ids[start]), int(expected[seg]), kind))
+    return findings
+
+def _row_labels(tables):
+    """(sheet, 0-based row) -> (table, term) of every named row in the tables or meta_data dict."""
+    labels = {}
+    for sheet_name, sheet in (tables or {}).items():
+        for table_name, table in sheet.get("tables", {}).items():
+            for row_name, row in table.get("rows", {}).items():
+                if row.get("source_cell"):
+                    labels.setdefault((sheet_name, a1_to_coords(row["source_cell"])[0]), (table_name, row_name))
+    return labels
+
+def audit_workbook(data, tables=None, min_segment=MIN_SEGMENT_CELLS):
+    """
+    Audits every sheet of a workbook export for inconsistent formulas along
+    its rows, using the R1C1 texts as they are (copied formulas have the same
+    text in every period column).
+
+    Args:
+        data (dict): The workbook export.
+        tables (dict): Optional tables or meta_data, to label findings with
+            the table and row name they belong to.
+
+    Returns:
+        list: {"sheet", "table", "term", "cells", "kind", "formula",
+        "expected", "run_length"} per finding, in sheet and row order. cells
+        is an A1 range, formula is None for typed-in numbers ("hardcoded").
+    """
+    labels = _row_labels(tables)
+    findings = []
+    with stage("formula audit"):
+        for ws in data.get("worksheets", []):
+            sheet_name = ws.get("name")
+            if not sheet_name:
+                continue
+            formula_ids = {}
+            rows, cols, ids = _cell_arrays(ws, formula_ids)
+            count("audited cells", len(ids))
+            texts = list(formula_ids)
+            for r, c_lo, c_hi, fid, expected, kind in audit_cells(rows, cols, ids, min_segment):
+                table, term = labels.get((sheet_name, r), (None, None))
+                cells = r1c1_to_a1(r + 1, c_lo + 1)
+                if c_hi > c_lo:
+                    cells += ":" + r1c1_to_a1(r + 1, c_hi + 1)
+                findings.append({
+                    "sheet": sheet_name, "table": table, "term": term, "cells": cells,
+                    "kind": "hardcoded" if fid == CONSTANT else kind,
+                    "formula": None if fid == CONSTANT else texts[fid],
+                    "expected": texts[expected],
+                    "run_length": c_hi - c_lo + 1,
+                })
+    count("formula audit findings", len(findings))
+    return findings
+
+def group_findings(findings):
+    """sheet -> table -> findings, with rows outside every named row under None."""
+    grouped = defaultdict(lambda: defaultdict(list))
+    for finding in findings:
+        grouped[finding["sheet"]][finding["table"]].append(finding)
+    return grouped
+
+def save_audit(findings, path):
+    with atomic_write(path) as f:
+        json.dump(findings, f, indent=2)
+
+def main():
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Report formulas that differ from the rest of their row.")
+    parser.add_argument("export", nargs="?", default=os.path.join(project_root, "jsonformatter.JSON"),
+                        help="Workbook export JSON or .xlsx file")
+    parser.add_argument("--meta-data", default=os.path.join(project_root, "meta_data.json"),
+                        help="meta_data.json used to name the tables and rows of findings")
+    parser.add_argument("--output", help="Also write the findings to this JSON file")
+    parser.add_argument("--min-segment", type=int, default=MIN_SEGMENT_CELLS,
+                        help="Shortest run of adjacent cells that is audited")
+    args = parser.parse_args()
+
+    from xlsx_reader import load_workbook_source
+    data = load_workbook_source(args.export)
+    meta_data = None
+    if os.path.exists(args.meta_data):
+        with open(args.meta_data, "r", encoding='utf-8') as f:
+            meta_data = json.load(f)
+
+    started = time.perf_counter()
+    findings = audit_workbook(data, meta_data, args.min_segment)
+    print(f"Audited {os.path.basename(args.export)} in {(time.perf_counter() - started) * 1000:.1f} ms: "
+          f"{len(findings)} inconsistent run(s)")
+    for sheet_name, by_table in group_findings(findings).items():
+        print(f"\n{sheet_name}")
+        for table_name, table_findings in by_table.items():
+            print(f"  {table_name or '(no table)'}")
+            for finding in table_findings:
+                label = f" {finding['term']}" if finding["term"] else ""
+                print(f"    {finding['cells']:<12} {finding['kind']:<10}{label}: "
+                      f"{finding['formula'] or 'typed-in number'} (row uses {finding['expected']})")
+
+    if args.output:
+        save_audit(findings, args.output)
+        print(f"\n✅ Findings saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
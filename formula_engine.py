@@ -0,0 +1,1197 @@
+import argparse
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import numpy as np
+
+from range_index import RangeIndex
+
+# Excel stores dates as days since this epoch (including its 1900 leap-year bug)
+EXCEL_EPOCH = np.datetime64('1899-12-30', 'D')
+
+# Defaults for solving circular references by fixed-point iteration. A cycle
+# has converged when no cell moves by more than TOLERANCE (relative to its
+# size once it is above 1). With DAMPING d, each iteration keeps d of the old
+# value: x = (1 - d) * x_new + d * x_old.
+TOLERANCE = 1e-9
+MAX_ITERATIONS = 100
+DAMPING = 0.0
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<ref>(?:(?P<sheet>'(?:[^']|'')+'|[A-Za-z_][\w\.]*)!)?R(?P<row>\[-?\d+\]|\d+)?C(?P<col>\[-?\d+\]|\d+)?)(?![\w(])
+  | (?P<bool>TRUE|FALSE)(?![\w(])
+  | (?P<func>[A-Za-z][\w\.]*)(?=\()
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%:,()@])
+""", re.VERBOSE)
+
+COMPARISON_OPS = {"=", "<>", "<", ">", "<=", ">="}
+
+def col_num_to_letter(col: int) -> str:
+    """Convert column number (1-based) to Excel-style letters."""
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def a1_to_coords(a1_ref: str):
+    """Converts an A1-style reference (e.g. "F13") to a 0-indexed (row, col) tuple."""
+    match = re.match(r"([A-Z]+)([0-9]+)$", a1_ref.upper())
+    if not match:
+        raise ValueError(f"Invalid cell reference: '{a1_ref}'")
+    col_str, row_str = match.groups()
+    col_idx = 0
+    for char in col_str:
+        col_idx = col_idx * 26 + (ord(char) - ord('A') + 1)
+    return int(row_str) - 1, col_idx - 1
+
+# --- Parsing ---
+
+def tokenize(formula):
+    """Splits an R1C1 formula (without the leading '=') into (kind, value) tokens."""
+    tokens = []
+    pos = 0
+    while pos < len(formula):
+        match = TOKEN_PATTERN.match(formula, pos)
+        if not match:
+            raise ValueError(f"Unexpected character {formula[pos]!r} in formula '={formula}'")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "ws":
+            continue
+        if kind in ("sheet", "row", "col"):
+            kind = "ref"
+        if kind == "ref":
+            sheet = match.group("sheet")
+            if sheet and sheet.startswith("'"):
+                sheet = sheet[1:-1].replace("''", "'")
+            tokens.append(("ref", (sheet, _ref_part(match.group("row")), _ref_part(match.group("col")))))
+        elif kind == "string":
+            tokens.append(("string", match.group()[1:-1].replace('""', '"')))
+        elif kind == "number":
+            tokens.append(("number", float(match.group())))
+        elif kind == "bool":
+            tokens.append(("number", 1.0 if match.group() == "TRUE" else 0.0))
+        elif kind == "func":
+            tokens.append(("func", match.group().upper()))
+        else:
+            tokens.append(("op", match.group()))
+    return tokens
+
+def _ref_part(text):
+    """Parses the row or column part of an R1C1 reference into (value, is_relative)."""
+    if text is None:
+        return (0, True)
+    if text.startswith("["):
+        return (int(text[1:-1]), True)
+    return (int(text) - 1, False)  # absolute parts are stored 0-based
+
+def parse_formula(formula):
+    """
+    Parses an R1C1 formula string into a tuple-based syntax tree.
+
+    Nodes are ("num", value), ("str", text), ("ref", sheet, row_part, col_part),
+    ("range", sheet, row_part, col_part, row_part2, col_part2), ("neg", node),
+    ("pct", node), ("bin", op, left, right) and ("func", name, [args]).
+    Row/column parts are (value, is_relative) pairs; sheet is None for the
+    formula's own sheet.
+    """
+    text = formula[1:] if formula.startswith("=") else formula
+    tokens = tokenize(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take(expected=None):
+        nonlocal pos
+        token = peek()
+        if expected is not None and token != ("op", expected):
+            raise ValueError(f"Expected '{expected}' in formula '{formula}'")
+        pos += 1
+        return token
+
+    def binary(next_level, ops):
+        def parse():
+            node = next_level()
+            while peek()[0] == "op" and peek()[1] in ops:
+                op = take()[1]
+                node = ("bin", op, node, next_level())
+            return node
+        return parse
+
+    def unary():
+        kind, value = peek()
+        if kind == "op" and value in ("-", "+", "@"):
+            take()
+            operand = unary()
+            return ("neg", operand) if value == "-" else operand
+        node = primary()
+        while peek() == ("op", "%"):
+            take()
+            node = ("pct", node)
+        return node
+
+    def primary():
+        kind, value = take()
+        if kind == "number":
+            return ("num", value)
+        if kind == "string":
+            return ("str", value)
+        if kind == "ref":
+            sheet, row_part, col_part = value
+            if peek() == ("op", ":"):
+                take()
+                end_kind, end_value = take()
+                if end_kind != "ref":
+                    raise ValueError(f"Expected a reference after ':' in formula '{formula}'")
+                return ("range", sheet, row_part, col_part, end_value[1], end_value[2])
+            return ("ref", sheet, row_part, col_part)
+        if kind == "func":
+            take("(")
+            args = []
+            if peek() != ("op", ")"):
+                while True:
+                    # Empty arguments (e.g. "IF(x,,1)") count as zero
+                    args.append(("num", 0.0) if peek() in (("op", ","), ("op", ")")) else expression())
+                    if peek() != ("op", ","):
+                        break
+                    take()
+            take(")")
+            return ("func", value, args)
+        if (kind, value) == ("op", "("):
+            node = expression()
+            take(")")
+            return node
+        raise ValueError(f"Unexpected token {value!r} in formula '{formula}'")
+
+    power = binary(unary, {"^"})
+    multiplicative = binary(power, {"*", "/"})
+    additive = binary(multiplicative, {"+", "-"})
+    concatenation = binary(additive, {"&"})
+    expression = binary(concatenation, COMPARISON_OPS)
+
+    node = expression()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected trailing tokens in formula '{formula}'")
+    return node
+
+def collect_references(node, sheet):
+    """
+    Yields every reference in a syntax tree as
+    (sheet, row_part, col_part, row_part2, col_part2); single cells repeat their parts.
+    """
+    kind = node[0]
+    if kind == "ref":
+        yield (node[1] or sheet, node[2], node[3], node[2], node[3])
+    elif kind == "range":
+        yield (node[1] or sheet, node[2], node[3], node[4], node[5])
+    elif kind in ("neg", "pct"):
+        yield from collect_references(node[1], sheet)
+    elif kind == "bin":
+        yield from collect_references(node[2], sheet)
+        yield from collect_references(node[3], sheet)
+    elif kind == "func":
+        for arg in node[2]:
+            yield from collect_references(arg, sheet)
+
+def _resolve(part, base):
+    """Turns a (value, is_relative) part into an absolute 0-based index."""
+    value, relative = part
+    return base + value if relative else value
+
+def reference_span(ref, row, c0, n):
+    """
+    Returns (sheet, first_row, last_row, first_col, last_col) covering every
+    cell a reference reads when evaluated for columns c0 .. c0 + n - 1 of a row.
+    """
+    sheet, row_part, col_part, row_part2, col_part2 = ref
+    r1, r2 = _resolve(row_part, row), _resolve(row_part2, row)
+    cols = [_resolve(col_part, c0), _resolve(col_part, c0 + n - 1),
+            _resolve(col_part2, c0), _resolve(col_part2, c0 + n - 1)]
+    return sheet, min(r1, r2), max(r1, r2), min(cols), max(cols)
+
+# --- Grid access ---
+
+def _read_row(grid, r, start, n):
+    """Reads n consecutive cells of a row; cells outside the grid read as 0."""
+    rows, cols = grid.shape
+    if 0 <= r < rows and start >= 0 and start + n <= cols:
+        return grid[r, start:start + n]
+    out = np.zeros(n)
+    if 0 <= r < rows:
+        lo, hi = max(start, 0), min(start + n, cols)
+        if lo < hi:
+            out[lo - start:hi - start] = grid[r, lo:hi]
+    return out
+
+def _read_cell(grid, r, c):
+    rows, cols = grid.shape
+    if 0 <= r < rows and 0 <= c < cols:
+        return grid[r, c]
+    return 0.0
+
+def _take(grid, rows, cols):
+    """Fancy-indexed read of (rows, cols) pairs; out-of-range pairs read as 0."""
+    rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))
+    valid = (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+    out = np.zeros(rows.shape)
+    out[valid] = grid[rows[valid], cols[valid]]
+    return out
+
+def _window_matrix(grid, mask, r_lo, r_hi, lo, hi, fill):
+    """
+    Returns the rows r_lo..r_hi of a range over columns lo.min()..hi.max() as a
+    dense matrix, with empty, text or out-of-range cells replaced by `fill`.
+    """
+    base, top = int(lo.min()), int(hi.max())
+    out = np.full((r_hi - r_lo + 1, top - base + 1), fill)
+    rs, re_ = max(r_lo, 0), min(r_hi + 1, grid.shape[0])
+    cs, ce = max(base, 0), min(top + 1, grid.shape[1])
+    if rs < re_ and cs < ce:
+        block = grid[rs:re_, cs:ce]
+        keep = mask[rs:re_, cs:ce] & ~np.isnan(block)
+        out[rs - r_lo:re_ - r_lo, cs - base:ce - base] = np.where(keep, block, fill)
+    return out, base
+
+# --- Compilation ---
+
+def _compile(node, sheet, row, ctx):
+    """
+    Compiles a syntax tree for one row of one sheet into a function
+    f(grids, c0, n) returning a scalar or a vector of length n, holding the
+    formula's value for columns c0 .. c0 + n - 1.
+    """
+    kind = node[0]
+    if kind == "num":
+        value = node[1]
+        return lambda grids, c0, n: value
+    if kind == "str":
+        # Text values are not modelled numerically
+        return lambda grids, c0, n: np.nan
+    if kind == "ref":
+        ref_sheet = _check_sheet(node[1] or sheet, ctx)
+        r = _resolve(node[2], row)
+        col_value, col_relative = node[3]
+        if col_relative:
+            return lambda grids, c0, n: _read_row(grids[ref_sheet], r, c0 + col_value, n)
+        return lambda grids, c0, n: _read_cell(grids[ref_sheet], r, col_value)
+    if kind == "range":
+        raise ValueError("Ranges are only supported as function arguments")
+    if kind == "neg":
+        operand = _compile(node[1], sheet, row, ctx)
+        return lambda grids, c0, n: -operand(grids, c0, n)
+    if kind == "pct":
+        operand = _compile(node[1], sheet, row, ctx)
+        return lambda grids, c0, n: operand(grids, c0, n) / 100.0
+    if kind == "bin":
+        return _compile_binary(node[1], _compile(node[2], sheet, row, ctx), _compile(node[3], sheet, row, ctx))
+    if kind == "func":
+        return _compile_function(node[1], node[2], sheet, row, ctx)
+    raise ValueError(f"Unknown node type '{kind}'")
+
+def _check_sheet(sheet, ctx):
+    if sheet not in ctx["shapes"]:
+        raise ValueError(f"Reference to unknown sheet '{sheet}'")
+    return sheet
+
+def _compile_binary(op, left, right):
+    if op == "+":
+        return lambda grids, c0, n: left(grids, c0, n) + right(grids, c0, n)
+    if op == "-":
+        return lambda grids, c0, n: left(grids, c0, n) - right(grids, c0, n)
+    if op == "*":
+        return lambda grids, c0, n: left(grids, c0, n) * right(grids, c0, n)
+    if op == "/":
+        return lambda grids, c0, n: np.divide(left(grids, c0, n), right(grids, c0, n))
+    if op == "^":
+        return lambda grids, c0, n: np.power(left(grids, c0, n), right(grids, c0, n))
+    if op == "&":
+        return lambda grids, c0, n: np.nan
+    compare = {"=": np.equal, "<>": np.not_equal, "<": np.less, ">": np.greater,
+               "<=": np.less_equal, ">=": np.greater_equal}[op]
+    return lambda grids, c0, n: compare(left(grids, c0, n), right(grids, c0, n)).astype(np.float64)
+
+def _compile_range(node, sheet, row, ctx):
+    """
+    Compiles a range argument into f(grids, c0, n) returning
+    (grid, mask, first_row, last_row, lo, hi) where lo/hi are per-column bounds.
+    """
+    if node[0] == "ref":
+        node = ("range", node[1], node[2], node[3], node[2], node[3])
+    if node[0] != "range":
+        raise ValueError("Expected a range argument")
+    ref_sheet = _check_sheet(node[1] or sheet, ctx)
+    mask = ctx["filled"][ref_sheet]
+    r1, r2 = _resolve(node[2], row), _resolve(node[4], row)
+    r_lo, r_hi = min(r1, r2), max(r1, r2)
+    (ca, ca_rel), (cb, cb_rel) = node[3], node[5]
+
+    def window(grids, c0, n):
+        j = np.arange(c0, c0 + n)
+        a = j + ca if ca_rel else np.full(n, ca)
+        b = j + cb if cb_rel else np.full(n, cb)
+        return grids[ref_sheet], mask, r_lo, r_hi, np.minimum(a, b), np.maximum(a, b)
+    return window
+
+def _window_sum(window):
+    grid, mask, r_lo, r_hi, lo, hi = window
+    matrix, base = _window_matrix(grid, mask, r_lo, r_hi, lo, hi, 0.0)
+    # Prefix sums over the column totals give every (possibly growing) window in one step
+    prefix = np.concatenate(([0.0], np.cumsum(matrix.sum(axis=0))))
+    return prefix[hi - base + 1] - prefix[lo - base]
+
+def _window_reduce(window, reducer, fill):
+    grid, mask, r_lo, r_hi, lo, hi = window
+    matrix, base = _window_matrix(grid, mask, r_lo, r_hi, lo, hi, fill)
+    widths = hi - lo + 1
+    if (widths == widths[0]).all():
+        views = np.lib.stride_tricks.sliding_window_view(matrix, int(widths[0]), axis=1)
+        result = reducer(views[:, lo - base, :], axis=(0, 2))
+    else:
+        result = np.array([reducer(matrix[:, l - base:h - base + 1]) for l, h in zip(lo, hi)])
+    return np.where(np.isinf(result), 0.0, result)
+
+def _window_columns(window):
+    """Yields the filled, numeric values of the window for each output column."""
+    grid, mask, r_lo, r_hi, lo, hi = window
+    matrix, base = _window_matrix(grid, mask, r_lo, r_hi, lo, hi, np.nan)
+    for l, h in zip(lo, hi):
+        values = matrix[:, l - base:h - base + 1].ravel()
+        yield values[~np.isnan(values)]
+
+def _compile_args(args, sheet, row, ctx):
+    """Compiles aggregate arguments, which may be ranges or plain expressions."""
+    compiled = []
+    for arg in args:
+        if arg[0] in ("range", "ref"):
+            compiled.append(("range", _compile_range(arg, sheet, row, ctx)))
+        else:
+            compiled.append(("value", _compile(arg, sheet, row, ctx)))
+    return compiled
+
+def _aggregate(compiled, grids, c0, n, window_op, combine, fill):
+    total = None
+    for kind, fn in compiled:
+        if kind == "range":
+            part = window_op(fn(grids, c0, n))
+        else:
+            part = np.broadcast_to(np.nan_to_num(np.asarray(fn(grids, c0, n), dtype=np.float64), nan=fill), (n,))
+        total = part if total is None else combine(total, part)
+    return total
+
+def _to_dates(serial):
+    serial = np.asarray(serial, dtype=np.float64)
+    return EXCEL_EPOCH + np.nan_to_num(np.floor(serial)).astype(np.int64).astype('timedelta64[D]')
+
+def _to_serial(dates, like):
+    result = (dates - EXCEL_EPOCH).astype(np.int64).astype(np.float64)
+    return np.where(np.isnan(np.asarray(like, dtype=np.float64)), np.nan, result)
+
+def _year(serial):
+    return _to_dates(serial).astype('datetime64[Y]').astype(np.int64) + 1970.0
+
+def _month(serial):
+    return _to_dates(serial).astype('datetime64[M]').astype(np.int64) % 12 + 1.0
+
+def _day(serial):
+    dates = _to_dates(serial)
+    return (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1.0
+
+def _eomonth(serial, months):
+    month = _to_dates(serial).astype('datetime64[M]') + np.asarray(months, dtype=np.float64).astype(np.int64)
+    last_day = (month + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return _to_serial(last_day, serial)
+
+def _edate(serial, months):
+    dates = _to_dates(serial)
+    month = dates.astype('datetime64[M]') + np.asarray(months, dtype=np.float64).astype(np.int64)
+    month_length = ((month + 1).astype('datetime64[D]') - month.astype('datetime64[D]')).astype(np.int64)
+    day = np.minimum((dates - dates.astype('datetime64[M]')).astype(np.int64), month_length - 1)
+    return _to_serial(month.astype('datetime64[D]') + day.astype('timedelta64[D]'), serial)
+
+def _date(year, month, day):
+    year, month, day = (np.asarray(x, dtype=np.float64).astype(np.int64) for x in (year, month, day))
+    months = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    return _to_serial(months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]'), year)
+
+def _pmt(rate, nper, pv, fv=0.0):
+    rate, nper, pv, fv = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (rate, nper, pv, fv)))
+    growth = np.power(1 + rate, nper)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = -(rate * (pv * growth + fv)) / (growth - 1)
+    return np.where(rate == 0, -(pv + fv) / nper, annuity)
+
+def _ipmt(rate, per, nper, pv, fv=0.0):
+    rate = np.asarray(rate, dtype=np.float64)
+    payment = _pmt(rate, nper, pv, fv)
+    growth = np.power(1 + rate, np.asarray(per, dtype=np.float64) - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        balance = np.where(rate == 0, pv + payment * (np.asarray(per) - 1), pv * growth + payment * (growth - 1) / rate)
+    return -balance * rate
+
+def _irr(values, guess=0.1):
+    """Internal rate of return of one cash flow series (Newton's method)."""
+    if len(values) < 2 or not ((values > 0).any() and (values < 0).any()):
+        return np.nan
+    periods = np.arange(len(values))
+    rate = guess
+    for _ in range(100):
+        discount = np.power(1 + rate, -periods)
+        npv = (values * discount).sum()
+        slope = -(periods * values * discount / (1 + rate)).sum()
+        if slope == 0:
+            return np.nan
+        step = npv / slope
+        rate -= step
+        if rate <= -1:
+            return np.nan
+        if abs(step) < 1e-10:
+            return rate
+    return np.nan
+
+def _round(x, digits):
+    factor = np.power(10.0, np.asarray(digits, dtype=np.float64).astype(np.int64))
+    x = np.asarray(x, dtype=np.float64)
+    # Excel rounds halves away from zero, on the decimal value: 1.005 * 100 is
+    # 100.49999999999999 in binary, so the product is first rounded to 9 places
+    return np.sign(x) * np.floor(np.round(np.abs(x) * factor, 9) + 0.5) / factor
+
+# Element-wise functions: name -> (callable, min args, max args)
+ELEMENTWISE_FUNCTIONS = {
+    "ABS": (np.abs, 1, 1),
+    "INT": (np.floor, 1, 1),
+    "ROUND": (_round, 2, 2),
+    "YEAR": (_year, 1, 1),
+    "MONTH": (_month, 1, 1),
+    "DAY": (_day, 1, 1),
+    "DATE": (_date, 3, 3),
+    "EOMONTH": (_eomonth, 2, 2),
+    "EDATE": (_edate, 2, 2),
+    "PMT": (_pmt, 3, 4),
+    "IPMT": (_ipmt, 4, 5),
+    "PPMT": (lambda rate, per, nper, pv, fv=0.0: _pmt(rate, nper, pv, fv) - _ipmt(rate, per, nper, pv, fv), 4, 5),
+    "NOT": (lambda x: (np.asarray(x) == 0).astype(np.float64), 1, 1),
+}
+
+def _compile_function(name, args, sheet, row, ctx):
+    if name in ELEMENTWISE_FUNCTIONS:
+        func, min_args, max_args = ELEMENTWISE_FUNCTIONS[name]
+        if not min_args <= len(args) <= max_args:
+            raise ValueError(f"{name} expects {min_args}-{max_args} arguments, got {len(args)}")
+        compiled = [_compile(arg, sheet, row, ctx) for arg in args]
+        return lambda grids, c0, n: func(*(fn(grids, c0, n) for fn in compiled))
+
+    if name == "IF":
+        if not 2 <= len(args) <= 3:
+            raise ValueError(f"IF expects 2-3 arguments, got {len(args)}")
+        cond, then = _compile(args[0], sheet, row, ctx), _compile(args[1], sheet, row, ctx)
+        otherwise = _compile(args[2], sheet, row, ctx) if len(args) == 3 else (lambda grids, c0, n: 0.0)
+
+        def if_(grids, c0, n):
+            test = cond(grids, c0, n)
+            if np.ndim(test) == 0:
+                # Scalar condition: only the chosen branch is evaluated, like Excel
+                return then(grids, c0, n) if test else otherwise(grids, c0, n)
+            return np.where(test != 0, then(grids, c0, n), otherwise(grids, c0, n))
+        return if_
+
+    if name == "IFERROR":
+        if len(args) != 2:
+            raise ValueError(f"IFERROR expects 2 arguments, got {len(args)}")
+        value, fallback = (_compile(arg, sheet, row, ctx) for arg in args)
+
+        def iferror(grids, c0, n):
+            # The value is evaluated once; the fallback only when it has errors
+            result = value(grids, c0, n)
+            ok = np.isfinite(result)
+            if np.all(ok):
+                return result
+            return np.where(ok, result, fallback(grids, c0, n))
+        return iferror
+
+    if name in ("AND", "OR"):
+        compiled = [_compile(arg, sheet, row, ctx) for arg in args]
+        reducer = np.logical_and if name == "AND" else np.logical_or
+        def logical(grids, c0, n):
+            result = compiled[0](grids, c0, n) != 0
+            for fn in compiled[1:]:
+                result = reducer(result, fn(grids, c0, n) != 0)
+            return np.asarray(result, dtype=np.float64)
+        return logical
+
+    if name == "SUM":
+        compiled = _compile_args(args, sheet, row, ctx)
+        return lambda grids, c0, n: _aggregate(compiled, grids, c0, n, _window_sum, np.add, 0.0)
+
+    if name in ("MIN", "MAX"):
+        compiled = _compile_args(args, sheet, row, ctx)
+        reducer, fill = (np.min, np.inf) if name == "MIN" else (np.max, -np.inf)
+        combine = np.minimum if name == "MIN" else np.maximum
+        def extreme(grids, c0, n):
+            result = _aggregate(compiled, grids, c0, n, lambda w: _window_reduce(w, reducer, fill), combine, fill)
+            return np.where(np.isinf(result), 0.0, result)
+        return extreme
+
+    if name == "AVERAGE":
+        compiled = _compile_args(args, sheet, row, ctx)
+        def average(grids, c0, n):
+            total = _aggregate(compiled, grids, c0, n, _window_sum, np.add, 0.0)
+            count = np.zeros(n)
+            for kind, fn in compiled:
+                count += [len(v) for v in _window_columns(fn(grids, c0, n))] if kind == "range" else 1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return total / count
+        return average
+
+    if name == "INDEX":
+        if not 2 <= len(args) <= 3:
+            raise ValueError(f"INDEX expects 2-3 arguments, got {len(args)}")
+        window = _compile_range(args[0], sheet, row, ctx)
+        first = _compile(args[1], sheet, row, ctx)
+        second = _compile(args[2], sheet, row, ctx) if len(args) == 3 else None
+
+        def index(grids, c0, n):
+            grid, _, r_lo, r_hi, lo, hi = window(grids, c0, n)
+            i = np.asarray(first(grids, c0, n), dtype=np.float64).astype(np.int64)
+            if second is not None:
+                j = np.asarray(second(grids, c0, n), dtype=np.float64).astype(np.int64)
+                return _take(grid, r_lo + i - 1, lo + j - 1)
+            if r_lo == r_hi:
+                return _take(grid, r_lo, lo + i - 1)
+            return _take(grid, r_lo + i - 1, lo)
+        return index
+
+    if name in ("IRR", "NPV"):
+        if name == "IRR":
+            window = _compile_range(args[0], sheet, row, ctx)
+            return lambda grids, c0, n: np.array([_irr(v) for v in _window_columns(window(grids, c0, n))])
+        rate = _compile(args[0], sheet, row, ctx)
+        windows = _compile_args(args[1:], sheet, row, ctx)
+        def npv(grids, c0, n):
+            r = np.broadcast_to(np.asarray(rate(grids, c0, n), dtype=np.float64), (n,))
+            totals = np.zeros(n)
+            for j in range(n):
+                flows = []
+                for kind, fn in windows:
+                    if kind == "range":
+                        flows.extend(list(_window_columns(fn(grids, c0 + j, 1)))[0])
+                    else:
+                        flows.append(float(np.broadcast_to(fn(grids, c0 + j, 1), (1,))[0]))
+                flows = np.asarray(flows, dtype=np.float64)
+                totals[j] = (flows / np.power(1 + r[j], np.arange(1, len(flows) + 1))).sum()
+            return totals
+        return npv
+
+    raise ValueError(f"Unsupported function '{name}'")
+
+# --- Plan building ---
+
+def load_workbook_export(input_path):
+    """Loads a workbook export JSON (the `worksheets[].cells` format), or reads an .xlsx into that format."""
+    from xlsx_reader import load_workbook_source
+    return load_workbook_source(input_path)
+
+def _is_formula(value):
+    return isinstance(value, str) and value.startswith("=")
+
+def compile_workbook(data):
+    """
+    Compiles every formula in a workbook export into a dependency-ordered plan.
+
+    Consecutive cells of a row that share the same R1C1 formula text (the normal
+    case for timeline rows) are grouped into one block, compiled once and later
+    evaluated as a NumPy vector across all of its period columns.
+
+    Returns:
+        dict: The plan, with the compiled blocks, their precedents, the
+        evaluation steps, constant grids and any compile errors.
+    """
+    started = time.perf_counter()
+    shapes, constants, filled, formulas = {}, {}, {}, defaultdict(dict)
+
+    for ws in data.get("worksheets", []):
+        sheet_name = ws.get("name")
+        if not sheet_name:
+            continue
+        cells = [cell for cell in ws.get("cells", {}).values()
+                 if cell.get("rowIndex") is not None and cell.get("columnIndex") is not None]
+        rows = max((cell["rowIndex"] for cell in cells), default=0) + 1
+        cols = max((cell["columnIndex"] for cell in cells), default=0) + 1
+        shapes[sheet_name] = (rows, cols)
+        grid = np.zeros((rows, cols))
+        mask = np.zeros((rows, cols), dtype=bool)
+        for cell in cells:
+            r, c, value = cell["rowIndex"], cell["columnIndex"], cell.get("formulaR1C1")
+            mask[r, c] = True
+            if _is_formula(value):
+                formulas[sheet_name][(r, c)] = value
+            elif isinstance(value, (int, float)):
+                grid[r, c] = value
+            else:
+                grid[r, c] = np.nan  # text
+        constants[sheet_name], filled[sheet_name] = grid, mask
+
+    ctx = {"shapes": shapes, "filled": filled}
+    blocks, errors = [], []
+    parsed = {}  # formula text -> syntax tree, shared by identical formulas
+
+    for sheet_name, sheet_formulas in formulas.items():
+        by_row = defaultdict(list)
+        for (r, c), formula in sheet_formulas.items():
+            by_row[r].append((c, formula))
+        for r, row_cells in by_row.items():
+            row_cells.sort()
+            start = 0
+            while start < len(row_cells):
+                c0, formula = row_cells[start]
+                end = start + 1
+                while end < len(row_cells) and row_cells[end] == (c0 + end - start, formula):
+                    end += 1
+                block = {"sheet": sheet_name, "row": r, "c0": c0, "n": end - start, "formula": formula}
+                try:
+                    if formula not in parsed:
+                        parsed[formula] = parse_formula(formula)
+                    block["refs"] = list(collect_references(parsed[formula], sheet_name))
+                    block["fn"] = _compile(parsed[formula], sheet_name, r, ctx)
+                except (ValueError, KeyError, IndexError) as e:
+                    block["refs"], block["fn"] = [], None
+                    errors.append({"sheet": sheet_name, "row": r, "col": c0, "formula": formula, "error": str(e)})
+                blocks.append(block)
+                start = end
+
+    precedents = _block_precedents(blocks)
+    steps, circular = _order_blocks(blocks, precedents)
+
+    return {
+        "blocks": blocks,
+        "precedents": precedents,
+        "steps": steps,
+        "circular": circular,
+        "constants": constants,
+        "filled": filled,
+        "errors": errors,
+        "compile_seconds": time.perf_counter() - started,
+    }
+
+def _block_precedents(blocks):
+    """Finds, for each block, the set of blocks whose cells its formula reads."""
+    row_index = defaultdict(list)
+    for i, block in enumerate(blocks):
+        row_index[(block["sheet"], block["row"])].append((block["c0"], block["c0"] + block["n"] - 1, i))
+    starts, ends, ids = {}, {}, {}
+    for key, entries in row_index.items():
+        entries.sort()
+        starts[key] = [e[0] for e in entries]
+        ends[key] = [e[1] for e in entries]
+        ids[key] = [e[2] for e in entries]
+
+    precedents = []
+    for block in blocks:
+        deps = set()
+        for ref in block["refs"]:
+            sheet, r_lo, r_hi, c_lo, c_hi = reference_span(ref, block["row"], block["c0"], block["n"])
+            for r in range(r_lo, r_hi + 1):
+                key = (sheet, r)
+                if key not in starts:
+                    continue
+                # Blocks in a row are disjoint and sorted, so overlaps form a contiguous slice
+                for k in range(bisect_left(ends[key], c_lo), bisect_right(starts[key], c_hi)):
+                    deps.add(ids[key][k])
+        precedents.append(deps)
+    return precedents
+
+def strongly_connected_components(edges):
+    """
+    Iterative Tarjan's algorithm. edges[v] lists the nodes v depends on.
+    Components are returned dependencies-first, i.e. in evaluation order.
+    """
+    n = len(edges)
+    index, low = [None] * n, [0] * n
+    on_stack = [False] * n
+    stack, components = [], []
+    counter = 0
+    for root in range(n):
+        if index[root] is not None:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(edges[root]))]
+        while work:
+            v, neighbors = work[-1]
+            advanced = False
+            for w in neighbors:
+                if index[w] is None:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(edges[w])))
+                    advanced = True
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+    return components
+
+def _order_blocks(blocks, precedents):
+    """
+    Orders blocks for evaluation. Acyclic blocks become vector steps. Groups of
+    blocks that depend on each other row-wise (e.g. an opening balance reading
+    the previous column's closing balance) are split into single cells and
+    ordered cell by cell. Cells that are genuinely circular (interest during
+    construction, DSRA funding, fees on debt size) become one "cycle" step per
+    circular block.
+
+    Returns:
+        tuple: (steps, circular) where steps are ("block", id),
+        ("cells", [(id, col), ...]) or ("cycle", [(id, col), ...]) and circular
+        lists the cells of each circular block.
+    """
+    steps, circular = [], []
+    for component in strongly_connected_components(precedents):
+        if len(component) == 1 and component[0] not in precedents[component[0]]:
+            steps.append(("block", component[0]))
+            continue
+        for kind, cells in _order_cells(blocks, component):
+            steps.append((kind, cells))
+            if kind == "cycle":
+                circular.append(cells)
+    return steps, circular
+
+def _cell_precedents(blocks, component):
+    """Cell-level precedents restricted to the cells of one group of blocks."""
+    cells = [(b, c) for b in component for c in range(blocks[b]["c0"], blocks[b]["c0"] + blocks[b]["n"])]
+    position = {(blocks[b]["sheet"], blocks[b]["row"], c): i for i, (b, c) in enumerate(cells)}
+    edges = []
+    for b, c in cells:
+        block = blocks[b]
+        deps = set()
+        for ref in block["refs"]:
+            sheet, r_lo, r_hi, c_lo, c_hi = reference_span(ref, block["row"], c, 1)
+            for r in range(r_lo, r_hi + 1):
+                for col in range(c_lo, c_hi + 1):
+                    k = position.get((sheet, r, col))
+                    if k is not None:
+                        deps.add(k)
+        edges.append(deps)
+    return cells, edges
+
+def _order_cells(blocks, component):
+    """
+    Topologically orders the cells of a block group into ("cells", [(id, col), ...])
+    runs, with the cells on cycles as ("cycle", cells) steps. Cycles that
+    follow each other directly and do not read one another (typically the
+    same loop in every period column of a row that does not carry a balance
+    forward) are merged into one step, so they are solved as one vector.
+    A cycle that reads an earlier one gets its own step, so each period is
+    solved in column order with the previous period already settled.
+    """
+    cells, edges = _cell_precedents(blocks, component)
+    steps, ordered = [], []
+    merged = set()  # cell positions of the last cycle step
+    for cell_component in strongly_connected_components(edges):
+        if len(cell_component) == 1 and cell_component[0] not in edges[cell_component[0]]:
+            ordered.append(cells[cell_component[0]])
+            continue
+        if ordered:
+            steps.append(("cells", ordered))
+            ordered = []
+        members = sorted((cells[k] for k in cell_component), key=lambda cell: (cell[1], blocks[cell[0]]["row"]))
+        # Consecutive components are only linked through a direct edge: any
+        # cell in between would have been emitted between them
+        if steps and steps[-1][0] == "cycle" and not any(edges[k] & merged for k in cell_component):
+            steps[-1][1].extend(members)
+            merged.update(cell_component)
+        else:
+            steps.append(("cycle", members))
+            merged = set(cell_component)
+    if ordered:
+        steps.append(("cells", ordered))
+    return steps
+
+# --- Evaluation ---
+
+def split_address(address):
+    """Splits "sheet!A1" or "'p and l'!A1" into (sheet, "A1")."""
+    sheet, _, a1_ref = address.rpartition("!")
+    if not sheet:
+        raise ValueError(f"Address '{address}' must include a sheet name")
+    if sheet.startswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    return sheet, a1_ref
+
+def new_grids(plan):
+    """Returns fresh value grids seeded with the workbook's constants."""
+    return {sheet: grid.copy() for sheet, grid in plan["constants"].items()}
+
+def evaluate_block(block, grids, c0, n):
+    """Evaluates columns c0 .. c0 + n - 1 of one block and writes them into the grids."""
+    row, sheet = block["row"], block["sheet"]
+    if block["fn"] is None:
+        grids[sheet][row, c0:c0 + n] = np.nan
+        return
+    grids[sheet][row, c0:c0 + n] = block["fn"](grids, c0, n)
+
+def _pins_by_block(plan, cells):
+    """Maps the block containing each overridden formula cell to its pinned values."""
+    pins = defaultdict(list)
+    for (sheet, r, c), value in cells.items():
+        b = block_at(plan, sheet, r, c)
+        if b is not None:
+            pins[b].append((sheet, r, c, value))
+    return pins
+
+def _cycle_segments(cells):
+    """Groups a cycle's cells by block: [(block id, first col, member cols)], in first-seen order."""
+    by_block = {}
+    for b, c in cells:
+        by_block.setdefault(b, []).append(c)
+    segments = []
+    for b, cols in by_block.items():
+        cols = np.array(sorted(cols))
+        segments.append((b, int(cols[0]), cols))
+    return segments
+
+def solve_cycle(plan, grids, cells, pins=None, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS, damping=DAMPING):
+    """
+    Solves one circular block by damped fixed-point iteration.
+
+    Each iteration re-evaluates every block of the cycle once, as one vector
+    over the columns it has in the cycle, and writes the (damped) result back
+    before the next block reads it. Cells start from their current grid
+    values. Cells whose value stays NaN (an error in the formula) count as
+    settled.
+
+    Returns:
+        dict: {"cells", "iterations", "converged", "max_change", "seconds"}.
+    """
+    started = time.perf_counter()
+    blocks = plan["blocks"]
+    segments = _cycle_segments(cells)
+    max_change = np.inf
+    iteration = 0
+    while iteration < max_iterations and not max_change <= tolerance:
+        iteration += 1
+        max_change = 0.0
+        for b, c_lo, cols in segments:
+            block = blocks[b]
+            grid = grids[block["sheet"]]
+            n = int(cols[-1]) - c_lo + 1
+            old = grid[block["row"], cols].copy()
+            if block["fn"] is None:
+                new = np.full(len(cols), np.nan)
+            else:
+                new = np.broadcast_to(block["fn"](grids, c_lo, n), (n,))[cols - c_lo]
+            if damping:
+                new = (1 - damping) * new + damping * old
+            grid[block["row"], cols] = new
+            for sheet, r, c, value in (pins or {}).get(b, ()):
+                grids[sheet][r, c] = value
+            change = np.abs(grid[block["row"], cols] - old) / np.maximum(1.0, np.abs(old))
+            change[np.isnan(old) & np.isnan(grid[block["row"], cols])] = 0.0
+            max_change = max(max_change, float(np.max(change)) if not np.isnan(change).any() else np.inf)
+    return {
+        "cells": [(blocks[b]["sheet"], blocks[b]["row"], c) for b, c in cells],
+        "iterations": iteration,
+        "converged": bool(max_change <= tolerance),
+        "max_change": max_change,
+        "seconds": time.perf_counter() - started,
+    }
+
+def run_steps(plan, grids, steps, pinned=None, iteration=None):
+    """
+    Executes plan steps in order against the given grids.
+
+    pinned maps (sheet, row, col) to a value that overrides a formula cell: the
+    cell keeps that value and everything downstream reads it.
+
+    Circular blocks are evaluated once in order unless iteration is given: a
+    dict with optional "tolerance", "max_iterations" and "damping" for
+    solve_cycle, and a "report" list each cycle's result is appended to.
+    """
+    blocks = plan["blocks"]
+    pins = _pins_by_block(plan, pinned) if pinned else {}
+    with np.errstate(all='ignore'):
+        for kind, payload in steps:
+            if kind == "block":
+                block = blocks[payload]
+                evaluate_block(block, grids, block["c0"], block["n"])
+                for sheet, r, c, value in pins.get(payload, ()):
+                    grids[sheet][r, c] = value
+            elif kind == "cycle" and iteration is not None:
+                settings = {key: iteration[key] for key in ("tolerance", "max_iterations", "damping") if key in iteration}
+                iteration.setdefault("report", []).append(solve_cycle(plan, grids, payload, pins, **settings))
+            else:
+                for b, c in payload:
+                    evaluate_block(blocks[b], grids, c, 1)
+                    for sheet, r, col, value in pins.get(b, ()):
+                        if col == c:
+                            grids[sheet][r, col] = value
+    return grids
+
+def _resolve_overrides(overrides):
+    """Turns {(sheet, a1_ref) or "sheet!A1": value} into {(sheet, row, col): value}."""
+    resolved = {}
+    for key, value in (overrides or {}).items():
+        sheet, a1_ref = split_address(key) if isinstance(key, str) else key
+        r, c = a1_to_coords(a1_ref)
+        resolved[(sheet, r, c)] = value
+    return resolved
+
+def evaluate(plan, overrides=None, iteration=None):
+    """
+    Evaluates the whole model.
+
+    Args:
+        plan (dict): A plan from compile_workbook.
+        overrides (dict): Optional {(sheet, a1_ref): value} input changes applied
+            on top of the workbook. Overridden formula cells keep the given value.
+        iteration (dict): Optional settings to solve circular references
+            iteratively (see run_steps); their per-cycle results are
+            appended to iteration["report"].
+
+    Returns:
+        dict: sheet name -> 2D NumPy array of values (0-based row/col indexes).
+    """
+    grids = new_grids(plan)
+    cells = _resolve_overrides(overrides)
+    for (sheet, r, c), value in cells.items():
+        grids[sheet][r, c] = value
+    return run_steps(plan, grids, plan["steps"], pinned=cells, iteration=iteration)
+
+def block_at(plan, sheet, r, c):
+    """Returns the id of the formula block containing a cell, or None for constants."""
+    if "block_index" not in plan:
+        index = defaultdict(list)
+        for i, block in enumerate(plan["blocks"]):
+            index[(block["sheet"], block["row"])].append((block["c0"], block["c0"] + block["n"] - 1, i))
+        plan["block_index"] = index
+    for c_lo, c_hi, i in plan["block_index"].get((sheet, r), ()):
+        if c_lo <= c <= c_hi:
+            return i
+    return None
+
+def reader_index(plan):
+    """
+    Range index over every reference of every block (see range_index.py). Each
+    reference is indexed once by the union of the cells it reads across its
+    block's columns, with payload (block id, reference number), so a formula
+    copied across a timeline costs one entry per reference instead of one per cell.
+    """
+    if "reader_index" not in plan:
+        index = RangeIndex()
+        for b, block in enumerate(plan["blocks"]):
+            for k, ref in enumerate(block["refs"]):
+                sheet, r_lo, r_hi, c_lo, c_hi = reference_span(ref, block["row"], block["c0"], block["n"])
+                index.add(sheet, r_lo, r_hi, c_lo, c_hi, (b, k))
+        plan["reader_index"] = index
+    return plan["reader_index"]
+
+def blocks_reading(plan, sheet, r, c):
+    """Returns the ids of blocks whose formulas read a given cell."""
+    return {b for b, k in reader_index(plan).containing(sheet, r, c)}
+
+def reading_columns(block, ref, c_lo, c_hi):
+    """
+    Returns (first, last) of the block columns whose copy of ref reads any of
+    columns c_lo .. c_hi, or None. Rows need no check here: a block sits on one
+    row, so its references' rows are fixed.
+    """
+    c0, last = block["c0"], block["c0"] + block["n"] - 1
+    (v1, rel1), (v2, rel2) = ref[2], ref[4]
+    if not rel1 and not rel2:
+        lo, hi = c0, last
+    elif rel1 and rel2:
+        lo, hi = max(c0, c_lo - max(v1, v2)), min(last, c_hi - min(v1, v2))
+    else:
+        # Mixed ranges such as R12C6:R[5]C run from a fixed column a to the
+        # copy's own column x + offset, so they reach a column from one side of a
+        a, offset = (v1, v2) if rel2 else (v2, v1)
+        if c_lo <= a <= c_hi:
+            lo, hi = c0, last
+        elif c_lo > a:
+            lo, hi = max(c0, c_lo - offset), last
+        else:
+            lo, hi = c0, min(last, c_hi - offset)
+    return (lo, hi) if lo <= hi else None
+
+def segments_reading(plan, sheet, r, c_lo, c_hi):
+    """
+    Returns the formula cells that read any of columns c_lo .. c_hi of row r,
+    as (block id, first column, last column) runs.
+    """
+    segments = []
+    for b, k in reader_index(plan).overlapping(sheet, r, r, c_lo, c_hi):
+        block = plan["blocks"][b]
+        columns = reading_columns(block, block["refs"][k], c_lo, c_hi)
+        if columns:
+            segments.append((b,) + columns)
+    return segments
+
+def cells_reading(plan, sheet, r, c):
+    """Returns the formula cells, as (sheet, row, col), that read the given cell."""
+    readers = set()
+    for b, lo, hi in segments_reading(plan, sheet, r, c, c):
+        block = plan["blocks"][b]
+        readers.update((block["sheet"], block["row"], x) for x in range(lo, hi + 1))
+    return readers
+
+def block_dependents(plan):
+    """Reverse of plan["precedents"]: for each block, the blocks that read it."""
+    if "dependents" not in plan:
+        dependents = [set() for _ in plan["blocks"]]
+        for b, deps in enumerate(plan["precedents"]):
+            for d in deps:
+                dependents[d].add(b)
+        plan["dependents"] = dependents
+    return plan["dependents"]
+
+def downstream_blocks(plan, cells):
+    """Returns every block that (transitively) reads any of the given (sheet, row, col) cells."""
+    dependents = block_dependents(plan)
+    pending = set()
+    for sheet, r, c in cells:
+        pending |= blocks_reading(plan, sheet, r, c)
+    seen = set(pending)
+    while pending:
+        b = pending.pop()
+        for d in dependents[b]:
+            if d not in seen:
+                seen.add(d)
+                pending.add(d)
+    return seen
+
+def downstream_steps(plan, dirty):
+    """Filters the plan's steps down to the given set of blocks, keeping their order."""
+    steps = []
+    for kind, payload in plan["steps"]:
+        if kind == "block":
+            if payload in dirty:
+                steps.append((kind, payload))
+        else:
+            cells = [(b, c) for b, c in payload if b in dirty]
+            if cells:
+                steps.append((kind, cells))
+    return steps
+
+def recalculate(plan, base_grids, overrides, iteration=None):
+    """
+    Applies input changes on top of already evaluated grids and re-runs only
+    the blocks downstream of the changed cells. Circular blocks are solved
+    starting from their base values when iteration settings are given.
+
+    Returns:
+        tuple: (grids, number of blocks recomputed). base_grids is not modified.
+    """
+    cells = _resolve_overrides(overrides)
+    grids = {sheet: grid.copy() for sheet, grid in base_grids.items()}
+    for (sheet, r, c), value in cells.items():
+        grids[sheet][r, c] = value
+    dirty = downstream_blocks(plan, cells)
+    run_steps(plan, grids, downstream_steps(plan, dirty), pinned=cells, iteration=iteration)
+    return grids, len(dirty)
+
+def get_value(grids, sheet, a1_ref):
+    """Returns the evaluated value of one cell, e.g. get_value(grids, "debt", "F11")."""
+    r, c = a1_to_coords(a1_ref)
+    return float(_read_cell(grids[sheet], r, c))
+
+def compare_with_cached(grids, data, rel_tol=1e-6, abs_tol=1e-6):
+    """
+    Checks evaluated formula cells against the cached values stored in the
+    export (a numeric `value` field next to `formulaR1C1`).
+
+    Returns:
+        dict: Counts of compared and mismatched cells plus the mismatches.
+    """
+    compared, mismatches = 0, []
+    for ws in data.get("worksheets", []):
+        sheet_name = ws.get("name")
+        for cell in ws.get("cells", {}).values():
+            cached = cell.get("value")
+            if not _is_formula(cell.get("formulaR1C1")) or isinstance(cached, bool) or not isinstance(cached, (int, float)):
+                continue
+            compared += 1
+            computed = float(_read_cell(grids[sheet_name], cell["rowIndex"], cell["columnIndex"]))
+            if not abs(computed - cached) <= max(abs_tol, rel_tol * abs(cached)):
+                mismatches.append({"cell": cell.get("address"), "formula": cell["formulaR1C1"],
+                                   "cached": cached, "computed": computed})
+    return {"compared": compared, "mismatched": len(mismatches), "mismatches": mismatches}
+
+def main():
+    """Compiles and evaluates a workbook export (the sample one by default) and checks it against cached values."""
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Compile and evaluate a workbook export.")
+    parser.add_argument("export", nargs="?", default=os.path.join(project_root, "jsonformatter.JSON"),
+                        help="Workbook export JSON or .xlsx file")
+    parser.add_argument("--iterate", action="store_true", help="Solve circular references by fixed-point iteration")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS)
+    parser.add_argument("--damping", type=float, default=DAMPING, help="Share of the previous value kept each iteration")
+    args = parser.parse_args()
+    data = load_workbook_export(args.export)
+
+    plan = compile_workbook(data)
+    vector_steps = sum(1 for kind, _ in plan["steps"] if kind == "block")
+    cell_steps = sum(len(payload) for kind, payload in plan["steps"] if kind == "cells")
+    print(f"Compiled {len(plan['blocks'])} formula blocks in {plan['compile_seconds'] * 1000:.1f} ms "
+          f"({vector_steps} vectorized, {cell_steps} cells evaluated one by one)")
+    for error in plan["errors"]:
+        print(f"  - Could not compile {error['sheet']}!R{error['row'] + 1}C{error['col'] + 1} {error['formula']}: {error['error']}")
+    if plan["circular"]:
+        print(f"  - {len(plan['circular'])} circular block(s) found")
+        for cells in plan["circular"][:10]:
+            block = plan["blocks"][cells[0][0]]
+            print(f"    - {len(cells)} cells from {block['sheet']}!{col_num_to_letter(cells[0][1] + 1)}{block['row'] + 1}")
+
+    iteration = None
+    if args.iterate:
+        iteration = {"tolerance": args.tolerance, "max_iterations": args.max_iterations, "damping": args.damping}
+    started = time.perf_counter()
+    grids = evaluate(plan, iteration=iteration)
+    print(f"Evaluated model in {(time.perf_counter() - started) * 1000:.1f} ms")
+    cycles = (iteration or {}).get("report", [])
+    if cycles:
+        converged = sum(result["converged"] for result in cycles)
+        print(f"Solved {len(cycles)} circular block(s) in {sum(r['seconds'] for r in cycles) * 1000:.1f} ms: "
+              f"{converged} converged, {len(cycles) - converged} did not")
+    # Blocks that did not converge first
+    for result in sorted(cycles, key=lambda result: result["converged"])[:10]:
+        sheet, r, c = result["cells"][0]
+        status = "converged" if result["converged"] else "did not converge"
+        print(f"  - Cycle at {sheet}!{col_num_to_letter(c + 1)}{r + 1} ({len(result['cells'])} cells): {status} "
+              f"after {result['iterations']} iterations, max change {result['max_change']:.2e}, "
+              f"{result['seconds'] * 1000:.1f} ms")
+
+    check = compare_with_cached(grids, data)
+    if check["compared"]:
+        print(f"Checked {check['compared']} cells against cached values: {check['mismatched']} mismatches")
+        for mismatch in check["mismatches"][:20]:
+            print(f"  - {mismatch['cell']}: cached {mismatch['cached']}, computed {mismatch['computed']} ({mismatch['formula']})")
+    else:
+        print("The export has no cached values to check against.")
+
+if __name__ == "__main__":
+    main()
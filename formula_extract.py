@@ -1,12 +1,22 @@
+import argparse
 import json
+import os
+
+from extraction import scan_workbook, FormattedLabelExtractor
+from xlsx_reader import load_workbook_source
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
 
 # Specify the input and output file paths
-input_file_path = r'/Users/joshualevi/git_projects/playground_reg/jsonformatter.JSON'
-output_file_path = r'/Users/joshualevi/git_projects/playground_reg/formula_extract_results.json'
+parser = argparse.ArgumentParser(description="Collect the formatted labels of every sheet.")
+parser.add_argument("input", nargs="?", default=os.path.join(PROJECT_ROOT, "jsonformatter.JSON"),
+                    help="Workbook export JSON or .xlsx file")
+parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "formula_extract_results.json"))
+args = parser.parse_args()
+output_file_path = args.output
 
-# Load the JSON file with UTF-8 encoding
-with open(input_file_path, 'r', encoding='utf-8') as file:
-    data = json.load(file)
+# Load the workbook export (an .xlsx is streamed, one sheet at a time)
+data = load_workbook_source(args.input, streaming=True)
 
 # Define min columnIndex per sheet (add more sheets as needed, e.g., for cashflow sheets)
 min_column_per_sheet = {
@@ -16,29 +26,8 @@ min_column_per_sheet = {
     "default": 0   # For other sheets like Sheet1/Terminal Value, include from column 0+
 }
 
-# Initialize a dictionary to store raw names by sheet
-raw_names_by_sheet = {}
-
-# Iterate through each worksheet
-for worksheet in data['worksheets']:
-    sheet_name = worksheet['name']
-    raw_names = []
-    
-    # Get the min column for this sheet
-    min_col = min_column_per_sheet.get(sheet_name, min_column_per_sheet["default"])
-    
-    # Iterate through cells in the worksheet
-    for cell_key, cell_data in worksheet['cells'].items():
-        # Check if the cell has the specified format and column >= min_col
-        if (cell_data.get('format', {}).get('font', {}).get('color') == '#000000' and
-            cell_data.get('format', {}).get('backgroundColor') == '#FFFFFF' and
-            cell_data['columnIndex'] >= min_col):
-            # Check if formulaR1C1 exists and is a string, and not a formula (does not start with '=')
-            if 'formulaR1C1' in cell_data and isinstance(cell_data['formulaR1C1'], str) and not cell_data['formulaR1C1'].startswith('='):
-                raw_names.append(cell_data['formulaR1C1'])
-    
-    # Store the raw names for this sheet
-    raw_names_by_sheet[sheet_name] = raw_names
+# Collect the labels in a single pass over the cells
+raw_names_by_sheet = scan_workbook(data, [FormattedLabelExtractor(min_column_per_sheet=min_column_per_sheet)])["labels"]
 
 # Save the results to a new JSON file
 with open(output_file_path, 'w', encoding='utf-8') as file:
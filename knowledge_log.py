@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+
+from compact_store import atomic_write
+
+# New knowledge base entries are committed every CHECKPOINT_EVERY appends
+# (and when the log is closed)
+CHECKPOINT_EVERY = 10
+
+ENTRIES_FILE = "knowledge_base.log.jsonl"
+EMBEDDINGS_FILE = "knowledge_base.log.f32"
+CHECKPOINT_FILE = "knowledge_base.log.checkpoint.json"
+
+class EntryLog:
+    """
+    Append-only log of new knowledge base entries, so a long build survives
+    a crash or an API outage.
+
+    Each entry is one JSON line (without its embedding) in ENTRIES_FILE, and
+    its embedding is appended as raw float32 to EMBEDDINGS_FILE; line i goes
+    with vector i. A checkpoint fsyncs both files and records their lengths.
+    On open, anything past the last checkpoint (a half-written entry) is
+    truncated away and the committed entries can be replayed with entries().
+    compact() folds the log into knowledge_base.json and removes it.
+    """
+
+    def __init__(self, output_dir, checkpoint_every=CHECKPOINT_EVERY):
+        self.output_dir = output_dir
+        self.checkpoint_every = checkpoint_every
+        self.entries_path = os.path.join(output_dir, ENTRIES_FILE)
+        self.embeddings_path = os.path.join(output_dir, EMBEDDINGS_FILE)
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+
+        checkpoint = {"entries": 0, "entries_bytes": 0, "embeddings_bytes": 0, "dim": None}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        self.committed = checkpoint["entries"]
+        self.dim = checkpoint["dim"]
+        self.pending = 0
+
+        # Drop whatever was written after the last checkpoint
+        self._entries_file = self._open_at(self.entries_path, checkpoint["entries_bytes"])
+        self._embeddings_file = self._open_at(self.embeddings_path, checkpoint["embeddings_bytes"])
+
+    @staticmethod
+    def _open_at(path, size):
+        f = open(path, "ab")
+        f.truncate(size)
+        f.seek(size)
+        return f
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.committed + self.pending
+
+    def entries(self):
+        """Yields the committed entries, embeddings included, in append order."""
+        if not self.committed:
+            return
+        vectors = np.fromfile(self.embeddings_path, dtype=np.float32,
+                              count=self.committed * self.dim).reshape(self.committed, self.dim)
+        with open(self.entries_path, "r", encoding='utf-8') as f:
+            for line, vector in zip(f, vectors):
+                entry = json.loads(line)
+                entry["embedding"] = vector.tolist()
+                yield entry
+
+    def append(self, entry):
+        """Appends one entry; it is committed at the next checkpoint."""
+        embedding = np.asarray(entry["embedding"], dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(embedding.shape[0])
+        elif embedding.shape[0] != self.dim:
+            raise ValueError(f"Embedding has {embedding.shape[0]} dimensions, the log holds {self.dim}")
+        record = {key: value for key, value in entry.items() if key != "embedding"}
+        self._embeddings_file.write(embedding.tobytes())
+        self._entries_file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.pending += 1
+        if self.pending >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Commits every appended entry: flushes and fsyncs the log, then records its length."""
+        if not self.pending:
+            return
+        for f in (self._embeddings_file, self._entries_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self.committed += self.pending
+        self.pending = 0
+        with atomic_write(self.checkpoint_path) as f:
+            json.dump({"entries": self.committed, "entries_bytes": self._entries_file.tell(),
+                       "embeddings_bytes": self._embeddings_file.tell(), "dim": self.dim}, f)
+
+    def close(self):
+        self.checkpoint()
+        self._entries_file.close()
+        self._embeddings_file.close()
+
+    def clear(self):
+        """Removes the log once its entries are in the compacted knowledge base."""
+        self._entries_file.close()
+        self._embeddings_file.close()
+        for path in (self.checkpoint_path, self.entries_path, self.embeddings_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.committed = self.pending = 0
+
+def compact(knowledge_base, output_path, log):
+    """
+    Writes the full knowledge base (already containing the log's entries)
+    atomically to output_path, then clears the log.
+    """
+    log.checkpoint()
+    with atomic_write(output_path) as f:
+        json.dump(knowledge_base, f, indent=2)
+    log.clear()
@@ -1,20 +1,21 @@
 import json
 import os
 from collections import defaultdict
-from dotenv import load_dotenv
-from xai_sdk import Client
-from xai_sdk.chat import user, system
-from sentence_transformers import SentenceTransformer
+
+from profiling import stage, count, timed, configure_from_env, print_report, save_report
+from compact_store import save_document
+from xlsx_reader import load_workbook_source
 
 # Import the formula parsing function from your other script
 from formulas_extraction import get_absolute_references
 
-# Path to your existing JSON
-input_path = "/Users/joshualevi/git_projects/playground_reg/jsonformatter.JSON"
+# Path to your existing JSON or .xlsx workbook (pipeline.py passes its own paths)
+input_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jsonformatter.JSON")
 
-# Load JSON
-with open(input_path, "r", encoding='utf-8') as f:
-    data = json.load(f)
+# Formats meta_data is written in: "json" (meta_data.json), "compact" (meta_data.mdb)
+# and/or "sqlite" (meta_data.sqlite, the indexed store in metadata_store.py).
+# Nothing reads the compact file yet (only benchmark_formats.py), so add it when needed.
+OUTPUT_FORMATS = ("json", "sqlite")
 
 # Configure filters
 IGNORE_HEADERS = {"Scenario Chosen"}
@@ -28,6 +29,10 @@ VALUE_COLUMN_EXCEPTIONS = {
 
 def get_ai_client(project_root):
     """Initializes and returns the X.AI client."""
+    # Imported here so runs that only hit the definitions cache never load the SDK
+    from dotenv import load_dotenv
+    from xai_sdk import Client
+
     dotenv_path = os.path.join(project_root, '.env')
  
     if not os.path.exists(dotenv_path):
@@ -42,6 +47,7 @@ def get_ai_client(project_root):
 
 def get_definition(client, term, table_name, sheet_name):
     """Gets a definition for a financial term from the AI."""
+    from xai_sdk.chat import user, system
     try:
         chat = client.chat.create(model="grok-3-mini")
         chat.append(system(
@@ -89,7 +95,17 @@ def r1c1_to_a1(r: int, c: int) -> str:
     return f"{col_num_to_letter(c)}{r}"
 
 def load_existing_definitions_cache(path):
-    """Loads existing metadata to create a cache of definitions and embeddings."""
+    """
+    Loads existing metadata to create a cache of definitions and embeddings.
+    Reads the SQLite store next to path when it is up to date with the JSON
+    (a single indexed query), and the JSON otherwise.
+    """
+    from metadata_store import MetadataStore, current_store
+    store_path = current_store(path)
+    if store_path:
+        with MetadataStore(store_path) as store:
+            return store.definitions_cache()
+
     cache = {}
     if not os.path.exists(path):
         return cache
@@ -109,187 +125,265 @@ def load_existing_definitions_cache(path):
         print(f"Warning: Could not load or parse existing metadata for caching. Error: {e}")
     return cache
 
-def main():
+def a1_to_coords(a1_ref: str):
+    """Convert an A1 cell reference (e.g. "F13") to 0-based (row, col) indexes."""
+    letters = a1_ref.rstrip("0123456789")
+    col = 0
+    for char in letters.upper():
+        col = col * 26 + (ord(char) - ord('A') + 1)
+    return int(a1_ref[len(letters):]) - 1, col - 1
+
+def table_header_name(cell):
+    """Returns the table name if the cell is a table header (white on blue), else ""."""
+    fmt = cell.get("format", {})
+    font = fmt.get("font", {})
+    if fmt.get("backgroundColor") == "#3366FF" and font.get("color") == "#FFFFFF":
+        name = safe_name(cell.get("formulaR1C1"))
+        if name and name not in IGNORE_HEADERS:
+            return name
+    return ""
+
+def extract_tables(data):
     """
-    Loads raw cell data, parses tables and rows, finds formula dependencies,
-    generates definitions and embeddings, and saves the complete metadata
-    to a single JSON file.
+    Finds the tables on every sheet (blue header cells) and the named rows in
+    each table, with the source cell, formula and unit of every row.
+
+    Returns:
+        dict: sheet -> {"tables": {table -> {"row numbers", "column numbers", "rows"}}}.
     """
-    sheets_dict = {}
+    # The cell walk lives in extraction.py, which builds on this module's helpers
+    from extraction import scan_workbook, TableExtractor
+    return scan_workbook(data, [TableExtractor()])["tables"]
 
-    # Define output path early for caching
-    output_path = os.path.join(os.path.dirname(input_path), "meta_data.json")
+def build_sheet_tables(sheet_name, cell_map, row_cols, max_row, header_positions):
+    """
+    Builds one sheet's tables from its cell lookups and header cells.
 
-    # --- Setup for definitions and embeddings ---
-    print("Initializing AI client model...")
-    project_root = os.path.dirname(input_path)
-    ai_client = get_ai_client(project_root)
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    print(f"Checking for existing data in {output_path} to build cache...")
-    definitions_cache = load_existing_definitions_cache(output_path)
-    print(f"Found {len(definitions_cache)} cached definitions.")
+    Args:
+        sheet_name (str): The sheet, used to pick its value column.
+        cell_map (dict): (row, col) -> cell.
+        row_cols (dict): row -> set of columns present.
+        max_row (int): Last row with a cell.
+        header_positions (list): (row, col, name) of every table header.
 
-    if "worksheets" in data:
-        for ws in data["worksheets"]:
-            sheet_name = ws.get("name")
-            if not sheet_name:
+    Returns:
+        dict: table -> {"row numbers", "column numbers", "rows"}.
+    """
+    count("tables found", len(header_positions))
+
+    # If no headers, still return empty tables for the sheet
+    if not header_positions:
+        return {}
+
+    headers_by_row = defaultdict(list)
+    for r, c, name in header_positions:
+        headers_by_row[r].append((c, name))
+
+    # Sort headers for deterministic processing
+    for r in headers_by_row:
+        headers_by_row[r].sort(key=lambda x: x[0])  # by column
+    header_positions = sorted(header_positions, key=lambda x: (x[0], x[1]))  # by row, then col
+
+    # For height: precompute list of header rows
+    header_rows_sorted = sorted(headers_by_row.keys())
+
+    tables = {}
+
+    for r, c, name in header_positions:
+        # ---- HEIGHT (rows) ----
+        next_header_row = None
+        for hr in header_rows_sorted:
+            if hr > r:
+                next_header_row = hr
+                break
+
+        if next_header_row is not None:
+            height = next_header_row - r
+        else:
+            last_row_with_cells = max(row_cols.keys()) if row_cols else r
+            height = (last_row_with_cells - r + 1)
+
+        if height < 1:
+            height = 1
+
+        # ---- WIDTH (columns) ----
+        table_start_row = r
+        table_end_row = next_header_row if next_header_row is not None else max_row + 1
+
+        max_col_in_table = c
+        for row_idx in range(table_start_row, table_end_row):
+            if row_idx in row_cols and row_cols[row_idx]:
+                max_col_in_row = max(row_cols[row_idx])
+                if max_col_in_row > max_col_in_table:
+                    max_col_in_table = max_col_in_row
+
+        width = max_col_in_table - c + 1
+        if width < 1:
+            width = 1
+
+        # ---- EXTRACT ROW-LEVEL DATA ----
+        row_data = {}
+        for current_r in range(table_start_row + 1, table_end_row):
+            row_name_cell = cell_map.get((current_r, 1))
+            row_name_val = safe_name(row_name_cell.get("formulaR1C1") if row_name_cell else None)
+
+            if not row_name_val:
                 continue
 
-            cells = ws.get("cells", {})
-
-            # Build fast lookups
-            cell_map = {}              # (row, col) -> cell
-            row_cols = defaultdict(set) # row -> set of columns present
-            max_row = 0
-
-            for _, cell in cells.items():
-                r = cell.get("rowIndex")
-                c = cell.get("columnIndex")
-                if r is None or c is None:
-                    continue
-                cell_map[(r, c)] = cell
-                row_cols[r].add(c)
-                if r > max_row:
-                    max_row = r
-
-            # Collect headers: dict row -> sorted list of (col, name)
-            headers_by_row = defaultdict(list)
-            header_positions = []  # list of (row, col, name)
-
-            for (r, c), cell in cell_map.items():
-                fmt = cell.get("format", {})
-                font = fmt.get("font", {})
-                if fmt.get("backgroundColor") == "#3366FF" and font.get("color") == "#FFFFFF":
-                    name = safe_name(cell.get("formulaR1C1"))
-                    if not name or name in IGNORE_HEADERS:
-                        continue
-                    headers_by_row[r].append((c, name))
-                    header_positions.append((r, c, name))
-
-            # If no headers, still return empty tables for the sheet
-            if not header_positions:
-                sheets_dict[sheet_name] = {"tables": {}}
-                continue
+            extra_info_cell = cell_map.get((current_r, 2))
+            extra_info_val = safe_name(extra_info_cell.get("formulaR1C1") if extra_info_cell else None)
+
+            value_col_index = VALUE_COLUMN_EXCEPTIONS.get(sheet_name, DEFAULT_VALUE_COLUMN)
 
-            # Sort headers for deterministic processing
-            for r in headers_by_row:
-                headers_by_row[r].sort(key=lambda x: x[0])  # by column
-            header_positions.sort(key=lambda x: (x[0], x[1]))  # by row, then col
+            main_value_cell = cell_map.get((current_r, value_col_index))
+            main_value_formula = safe_name(main_value_cell.get("formulaR1C1") if main_value_cell else None, allow_formulas=True)
 
-            # For height: precompute list of header rows
-            header_rows_sorted = sorted(headers_by_row.keys())
+            if main_value_cell:
+                a1_ref = r1c1_to_a1(main_value_cell.get("rowIndex") + 1, main_value_cell.get("columnIndex") + 1)
+            else:
+                a1_ref = None
 
-            tables = {}
+            row_key = disambiguate(row_name_val, row_data)
+            row_data[row_key] = {
+                "source_cell": a1_ref,
+                "R1C1": main_value_formula,
+                "extra info": extra_info_val,
+                # The row name before disambiguation; definitions are cached under it
+                "_term": row_name_val,
+            }
 
-            for r, c, name in header_positions:
-                # ---- HEIGHT (rows) ----
-                next_header_row = None
-                for hr in header_rows_sorted:
-                    if hr > r:
-                        next_header_row = hr
-                        break
+        key = disambiguate(name, tables)
+        tables[key] = {
+            "row numbers": height,
+            "column numbers": width,
+            "rows": row_data
+        }
 
-                if next_header_row is not None:
-                    height = next_header_row - r
+    return tables
+
+def add_dependencies(sheets_dict, parse_cache=None):
+    """
+    Parses each row's formula and adds its absolute cell references as 'dependencies'.
+
+    Args:
+        sheets_dict (dict): Output of extract_tables.
+        parse_cache (dict): Optional (formula, row, col) -> references cache,
+            shared between workbooks built from the same template (batch_pipeline.py).
+    """
+    for sheet_name, sheet_data in sheets_dict.items():
+        add_sheet_dependencies(sheet_name, sheet_data["tables"], parse_cache)
+    return sheets_dict
+
+def add_sheet_dependencies(sheet_name, tables, parse_cache=None):
+    """Adds 'dependencies' to the rows of one sheet's tables."""
+    for table_data in tables.values():
+        for row_item_data in table_data["rows"].values():
+            dependencies = []
+            formula = row_item_data.get("R1C1")
+            a1_ref = row_item_data.get("source_cell")
+            if formula and isinstance(formula, str) and formula.startswith("=") and a1_ref:
+                cell_row, cell_col = a1_to_coords(a1_ref)
+                cache_key = (formula, cell_row, cell_col)
+                if parse_cache is not None and cache_key in parse_cache:
+                    absolute_refs = parse_cache[cache_key]
+                    count("formula parse cache hits")
                 else:
-                    last_row_with_cells = max(row_cols.keys()) if row_cols else r
-                    height = (last_row_with_cells - r + 1)
-
-                if height < 1:
-                    height = 1
-
-                # ---- WIDTH (columns) ----
-                table_start_row = r
-                table_end_row = next_header_row if next_header_row is not None else max_row + 1
-                
-                max_col_in_table = c
-                for row_idx in range(table_start_row, table_end_row):
-                    if row_idx in row_cols and row_cols[row_idx]:
-                        max_col_in_row = max(row_cols[row_idx])
-                        if max_col_in_row > max_col_in_table:
-                            max_col_in_table = max_col_in_row
-                
-                width = max_col_in_table - c + 1
-                if width < 1:
-                    width = 1
-
-                # ---- EXTRACT ROW-LEVEL DATA AND DEPENDENCIES ----
-                row_data = {}
-                for current_r in range(table_start_row + 1, table_end_row):
-                    row_name_cell = cell_map.get((current_r, 1))
-                    row_name_val = safe_name(row_name_cell.get("formulaR1C1") if row_name_cell else None)
-
-                    if not row_name_val:
-                        continue
-
-                    extra_info_cell = cell_map.get((current_r, 2))
-                    extra_info_val = safe_name(extra_info_cell.get("formulaR1C1") if extra_info_cell else None)
-
-                    value_col_index = VALUE_COLUMN_EXCEPTIONS.get(sheet_name, DEFAULT_VALUE_COLUMN)
-                    
-                    main_value_cell = cell_map.get((current_r, value_col_index))
-                    main_value_formula = safe_name(main_value_cell.get("formulaR1C1") if main_value_cell else None, allow_formulas=True)
-
-                    if main_value_cell:
-                        cell_row = main_value_cell.get("rowIndex")
-                        cell_col = main_value_cell.get("columnIndex")
-                        a1_ref = r1c1_to_a1(cell_row + 1, cell_col + 1)
-                    else:
-                        a1_ref, cell_row, cell_col = None, None, None
+                    absolute_refs = get_absolute_references(formula, cell_row, cell_col)
+                    count("formulas parsed")
+                    if parse_cache is not None:
+                        parse_cache[cache_key] = absolute_refs
+                count("references found", len(absolute_refs))
+                for dep in absolute_refs:
+                    # If a reference has no sheet, it refers to the current sheet
+                    dep_sheet = dep[0] if dep[0] else sheet_name
+                    dependencies.append({"sheet": dep_sheet, "row": dep[1], "col": dep[2]})
+            row_item_data["dependencies"] = dependencies
+    return tables
+
+def add_definitions(sheets_dict, definitions_cache, project_root, store=None):
+    """
+    Adds a 'definition' to every row, from the cache when possible and from the
+    AI otherwise. The AI client is only created once a definition is missing.
 
-                    # --- Get definition and embedding ---
-                    definition = None                    
-                    cache_key = (sheet_name, name, row_name_val) # sheet_name, table_name, row_name
+    With a MetadataStore, every new definition is also written to the store
+    in its own transaction as soon as it arrives, so definitions fetched
+    before a crash are reused by the next run. Rows the store does not have
+    yet (new since it was built) are only in the returned document.
+    """
+    from metadata_store import store_definition
 
-                    if cache_key in definitions_cache:
-                        cached_item = definitions_cache[cache_key]
-                        definition = cached_item.get("definition")                       
-                        # print(f"  - Using cached definition for '{row_name_val}'")
-                    else:
-                        print(f"  - Processing (new): '{row_name_val}' from sheet: '{sheet_name}', table: '{name}'")
-                        definition = get_definition(ai_client, row_name_val, name, sheet_name)
-                        if definition:
-                            print(f"    -> Definition: {definition[:50]}...")                            
-                        else:
-                            print(f"    -> Failed to get definition for '{row_name_val}'. Skipping.")
-
-                    # --- PARSE FORMULA DEPENDENCIES ---
-                    dependencies = []
-                    if main_value_formula and isinstance(main_value_formula, str) and main_value_formula.startswith("="):
-                        if cell_row is not None and cell_col is not None:
-                            absolute_refs = get_absolute_references(main_value_formula, cell_row, cell_col)
-                            for dep in absolute_refs:
-                                # If a reference has no sheet, it refers to the current sheet
-                                dep_sheet = dep[0] if dep[0] else sheet_name
-                                dependencies.append({"sheet": dep_sheet, "row": dep[1], "col": dep[2]})
-
-                    row_item_data = {
-                        "source_cell": a1_ref,
-                        "R1C1": main_value_formula,
-                        "extra info": extra_info_val,
-                    }
+    ai_client = None
+
+    for sheet_name, sheet_data in sheets_dict.items():
+        for name, table_data in sheet_data["tables"].items():
+            for row_item_data in table_data["rows"].values():
+                row_name_val = row_item_data.pop("_term")
+                dependencies = row_item_data.pop("dependencies", None)
+
+                definition = None
+                cache_key = (sheet_name, name, row_name_val) # sheet_name, table_name, row_name
 
+                if cache_key in definitions_cache:
+                    definition = definitions_cache[cache_key].get("definition")
+                    count("definition cache hits")
+                else:
+                    count("definition cache misses")
+                    print(f"  - Processing (new): '{row_name_val}' from sheet: '{sheet_name}', table: '{name}'")
+                    if ai_client is None:
+                        print("Initializing AI client...")
+                        ai_client = get_ai_client(project_root)
+                    with timed("definition API call"):
+                        definition = get_definition(ai_client, row_name_val, name, sheet_name)
+                    count("API calls")
                     if definition:
-                        row_item_data["definition"] = definition
-                    row_item_data['dependencies'] = dependencies
+                        print(f"    -> Definition: {definition[:50]}...")
+                        if store is not None:
+                            store_definition(store, sheet_name, name, row_name_val, definition)
+                    else:
+                        print(f"    -> Failed to get definition for '{row_name_val}'. Skipping.")
 
-                    row_key = disambiguate(row_name_val, row_data)
-                    row_data[row_key] = row_item_data
+                if definition:
+                    row_item_data["definition"] = definition
+                if dependencies is not None:
+                    row_item_data["dependencies"] = dependencies
+    return sheets_dict
 
-                key = disambiguate(name, tables)
-                tables[key] = {
-                    "row numbers": height,
-                    "column numbers": width,
-                    "rows": row_data
-                }
+def main():
+    """
+    Loads raw cell data, parses tables and rows, finds formula dependencies,
+    generates definitions, and saves the complete metadata to a single JSON file.
+    """
+    # Define output path early for caching
+    output_path = os.path.join(os.path.dirname(input_path), "meta_data.json")
+    project_root = os.path.dirname(input_path)
+
+    report_path = configure_from_env()
+
+    # An .xlsx input is streamed: its sheets are read during table detection
+    with stage("workbook load"):
+        data = load_workbook_source(input_path, streaming=True)
+
+    print(f"Checking for existing data in {output_path} to build cache...")
+    with stage("definitions cache load"):
+        definitions_cache = load_existing_definitions_cache(output_path)
+    print(f"Found {len(definitions_cache)} cached definitions.")
 
-            sheets_dict[sheet_name] = {"tables": tables}
+    with stage("table detection"):
+        sheets_dict = extract_tables(data)
+    with stage("formula parsing"):
+        add_dependencies(sheets_dict)
+    from metadata_store import open_current_store
+    with stage("definitions"):
+        with open_current_store(output_path) as store:
+            add_definitions(sheets_dict, definitions_cache, project_root, store)
 
-    with open(output_path, "w", encoding='utf-8') as f:
-        json.dump(sheets_dict, f, indent=2)
+    with stage("save"):
+        save_document(sheets_dict, output_path, "meta_data", OUTPUT_FORMATS)
 
     print(f"✅ Metadata with dependencies saved to {output_path}")
+    print_report()
+    if report_path:
+        print(f"Run report saved to {save_report(report_path)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
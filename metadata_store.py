@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from metadata_generator import a1_to_coords
+
+SQLITE_EXTENSION = ".sqlite"
+
+# Bumped when SCHEMA changes; stores of another version are rebuilt
+STORE_VERSION = 2
+
+# Row names are read from column B (metadata_generator.build_sheet_tables),
+# where a table's "column numbers" start
+NAME_COLUMN = 1
+
+# Positions keep the sheet/table/row order of meta_data.json, so the store
+# round-trips to the same document. Dependencies point at 0-based cells and
+# row_index is the 0-based sheet row of a row's source cell.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tables (
+    id INTEGER PRIMARY KEY,
+    sheet_id INTEGER NOT NULL REFERENCES sheets(id),
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    row_count INTEGER,
+    column_count INTEGER,
+    UNIQUE (sheet_id, name)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY,
+    table_id INTEGER NOT NULL REFERENCES tables(id),
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    source_cell TEXT,
+    row_index INTEGER,
+    formula TEXT,
+    extra_info TEXT,
+    definition TEXT,
+    has_dependencies INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (table_id, name)
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    row_id INTEGER NOT NULL REFERENCES rows(id),
+    position INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rows_by_position ON rows (row_index, table_id);
+CREATE INDEX IF NOT EXISTS rows_by_name ON rows (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS dependencies_by_row ON dependencies (row_id, position);
+CREATE INDEX IF NOT EXISTS dependencies_by_cell ON dependencies (sheet, row, col);
+"""
+
+# Columns of a row lookup, joined with its table and sheet
+ROW_QUERY = """
+SELECT rows.id, sheets.name, tables.name, rows.name, rows.source_cell, rows.formula,
+       rows.extra_info, rows.definition
+FROM rows JOIN tables ON tables.id = rows.table_id JOIN sheets ON sheets.id = tables.sheet_id
+"""
+
+def sqlite_path(json_path):
+    """meta_data.json -> meta_data.sqlite"""
+    return os.path.splitext(json_path)[0] + SQLITE_EXTENSION
+
+def current_store(json_path):
+    """
+    The SQLite store next to json_path if it is at least as new as the JSON
+    and has the current STORE_VERSION, else None. meta_data.json is tracked
+    in git and the store is not, so a pull or a hand edit leaves an older
+    store behind that must not be read.
+    """
+    path = sqlite_path(json_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(json_path) and os.path.getmtime(path) < os.path.getmtime(json_path):
+        return None
+    connection = sqlite3.connect(path)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        connection.close()
+    return path if version == STORE_VERSION else None
+
+@contextmanager
+def open_current_store(json_path):
+    """Opens the up-to-date store next to json_path (see current_store), or yields None."""
+    path = current_store(json_path)
+    if path is None:
+        yield None
+        return
+    with MetadataStore(path) as store:
+        yield store
+
+def store_definition(store, sheet, table, row, definition):
+    """set_definition, skipping rows the store does not have. Returns whether the row was updated."""
+    try:
+        store.set_definition(sheet, table, row, definition)
+    except KeyError:
+        return False
+    return True
+
+def _row_record(row):
+    row_id, sheet, table, name, source_cell, formula, extra_info, definition = row
+    return {"id": row_id, "sheet": sheet, "table": table, "row": name, "source_cell": source_cell,
+            "R1C1": formula, "extra info": extra_info, "definition": definition}
+
+class MetadataStore:
+    """
+    meta_data in an indexed SQLite database: lookups by cell, term, table or
+    sheet use indexes instead of walking the nested JSON, and row updates are
+    single transactions instead of rewriting the whole file.
+
+        with MetadataStore("meta_data.sqlite") as store:
+            store.row_at("debt", "F11")
+            store.set_definition("debt", "Debt Repayment Schedule", "Interest", "...")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # --- Writing ---
+
+    def replace_all(self, meta_data):
+        """Replaces the whole store with a meta_data document, in one transaction."""
+        with self.connection:
+            for table in ("dependencies", "rows", "tables", "sheets"):
+                self.connection.execute(f"DELETE FROM {table}")
+            self.connection.execute(f"PRAGMA user_version = {STORE_VERSION}")
+            for sheet_position, (sheet_name, sheet_data) in enumerate(meta_data.items()):
+                sheet_id = self.connection.execute(
+                    "INSERT INTO sheets (name, position) VALUES (?, ?)", (sheet_name, sheet_position)).lastrowid
+                for table_position, (table_name, table_data) in enumerate(sheet_data.get("tables", {}).items()):
+                    self._insert_table(sheet_id, table_position, table_name, table_data)
+
+    def _insert_table(self, sheet_id, position, table_name, table_data):
+        table_id = self.connection.execute(
+            "INSERT INTO tables (sheet_id, name, position, row_count, column_count) VALUES (?, ?, ?, ?, ?)",
+            (sheet_id, table_name, position, table_data.get("row numbers"), table_data.get("column numbers"))).lastrowid
+        dependencies = []
+        for row_position, (row_name, row_data) in enumerate(table_data.get("rows", {}).items()):
+            source_cell = row_data.get("source_cell")
+            row_id = self.connection.execute(
+                "INSERT INTO rows (table_id, name, position, source_cell, row_index, formula, extra_info, definition, "
+                "has_dependencies) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (table_id, row_name, row_position, source_cell, a1_to_coords(source_cell)[0] if source_cell else None,
+                 row_data.get("R1C1"), row_data.get("extra info"), row_data.get("definition"),
+                 int("dependencies" in row_data))).lastrowid
+            dependencies.extend((row_id, i, dep["sheet"], dep["row"], dep["col"])
+                                for i, dep in enumerate(row_data.get("dependencies", [])))
+        self.connection.executemany(
+            "INSERT INTO dependencies (row_id, position, sheet, row, col) VALUES (?, ?, ?, ?, ?)", dependencies)
+
+    def _row_id(self, sheet, table, row):
+        found = self.connection.execute(
+            "SELECT rows.id FROM rows JOIN tables ON tables.id = rows.table_id JOIN sheets ON sheets.id = tables.sheet_id "
+            "WHERE sheets.name = ? AND tables.name = ? AND rows.name = ?", (sheet, table, row)).fetchone()
+        if found is None:
+            raise KeyError(f"No row '{row}' in table '{table}' on sheet '{sheet}'")
+        return found[0]
+
+    def set_definition(self, sheet, table, row, definition):
+        """Updates one row's definition in its own transaction."""
+        row_id = self._row_id(sheet, table, row)
+        with self.connection:
+            self.connection.execute("UPDATE rows SET definition = ? WHERE id = ?", (definition, row_id))
+
+    def set_dependencies(self, sheet, table, row, dependencies):
+        """Replaces one row's dependencies ([{"sheet", "row", "col"}]) in its own transaction."""
+        row_id = self._row_id(sheet, table, row)
+        with self.connection:
+            self.connection.execute("DELETE FROM dependencies WHERE row_id = ?", (row_id,))
+            self.connection.executemany(
+                "INSERT INTO dependencies (row_id, position, sheet, row, col) VALUES (?, ?, ?, ?, ?)",
+                [(row_id, i, dep["sheet"], dep["row"], dep["col"]) for i, dep in enumerate(dependencies)])
+            self.connection.execute("UPDATE rows SET has_dependencies = 1 WHERE id = ?", (row_id,))
+
+    # --- Lookups ---
+
+    def sheets(self):
+        return [name for (name,) in self.connection.execute("SELECT name FROM sheets ORDER BY position")]
+
+    def tables(self, sheet):
+        """The tables of a sheet with their extents: [{"table", "row numbers", "column numbers"}]."""
+        return [{"table": name, "row numbers": row_count, "column numbers": column_count}
+                for name, row_count, column_count in self.connection.execute(
+                    "SELECT tables.name, row_count, column_count FROM tables JOIN sheets ON sheets.id = tables.sheet_id "
+                    "WHERE sheets.name = ? ORDER BY tables.position", (sheet,))]
+
+    def rows(self, sheet, table):
+        """The rows of one table, in order."""
+        return [_row_record(row) for row in self.connection.execute(
+            ROW_QUERY + "WHERE sheets.name = ? AND tables.name = ? ORDER BY rows.position", (sheet, table))]
+
+    def row_at(self, sheet, cell):
+        """
+        The row holding sheet!cell (e.g. "debt", "G11"), or None: the row on
+        that sheet row whose table's columns cover the cell, so every period
+        of a row resolves, not only its source cell.
+        """
+        r, c = a1_to_coords(cell)
+        row = self.connection.execute(
+            ROW_QUERY + "WHERE sheets.name = ? AND rows.row_index = ? "
+            "AND ? BETWEEN ? AND ? + COALESCE(tables.column_count, 1) - 1 ORDER BY tables.position",
+            (sheet, r, c, NAME_COLUMN, NAME_COLUMN)).fetchone()
+        return _row_record(row) if row else None
+
+    def find_term(self, term, exact=False):
+        """Rows named term (case-insensitive); with exact=False, rows whose name contains it."""
+        if exact:
+            query, value = ROW_QUERY + "WHERE rows.name = ? COLLATE NOCASE", term
+        else:
+            query, value = ROW_QUERY + "WHERE rows.name LIKE ? ESCAPE '\\'", \
+                "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return [_row_record(row) for row in self.connection.execute(query, (value,))]
+
+    def dependencies(self, row_id):
+        return [{"sheet": sheet, "row": row, "col": col} for sheet, row, col in self.connection.execute(
+            "SELECT sheet, row, col FROM dependencies WHERE row_id = ? ORDER BY position", (row_id,))]
+
+    def dependents(self, sheet, row, col):
+        """Rows whose formula references the 0-based cell (sheet, row, col)."""
+        return [_row_record(found) for found in self.connection.execute(
+            ROW_QUERY + "WHERE rows.id IN (SELECT row_id FROM dependencies WHERE sheet = ? AND row = ? AND col = ?)",
+            (sheet, row, col))]
+
+    def dependency_counts(self):
+        """(sheet, 0-based row, 0-based col) -> number of row formulas referencing it."""
+        return {(sheet, row, col): n for sheet, row, col, n in self.connection.execute(
+            "SELECT sheet, row, col, COUNT(*) FROM dependencies GROUP BY sheet, row, col")}
+
+    def rows_with_dependency_counts(self):
+        """(row, number of dependencies) for every row with a source cell."""
+        counts = dict(self.connection.execute("SELECT row_id, COUNT(*) FROM dependencies GROUP BY row_id"))
+        return [(record, counts.get(record["id"], 0)) for record in map(_row_record, self.connection.execute(
+            ROW_QUERY + "WHERE rows.source_cell IS NOT NULL"))]
+
+    def definitions_cache(self):
+        """The (sheet, table, row) -> {"definition"} cache metadata_generator reuses definitions from."""
+        return {(sheet, table, row): {"definition": definition} for sheet, table, row, definition in
+                self.connection.execute(
+                    "SELECT sheets.name, tables.name, rows.name, rows.definition FROM rows "
+                    "JOIN tables ON tables.id = rows.table_id JOIN sheets ON sheets.id = tables.sheet_id "
+                    "WHERE rows.definition IS NOT NULL")}
+
+    def to_meta_data(self):
+        """The whole store as a meta_data document, equal to meta_data.json."""
+        dependencies = {}
+        for row_id, sheet, row, col in self.connection.execute(
+                "SELECT row_id, sheet, row, col FROM dependencies ORDER BY row_id, position"):
+            dependencies.setdefault(row_id, []).append({"sheet": sheet, "row": row, "col": col})
+
+        meta_data = {name: {"tables": {}} for name in self.sheets()}
+        tables = {}
+        for table_id, sheet, name, row_count, column_count in self.connection.execute(
+                "SELECT tables.id, sheets.name, tables.name, row_count, column_count FROM tables "
+                "JOIN sheets ON sheets.id = tables.sheet_id ORDER BY sheets.position, tables.position"):
+            tables[table_id] = meta_data[sheet]["tables"][name] = {
+                "row numbers": row_count, "column numbers": column_count, "rows": {}}
+        for row_id, table_id, name, source_cell, formula, extra_info, definition, has_dependencies in \
+                self.connection.execute(
+                    "SELECT id, table_id, name, source_cell, formula, extra_info, definition, has_dependencies "
+                    "FROM rows ORDER BY table_id, position"):
+            row = {"source_cell": source_cell, "R1C1": formula, "extra info": extra_info}
+            if definition is not None:
+                row["definition"] = definition
+            if has_dependencies:
+                row["dependencies"] = dependencies.get(row_id, [])
+            tables[table_id]["rows"][name] = row
+        return meta_data
+
+def save_sqlite(meta_data, path):
+    """
+    Writes meta_data to a new SQLite store and swaps it in atomically, so open
+    readers keep a consistent snapshot. Returns the file size in bytes.
+    """
+    tmp_path = f"{path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with MetadataStore(tmp_path) as store:
+        store.replace_all(meta_data)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the SQLite metadata store.")
+    parser.add_argument("--meta-data", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "meta_data.json"))
+    parser.add_argument("--build", action="store_true", help="(Re)build the store from meta_data.json")
+    parser.add_argument("--cell", nargs=2, metavar=("SHEET", "A1"), help="The row at a cell")
+    parser.add_argument("--term", help="Rows whose name contains this text")
+    args = parser.parse_args()
+
+    path = sqlite_path(args.meta_data)
+    # Rebuilt when missing or older than meta_data.json
+    if args.build or not current_store(args.meta_data):
+        with open(args.meta_data, "r", encoding='utf-8') as f:
+            meta_data = json.load(f)
+        print(f"✅ Metadata store saved to {path} ({save_sqlite(meta_data, path) / 1024:.0f} KB)")
+
+    with MetadataStore(path) as store:
+        found = []
+        if args.cell:
+            row = store.row_at(*args.cell)
+            found = [row] if row else []
+            if not found:
+                print(f"No row at {args.cell[0]}!{args.cell[1]}")
+        elif args.term:
+            found = store.find_term(args.term)
+        for row in found:
+            print(f"{row['sheet']} / {row['table']} / {row['row']} ({row['source_cell']}): {row['R1C1']}")
+
+if __name__ == "__main__":
+    main()
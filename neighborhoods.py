@@ -0,0 +1,123 @@
+import json
+import os
+from collections import defaultdict, deque
+
+from compact_store import atomic_write
+from metadata_generator import a1_to_coords, r1c1_to_a1
+from profiling import stage, count
+
+# How far precedents and dependents are followed, and how many of each are
+# kept per row (nearest first) so hub rows like the timeline stay small
+NEIGHBORHOOD_HOPS = 2
+MAX_NEIGHBORS = 25
+
+NEIGHBORHOODS_FILE = "neighborhoods.json"
+
+def cell_key(sheet, a1_ref):
+    """The 'sheet!A1' key the graph and neighbourhood files use."""
+    return f"{sheet}!{a1_ref}"
+
+def _row_nodes(meta_data):
+    """cell key -> row info, and (sheet, 0-based row) -> cell key of the named row on that row."""
+    nodes, by_row = {}, {}
+    for sheet_name, sheet in meta_data.items():
+        for table_name, table in sheet.get("tables", {}).items():
+            for row_name, row in table.get("rows", {}).items():
+                if not row.get("source_cell"):
+                    continue
+                key = cell_key(sheet_name, row["source_cell"])
+                nodes[key] = {"sheet": sheet_name, "table": table_name, "term": row_name,
+                              "formula": row.get("R1C1"), "dependencies": row.get("dependencies", [])}
+                by_row.setdefault((sheet_name, a1_to_coords(row["source_cell"])[0]), key)
+    return nodes, by_row
+
+def _nearest(adjacency, start, hops, limit):
+    """BFS from start: [(node, hops)] nearest first, without start, at most limit long."""
+    distances = {start: 0}
+    queue = deque([start])
+    found = []
+    while queue and len(found) < limit:
+        node = queue.popleft()
+        if distances[node] >= hops:
+            continue
+        for neighbour in adjacency.get(node, ()):
+            if neighbour not in distances:
+                distances[neighbour] = distances[node] + 1
+                found.append((neighbour, distances[neighbour]))
+                queue.append(neighbour)
+                if len(found) >= limit:
+                    break
+    return found
+
+def build_neighborhoods(meta_data, hops=NEIGHBORHOOD_HOPS, limit=MAX_NEIGHBORS):
+    """
+    Precomputes every row's precedents and dependents up to `hops` away.
+
+    Works at row level: a reference to any cell of a named row (its value
+    column or its timeline) links to that row. References to cells outside
+    every named row are kept as plain cells without a term, and are not
+    followed further.
+
+    Returns:
+        dict: 'sheet!A1' of each row's source cell -> {"sheet", "table", "term",
+        "formula", "precedents", "dependents"}, where precedents and dependents
+        are [{"cell", "hops", "sheet", "table", "term", "formula"}] lists, nearest first.
+    """
+    nodes, by_row = _row_nodes(meta_data)
+    precedents, dependents = defaultdict(list), defaultdict(list)
+    with stage("neighborhood edges"):
+        for key, node in nodes.items():
+            seen = {key}
+            for dep in node["dependencies"]:
+                target = by_row.get((dep["sheet"], dep["row"])) or cell_key(dep["sheet"], r1c1_to_a1(dep["row"] + 1, dep["col"] + 1))
+                if target in seen:
+                    continue
+                seen.add(target)
+                precedents[key].append(target)
+                dependents[target].append(key)
+
+    def describe(key, distance):
+        node = nodes.get(key)
+        if node is None:
+            sheet = key.rpartition("!")[0]
+            return {"cell": key, "hops": distance, "sheet": sheet, "table": None, "term": None, "formula": None}
+        return {"cell": key, "hops": distance, "sheet": node["sheet"], "table": node["table"],
+                "term": node["term"], "formula": node["formula"]}
+
+    neighborhoods = {}
+    with stage("neighborhoods"):
+        for key, node in nodes.items():
+            neighborhoods[key] = {
+                "sheet": node["sheet"], "table": node["table"], "term": node["term"], "formula": node["formula"],
+                "precedents": [describe(k, d) for k, d in _nearest(precedents, key, hops, limit)],
+                "dependents": [describe(k, d) for k, d in _nearest(dependents, key, hops, limit)],
+            }
+    count("neighborhoods", len(neighborhoods))
+    return neighborhoods
+
+def save_neighborhoods(neighborhoods, output_dir):
+    path = os.path.join(output_dir, NEIGHBORHOODS_FILE)
+    with atomic_write(path) as f:
+        json.dump(neighborhoods, f, indent=2)
+    return path
+
+def load_neighborhoods(output_dir):
+    """Loads the neighbourhood cache saved next to the knowledge base, or None if it has not been built."""
+    path = os.path.join(output_dir, NEIGHBORHOODS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+def attach_neighborhoods(results, neighborhoods):
+    """
+    Adds each search result's formula, precedents and dependents from the
+    neighbourhood cache (one dict lookup per result). Results without a
+    cached neighbourhood get empty lists.
+    """
+    for result in results:
+        neighborhood = neighborhoods.get(cell_key(result.get("source_sheet"), result.get("source_cell")), {})
+        result["formula"] = neighborhood.get("formula")
+        result["precedents"] = neighborhood.get("precedents", [])
+        result["dependents"] = neighborhood.get("dependents", [])
+    return results
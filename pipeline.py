@@ -0,0 +1,344 @@
+import argparse
+import copy
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import pickle
+import time
+
+import metadata_generator
+import build_knowledge_base
+from embedding_quantization import save_quantized_embeddings
+from encoders import selected_backend, entry_backend
+import profiling
+from compact_store import save_document, atomic_write
+from xlsx_reader import load_workbook_source
+from neighborhoods import build_neighborhoods, save_neighborhoods, NEIGHBORHOODS_FILE
+from formula_audit import audit_workbook, save_audit, AUDIT_FILE
+from metadata_store import open_current_store
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+CACHE_DIR_NAME = ".pipeline_cache"
+
+def load_script(relative_path, module_name):
+    """Imports a script that lives outside the project root's import path (e.g. 'script folder/graph/graph.py')."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PROJECT_ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def output_hash(output):
+    return hashlib.sha1(pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+# --- Stages ---
+# Each stage receives the run context and its upstream outputs, and returns its output.
+
+def stage_load(ctx):
+    return load_workbook_source(ctx["export_path"])
+
+def sheet_hash(worksheet):
+    return hashlib.sha1(json.dumps(worksheet.get("cells", {}), separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def stage_tables(ctx, data):
+    """
+    Extracts the tables of every sheet, reusing the previous run's tables for
+    sheets whose cells did not change. Sheets are independent here, so a new
+    export with one edited sheet only rescans that sheet. Sheets are keyed by
+    their cell hash and the stage version, and forcing the stage rescans all
+    of them.
+    """
+    sheet_cache_path = os.path.join(ctx["cache_dir"], "sheet_tables.pkl")
+    previous = {}
+    if os.path.exists(sheet_cache_path) and "tables" not in ctx["force"]:
+        with open(sheet_cache_path, "rb") as f:
+            previous = pickle.load(f)
+
+    version = next(stage["version"] for stage in STAGES if stage["name"] == "tables")
+    hashes = {ws["name"]: f"{version}:{sheet_hash(ws)}" for ws in data.get("worksheets", []) if ws.get("name")}
+    changed = [ws for ws in data.get("worksheets", [])
+               if ws.get("name") and previous.get(ws["name"], (None,))[0] != hashes[ws["name"]]]
+    extracted = metadata_generator.extract_tables({"worksheets": changed})
+    print(f"  {len(changed)} of {len(hashes)} sheets rescanned: {', '.join(ws['name'] for ws in changed) or '-'}")
+    profiling.count("sheets reused", len(hashes) - len(changed))
+
+    # Sheets are cached as separate pickles, and fresh sheets go through the
+    # same round trip, so the output pickles (and hashes) the same whichever
+    # sheets were reused
+    blobs = {name: pickle.dumps(extracted[name], protocol=pickle.HIGHEST_PROTOCOL) if name in extracted
+             else previous[name][1] for name in hashes}
+    with atomic_write(sheet_cache_path, "wb") as f:
+        pickle.dump({name: (hashes[name], blobs[name]) for name in hashes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Keep the workbook's sheet order
+    return {name: pickle.loads(blobs[name]) for name in hashes}
+
+def stage_dependencies(ctx, tables):
+    return metadata_generator.add_dependencies(copy.deepcopy(tables), ctx.get("parse_cache"))
+
+def stage_graph(ctx, sheets):
+    graph_module = load_script(os.path.join("script folder", "graph", "graph.py"), "graph")
+    graph = graph_module.build_dependency_graph(sheets)
+    save_document(graph, ctx["paths"]["graph"], "graph", graph_module.OUTPUT_FORMATS)
+    return graph
+
+def stage_flow(ctx, sheets):
+    flow_module = load_script(os.path.join("script folder", "graph", "flow_graph.py"), "flow_graph")
+    flow = flow_module.build_flow_graph(sheets)
+    flow_module.save_flow_graph(flow, ctx["paths"]["flow_graph"])
+    return flow
+
+def stage_neighborhoods(ctx, sheets):
+    neighborhoods = build_neighborhoods(sheets)
+    save_neighborhoods(neighborhoods, os.path.dirname(ctx["paths"]["neighborhoods"]))
+    return neighborhoods
+
+def stage_audit(ctx, data, tables):
+    findings = audit_workbook(data, tables)
+    save_audit(findings, ctx["paths"]["formula_audit"])
+    return findings
+
+def stage_values(ctx, data, tables):
+    """
+    Evaluates the workbook, solving any circular references iteratively, and
+    records the computed value of every table row's source cell.
+    """
+    import formula_engine
+
+    plan = formula_engine.compile_workbook(data)
+    iteration = {}
+    grids = formula_engine.evaluate(plan, iteration=iteration)
+    for result in iteration.get("report", []):
+        if not result["converged"]:
+            sheet, r, c = result["cells"][0]
+            print(f"  - Circular block at {sheet}!{formula_engine.col_num_to_letter(c + 1)}{r + 1} "
+                  f"did not converge (max change {result['max_change']:.2e})")
+    values = {}
+    for sheet_name, sheet_data in tables.items():
+        if sheet_name not in grids:
+            continue
+        for table_name, table_data in sheet_data["tables"].items():
+            for row_name, row_data in table_data["rows"].items():
+                if not row_data.get("source_cell"):
+                    continue
+                value = formula_engine.get_value(grids, sheet_name, row_data["source_cell"])
+                if not math.isnan(value):
+                    values.setdefault(sheet_name, {}).setdefault(table_name, {})[row_name] = value
+    with atomic_write(ctx["paths"]["values"]) as f:
+        json.dump(values, f, indent=2)
+    return values
+
+def stage_definitions(ctx, sheets):
+    # This workbook's own definitions take precedence over ones shared by a batch run
+    definitions_cache = dict(ctx.get("definitions_cache", {}))
+    definitions_cache.update(metadata_generator.load_existing_definitions_cache(ctx["paths"]["meta_data"]))
+    # New definitions are committed to the SQLite store one row at a time as they arrive
+    with open_current_store(ctx["paths"]["meta_data"]) as store:
+        meta_data = metadata_generator.add_definitions(copy.deepcopy(sheets), definitions_cache,
+                                                       ctx["project_root"], store)
+    save_document(meta_data, ctx["paths"]["meta_data"], "meta_data", metadata_generator.OUTPUT_FORMATS)
+    return meta_data
+
+def definitions_complete(meta_data):
+    """Whether every named row got a definition; rows left without one (an API failure) are retried next run."""
+    return all("definition" in row for sheet in meta_data.values() for table in sheet.get("tables", {}).values()
+               for name, row in table.get("rows", {}).items() if name.strip())
+
+def stage_embeddings(ctx, meta_data):
+    """
+    Embeds every defined term with the selected backend, reusing existing
+    knowledge base entries whose definition and backend are unchanged.
+    """
+    _, kb_cache = build_knowledge_base.load_existing_knowledge_base(ctx["paths"]["knowledge_base"])
+    backend = selected_backend()
+    embedding_model = None
+    entries = []
+    for sheet_name, sheet_data in meta_data.items():
+        for table_name, table_data in sheet_data.get("tables", {}).items():
+            for row_name, row_data in table_data.get("rows", {}).items():
+                term = row_name.strip()
+                definition = row_data.get("definition")
+                if not term or not definition:
+                    continue
+                cached = kb_cache.get((term, table_name, sheet_name))
+                if cached and cached.get("definition") == definition and entry_backend(cached) == backend:
+                    embedding = cached["embedding"]
+                else:
+                    if embedding_model is None:
+                        embedding_model = build_knowledge_base.load_embedding_model(backend)
+                    embedding = embedding_model.encode(definition).tolist()
+                entries.append({
+                    "term": term,
+                    "source_sheet": sheet_name,
+                    "source_table": table_name,
+                    "source_cell": row_data.get("source_cell"),
+                    "definition": definition,
+                    "embedding": embedding,
+                    "encoder": backend,
+                })
+    return entries
+
+def stage_index(ctx, entries):
+    with atomic_write(ctx["paths"]["knowledge_base"]) as f:
+        json.dump(entries, f, indent=2)
+    if entries:
+        save_quantized_embeddings(os.path.dirname(ctx["paths"]["knowledge_base"]),
+                                  [item["embedding"] for item in entries],
+                                  build_knowledge_base.EMBEDDING_QUANTIZATION, encoder=entries[0]["encoder"])
+    return {"entries": len(entries)}
+
+# Stage declarations, in dependency order. Bump "version" when a stage's logic changes.
+# A stage with a "complete" check is rerun on the next run until its output passes it;
+# a stage's "config" (settings outside its inputs that change its output) is part of its cache key.
+STAGES = [
+    {"name": "load", "inputs": [], "run": stage_load, "version": 1, "artifacts": []},
+    {"name": "tables", "inputs": ["load"], "run": stage_tables, "version": 1, "artifacts": []},
+    {"name": "dependencies", "inputs": ["tables"], "run": stage_dependencies, "version": 1, "artifacts": []},
+    {"name": "graph", "inputs": ["dependencies"], "run": stage_graph, "version": 1, "artifacts": ["graph"]},
+    {"name": "flow", "inputs": ["dependencies"], "run": stage_flow, "version": 1, "artifacts": ["flow_graph"]},
+    {"name": "neighborhoods", "inputs": ["dependencies"], "run": stage_neighborhoods, "version": 1,
+     "artifacts": ["neighborhoods"]},
+    {"name": "audit", "inputs": ["load", "tables"], "run": stage_audit, "version": 1, "artifacts": ["formula_audit"]},
+    {"name": "values", "inputs": ["load", "tables"], "run": stage_values, "version": 2, "artifacts": ["values"]},
+    {"name": "definitions", "inputs": ["dependencies"], "run": stage_definitions, "version": 1, "artifacts": ["meta_data"],
+     "complete": definitions_complete},
+    {"name": "embeddings", "inputs": ["definitions"], "run": stage_embeddings, "version": 2, "artifacts": [],
+     "config": selected_backend},
+    {"name": "index", "inputs": ["embeddings"], "run": stage_index, "version": 1, "artifacts": ["knowledge_base"]},
+]
+
+def output_paths(output_dir):
+    return {
+        "meta_data": os.path.join(output_dir, "meta_data.json"),
+        "graph": os.path.join(output_dir, "graph", "dependency_graph.json"),
+        "flow_graph": os.path.join(output_dir, "graph", "flow_graph.json"),
+        "values": os.path.join(output_dir, "row_values.json"),
+        "formula_audit": os.path.join(output_dir, AUDIT_FILE),
+        "knowledge_base": os.path.join(output_dir, "knowledge_layer", "knowledge_base.json"),
+        "neighborhoods": os.path.join(output_dir, "knowledge_layer", NEIGHBORHOODS_FILE),
+    }
+
+def run_pipeline(export_path, output_dir=PROJECT_ROOT, force=(), until=None, shared=None):
+    """
+    Runs the pipeline stages in order, rerunning only stale ones.
+
+    A stage's cache key hashes its name, version, the output hashes of its
+    inputs (the export file's content hash for 'load') and its config, if
+    any (the embedding backend for 'embeddings'). When the key matches the
+    manifest and the stage's artifacts exist, the stage is skipped, and its
+    cached output is only unpickled if a downstream stage needs to run. Because
+    keys use output hashes, a stage whose upstream reran but produced the same
+    output stays cached.
+
+    Args:
+        export_path (str): Workbook export JSON or .xlsx file.
+        output_dir (str): Where meta_data.json, graph/ and knowledge_layer/ are written.
+        force (iterable): Stage names to rerun regardless of the cache.
+        until (str): Optional last stage to run.
+        shared (dict): Extra context from batch_pipeline.py: the "parse_cache"
+            and "definitions_cache" shared across workbooks (they only save
+            work, so they are not part of the stage cache keys) and the
+            "project_root" holding the .env file.
+
+    Returns:
+        list: One {"stage", "status", "seconds"} record per stage.
+    """
+    cache_dir = os.path.join(output_dir, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = output_paths(output_dir)
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    ctx = {"export_path": export_path, "project_root": output_dir, "paths": paths, "cache_dir": cache_dir,
+           "force": set(force), **(shared or {})}
+
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    stage_names = [stage["name"] for stage in STAGES]
+    selected = STAGES[:stage_names.index(until) + 1] if until else STAGES
+    hashes, outputs, report = {}, {}, []
+
+    def get_output(name):
+        # Cached outputs are only unpickled when a downstream stage has to run
+        if name not in outputs:
+            with open(os.path.join(cache_dir, manifest[name]["file"]), "rb") as f:
+                outputs[name] = pickle.load(f)
+        return outputs[name]
+
+    for stage in selected:
+        name = stage["name"]
+        started = time.perf_counter()
+        upstream = file_hash(export_path) if name == "load" else "|".join(hashes[i] for i in stage["inputs"])
+        if "config" in stage:
+            upstream += f"|{stage['config']()}"
+        key = hashlib.sha1(f"{name}:{stage['version']}:{upstream}".encode()).hexdigest()
+
+        entry = manifest.get(name, {})
+        fresh = (name not in force and entry.get("key") == key
+                 and os.path.exists(os.path.join(cache_dir, entry.get("file", "")))
+                 and all(os.path.exists(paths[artifact]) for artifact in stage["artifacts"]))
+        if fresh:
+            hashes[name] = entry["output_hash"]
+            report.append({"stage": name, "status": "cached", "seconds": time.perf_counter() - started})
+            continue
+
+        print(f"Running stage '{name}'...")
+        with profiling.stage(name):
+            output = stage["run"](ctx, *(get_output(i) for i in stage["inputs"]))
+        outputs[name] = output
+        hashes[name] = output_hash(output)
+
+        file_name = f"{name}-{key[:16]}.pkl"
+        with open(os.path.join(cache_dir, file_name), "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        old_file = entry.get("file")
+        if old_file and old_file != file_name and os.path.exists(os.path.join(cache_dir, old_file)):
+            os.remove(os.path.join(cache_dir, old_file))
+        # An incomplete output is kept for downstream stages but not reused as a cache hit
+        complete = stage.get("complete", lambda _: True)(output)
+        manifest[name] = {"key": key if complete else None, "output_hash": hashes[name], "file": file_name}
+        with atomic_write(manifest_path) as f:
+            json.dump(manifest, f, indent=2)
+
+        report.append({"stage": name, "status": "ran", "seconds": time.perf_counter() - started})
+
+    return report
+
+def print_report(report):
+    print(f"\n{'Stage':<15}{'Status':<10}{'Time':>10}")
+    for record in report:
+        print(f"{record['stage']:<15}{record['status']:<10}{record['seconds'] * 1000:>8.1f}ms")
+    print(f"{'Total':<25}{sum(r['seconds'] for r in report) * 1000:>8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the workbook → metadata → graph → knowledge base pipeline.")
+    parser.add_argument("export", nargs="?", default=os.path.join(PROJECT_ROOT, "jsonformatter.JSON"),
+                        help="Workbook export JSON or .xlsx file (default: jsonformatter.JSON in the project root)")
+    parser.add_argument("--output-dir", default=PROJECT_ROOT, help="Where to write the pipeline outputs")
+    parser.add_argument("--force", nargs="*", default=[], choices=[s["name"] for s in STAGES],
+                        help="Stages to rerun even if cached")
+    parser.add_argument("--until", choices=[s["name"] for s in STAGES], help="Last stage to run")
+    parser.add_argument("--profile-report", help="Write a JSON run report (stage timings, counters, latencies) here")
+    parser.add_argument("--profile-memory", action="store_true", help="Track each stage's peak memory with tracemalloc")
+    parser.add_argument("--cprofile", action="store_true", help="Include cProfile's top functions in the run report")
+    args = parser.parse_args()
+
+    profiling.reset(memory=args.profile_memory, cprofile=args.cprofile)
+    report = run_pipeline(os.path.abspath(args.export), os.path.abspath(args.output_dir), set(args.force), args.until)
+    print_report(report)
+    if args.profile_report:
+        profiling.print_report()
+        print(f"Run report saved to {profiling.save_report(args.profile_report)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Module-level run state. Scripts record into it through stage(), count() and
+# observe(); the calls cost a dict update, so they stay on in normal runs.
+_run = {
+    "started": time.perf_counter(),
+    "stages": {},                      # name -> {"seconds", "calls", "peak_mb"}
+    "counters": Counter(),             # name -> count
+    "latencies": defaultdict(list),    # name -> [seconds, ...]
+    "memory": False,
+    "profiler": None,
+}
+
+def reset(memory=False, cprofile=False):
+    """
+    Starts a new run report.
+
+    Args:
+        memory (bool): Track the peak traced memory of every stage with tracemalloc (slower).
+        cprofile (bool): Run cProfile for the whole run; its top functions go in the report.
+    """
+    if _run["profiler"] is not None:
+        _run["profiler"].disable()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    _run.update(started=time.perf_counter(), stages={}, counters=Counter(),
+                latencies=defaultdict(list), memory=memory, profiler=None)
+    if memory:
+        tracemalloc.start()
+    if cprofile:
+        _run["profiler"] = cProfile.Profile()
+        _run["profiler"].enable()
+
+@contextmanager
+def stage(name):
+    """Times a block of work under a stage name. Repeated stages accumulate."""
+    if _run["memory"]:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = _run["stages"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        record["seconds"] += time.perf_counter() - started
+        record["calls"] += 1
+        if _run["memory"]:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            record["peak_mb"] = max(record.get("peak_mb", 0.0), peak_mb)
+
+def count(name, n=1):
+    """Adds n to a named counter (cells scanned, cache hits, API calls, ...)."""
+    _run["counters"][name] += n
+
+def observe(name, seconds):
+    """Records one latency sample, e.g. a single API call."""
+    _run["latencies"][name].append(seconds)
+
+@contextmanager
+def timed(name):
+    """Records the duration of a block as one latency sample."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def report(top_functions=20):
+    """
+    Builds the machine-readable run report.
+
+    Returns:
+        dict: total seconds, per-stage timings, counters, latency summaries
+        (count, total, mean, p50, p90, p99, max) and, when cProfile is on,
+        the top functions by cumulative time.
+    """
+    latencies = {}
+    for name, samples in _run["latencies"].items():
+        ordered = sorted(samples)
+        latencies[name] = {
+            "count": len(ordered),
+            "total": sum(ordered),
+            "mean": sum(ordered) / len(ordered),
+            "p50": percentile(ordered, 50),
+            "p90": percentile(ordered, 90),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1],
+        }
+
+    result = {
+        "total_seconds": time.perf_counter() - _run["started"],
+        "stages": {name: dict(record) for name, record in _run["stages"].items()},
+        "counters": dict(_run["counters"]),
+        "latencies": latencies,
+    }
+
+    if _run["profiler"] is not None:
+        _run["profiler"].disable()
+        stats = pstats.Stats(_run["profiler"], stream=io.StringIO()).sort_stats("cumulative")
+        result["top_functions"] = [
+            {"function": f"{os.path.basename(file)}:{line}({func})", "calls": nc,
+             "own_seconds": tt, "cumulative_seconds": ct}
+            for (file, line, func), (_, nc, tt, ct, _) in
+            sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top_functions]
+        ]
+        _run["profiler"].enable()
+    return result
+
+def print_report(result=None):
+    """Prints a short human-readable summary of the run report."""
+    result = result or report()
+    print(f"\n{'Stage':<30}{'Time':>12}{'Calls':>8}")
+    for name, record in result["stages"].items():
+        peak = f"{record['peak_mb']:>10.1f} MB" if "peak_mb" in record else ""
+        print(f"{name:<30}{record['seconds'] * 1000:>10.1f}ms{record['calls']:>8}{peak}")
+    for name, value in result["counters"].items():
+        print(f"  {name}: {value:,}")
+    for name, summary in result["latencies"].items():
+        print(f"  {name}: {summary['count']} calls, p50 {summary['p50'] * 1000:.0f}ms, "
+              f"p90 {summary['p90'] * 1000:.0f}ms, max {summary['max'] * 1000:.0f}ms")
+
+def save_report(path, result=None):
+    """Writes the run report as JSON."""
+    result = result or report()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def configure_from_env():
+    """
+    Enables the optional modes from environment variables, so scripts without
+    their own CLI can be profiled: PROFILE_MEMORY=1, PROFILE_CPROFILE=1 and
+    PROFILE_REPORT=<path to write the JSON report>.
+
+    Returns:
+        str: The report path, or None when no report was requested.
+    """
+    reset(memory=os.getenv("PROFILE_MEMORY") == "1", cprofile=os.getenv("PROFILE_CPROFILE") == "1")
+    return os.getenv("PROFILE_REPORT")
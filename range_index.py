@@ -0,0 +1,139 @@
+from collections import defaultdict
+
+# Rows per bucket. A range is registered in every bucket its rows touch, unless
+# it spans more than TALL_BUCKETS buckets, in which case it goes in the sheet's
+# tall-range tree (keyed by rows) instead of being copied into each bucket.
+BUCKET_ROWS = 4
+TALL_BUCKETS = 16
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed intervals [lo, hi].
+
+    Stabbing and overlap queries take O(log n + k) for k matches. Built once
+    from a list of (lo, hi, payload) tuples.
+    """
+    __slots__ = ("center", "by_lo", "by_hi", "left", "right")
+
+    def __init__(self, intervals):
+        points = sorted(x for lo, hi, _ in intervals for x in (lo, hi))
+        self.center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_lo = sorted(here, key=lambda iv: iv[0])
+        self.by_hi = sorted(here, key=lambda iv: -iv[1])
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlap(self, lo, hi):
+        """Yields (lo, hi, payload) of every interval that intersects [lo, hi]."""
+        node = self
+        stack = []
+        while node is not None or stack:
+            if node is None:
+                node = stack.pop()
+            if hi < node.center:
+                # Only intervals starting at or before hi can reach into the query
+                for interval in node.by_lo:
+                    if interval[0] > hi:
+                        break
+                    yield interval
+                node = node.left
+            elif lo > node.center:
+                for interval in node.by_hi:
+                    if interval[1] < lo:
+                        break
+                    yield interval
+                node = node.right
+            else:
+                yield from node.by_lo
+                if node.right is not None:
+                    stack.append(node.right)
+                node = node.left
+
+    def stab(self, x):
+        """Yields every interval containing x."""
+        return self.overlap(x, x)
+
+class RangeIndex:
+    """
+    Per-sheet 2D index of rectangular cell ranges, for "which references read
+    this cell / overlap this range?" queries.
+
+    Each sheet's rows are cut into buckets of BUCKET_ROWS rows, and every
+    bucket keeps an interval tree over the columns of the ranges touching it.
+    Ranges taller than TALL_BUCKETS buckets (whole-column sums and the like)
+    live once in a per-sheet tree over rows instead. Rows and columns are
+    0-based and inclusive. Trees are rebuilt lazily after ranges are added.
+    """
+
+    def __init__(self):
+        self._buckets = defaultdict(lambda: defaultdict(list))  # sheet -> bucket -> [(c_lo, c_hi, entry)]
+        self._tall = defaultdict(list)                          # sheet -> [(r_lo, r_hi, entry)]
+        self._trees = None
+        self.size = 0
+
+    def add(self, sheet, r_lo, r_hi, c_lo, c_hi, payload):
+        """Registers a range; payload is returned by queries that hit it."""
+        entry = (r_lo, r_hi, c_lo, c_hi, payload)
+        first, last = r_lo // BUCKET_ROWS, r_hi // BUCKET_ROWS
+        if last - first >= TALL_BUCKETS:
+            self._tall[sheet].append((r_lo, r_hi, entry))
+        else:
+            for bucket in range(first, last + 1):
+                self._buckets[sheet][bucket].append((c_lo, c_hi, entry))
+        self.size += 1
+        self._trees = None
+
+    def _build(self):
+        trees = {}
+        for sheet, buckets in self._buckets.items():
+            trees[sheet] = ({bucket: IntervalTree(items) for bucket, items in buckets.items()}, None)
+        for sheet, items in self._tall.items():
+            bucket_trees = trees.get(sheet, ({}, None))[0]
+            trees[sheet] = (bucket_trees, IntervalTree(items))
+        self._trees = trees
+
+    def overlapping(self, sheet, r_lo, r_hi, c_lo, c_hi):
+        """Returns the payloads of every range that intersects the given range."""
+        if self._trees is None:
+            self._build()
+        bucket_trees, tall_tree = self._trees.get(sheet, ({}, None))
+        found, seen = [], set()
+
+        for bucket in range(r_lo // BUCKET_ROWS, r_hi // BUCKET_ROWS + 1):
+            tree = bucket_trees.get(bucket)
+            if tree is None:
+                continue
+            for _, _, entry in tree.overlap(c_lo, c_hi):
+                # Buckets are coarse: check the rows, and skip ranges already
+                # found through an earlier bucket
+                if entry[0] <= r_hi and entry[1] >= r_lo and id(entry) not in seen:
+                    seen.add(id(entry))
+                    found.append(entry[4])
+
+        if tall_tree is not None:
+            for _, _, entry in tall_tree.overlap(r_lo, r_hi):
+                if entry[2] <= c_hi and entry[3] >= c_lo:
+                    found.append(entry[4])
+        return found
+
+    def containing(self, sheet, r, c):
+        """Returns the payloads of every range that contains the cell (r, c)."""
+        if self._trees is None:
+            self._build()
+        bucket_trees, tall_tree = self._trees.get(sheet, ({}, None))
+        # A cell sits in exactly one bucket, so no duplicate check is needed
+        found = []
+        tree = bucket_trees.get(r // BUCKET_ROWS)
+        if tree is not None:
+            found = [entry[4] for _, _, entry in tree.stab(c) if entry[0] <= r <= entry[1]]
+        if tall_tree is not None:
+            found.extend(entry[4] for _, _, entry in tall_tree.stab(r) if entry[2] <= c <= entry[3])
+        return found
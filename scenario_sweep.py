@@ -0,0 +1,149 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from formula_engine import (
+    load_workbook_export, compile_workbook, evaluate, recalculate, get_value, a1_to_coords
+)
+
+# The scenarios sheet: scenario names are in row 2 and their numbers in row 3,
+# from column F onwards. The chosen scenario number lives in D3 (R3C4).
+SCENARIO_SHEET = "scenarios"
+SELECTOR_CELL = "D3"
+SCENARIO_NAME_ROW = 2
+SCENARIO_FIRST_COLUMN = 6
+
+# Single-cell outputs reported for every case
+KEY_OUTPUTS = {
+    "Project IRR": ("ratios", "E19"),
+    "Equity IRR": ("ratios", "E28"),
+    "Total Investment": ("ratios", "E12"),
+    "Equity Injected": ("ratios", "E23"),
+}
+
+# Timeline rows reported for every case: name -> (sheet, 1-based row, aggregation)
+TIMELINE_OUTPUTS = {
+    "Total CFADS": ("cash flow", 11, "sum"),
+    "Total Dividends": ("cash flow", 17, "sum"),
+    "Closing Cash": ("cash flow", 19, "last"),
+}
+TIMELINE_FIRST_COLUMN = 6  # column F
+
+def find_scenarios(data):
+    """
+    Reads the scenario columns of the scenarios sheet.
+
+    Returns:
+        list: (scenario name, scenario number) pairs in column order.
+    """
+    for ws in data.get("worksheets", []):
+        if ws.get("name") != SCENARIO_SHEET:
+            continue
+        by_position = {(cell["rowIndex"], cell["columnIndex"]): cell.get("formulaR1C1")
+                       for cell in ws.get("cells", {}).values()}
+        scenarios = []
+        for (r, c), name in sorted(by_position.items(), key=lambda item: item[0][1]):
+            if r != SCENARIO_NAME_ROW - 1 or c < SCENARIO_FIRST_COLUMN - 1 or not isinstance(name, str) or name.startswith("="):
+                continue
+            number = by_position.get((r + 1, c))
+            scenarios.append((name, number if isinstance(number, (int, float)) else len(scenarios) + 1))
+        return scenarios
+    return []
+
+def build_cases(scenarios=None, parameter_grid=None):
+    """
+    Builds the list of cases to evaluate: every scenario crossed with every
+    combination of the parameter grid.
+
+    Args:
+        scenarios (list): (name, number) pairs from find_scenarios, or None to
+            keep the scenario chosen in the workbook.
+        parameter_grid (dict): {"sheet!A1": [values, ...]} input values to sweep.
+
+    Returns:
+        list: Cases as {"name": ..., "overrides": {"sheet!A1": value}} dicts.
+    """
+    scenario_options = [(name, {f"{SCENARIO_SHEET}!{SELECTOR_CELL}": number}) for name, number in scenarios or []]
+    scenario_options = scenario_options or [("Workbook", {})]
+
+    grid_keys = list((parameter_grid or {}).keys())
+    grid_options = list(itertools.product(*(parameter_grid[key] for key in grid_keys))) if grid_keys else [()]
+
+    cases = []
+    for scenario_name, scenario_overrides in scenario_options:
+        for values in grid_options:
+            overrides = dict(scenario_overrides)
+            overrides.update(zip(grid_keys, values))
+            label = ", ".join(f"{key}={value}" for key, value in zip(grid_keys, values))
+            cases.append({"name": f"{scenario_name} [{label}]" if label else scenario_name, "overrides": overrides})
+    return cases
+
+def collect_outputs(grids):
+    """Extracts the key ratios and cash flow outputs from evaluated grids."""
+    outputs = {name: get_value(grids, sheet, a1_ref) for name, (sheet, a1_ref) in KEY_OUTPUTS.items()}
+    for name, (sheet, row, aggregation) in TIMELINE_OUTPUTS.items():
+        values = grids[sheet][row - 1, TIMELINE_FIRST_COLUMN - 1:]
+        outputs[name] = float(np.nansum(values) if aggregation == "sum" else values[-1])
+    return outputs
+
+# Per-process state: each worker compiles the plan and evaluates the base model once
+_worker = {}
+
+def _init_worker(input_path):
+    data = load_workbook_export(input_path)
+    plan = compile_workbook(data)
+    _worker["plan"] = plan
+    _worker["base"] = evaluate(plan)
+
+def _run_case(case):
+    started = time.perf_counter()
+    grids, recomputed = recalculate(_worker["plan"], _worker["base"], case["overrides"])
+    return {
+        "name": case["name"],
+        "overrides": case["overrides"],
+        "outputs": collect_outputs(grids),
+        "blocks_recomputed": recomputed,
+        "blocks_total": len(_worker["plan"]["blocks"]),
+        "seconds": time.perf_counter() - started,
+    }
+
+def run_sweep(input_path, cases, max_workers=None):
+    """
+    Evaluates every case in parallel worker processes.
+
+    Each worker compiles the dependency-ordered plan once, evaluates the
+    workbook as-is once, and then recomputes only the blocks downstream of each
+    case's changed inputs.
+
+    Returns:
+        list: One result dict per case, in the same order as cases.
+    """
+    for case in cases:
+        for address in case["overrides"]:
+            a1_to_coords(address.rpartition("!")[2])  # fail fast on bad addresses
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(input_path,)) as pool:
+        return list(pool.map(_run_case, cases))
+
+def main():
+    """Runs every scenario of the sample workbook and prints the key outputs side by side."""
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    input_path = os.path.join(project_root, "jsonformatter.JSON")
+
+    scenarios = find_scenarios(load_workbook_export(input_path))
+    print(f"Found {len(scenarios)} scenarios: {', '.join(name for name, _ in scenarios)}")
+    cases = build_cases(scenarios)
+
+    started = time.perf_counter()
+    results = run_sweep(input_path, cases)
+    print(f"Evaluated {len(results)} cases in {time.perf_counter() - started:.2f} s\n")
+
+    names = list(KEY_OUTPUTS) + list(TIMELINE_OUTPUTS)
+    print(f"{'':<20}" + "".join(f"{result['name'][:16]:>18}" for result in results))
+    for name in names:
+        print(f"{name:<20}" + "".join(f"{result['outputs'][name]:>18,.4f}" for result in results))
+    print(f"{'Blocks recomputed':<20}" + "".join(f"{result['blocks_recomputed']:>18}" for result in results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_right
+from collections import Counter, defaultdict, deque
+
+# Project-root modules (profiling, compact_store, ...) when run as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from profiling import stage, count
+from compact_store import atomic_write
+from metadata_generator import a1_to_coords
+
+# Node for referenced cells that are not in any table's rows (scenario
+# selectors, header cells, ...)
+OUTSIDE_TABLES = "(outside tables)"
+
+def _table_locator(meta_data):
+    """
+    Returns a function mapping a (sheet, row) cell position to its table: the
+    table with a named row on that row, else the table whose named rows span
+    it, else OUTSIDE_TABLES.
+    """
+    by_row = {}
+    spans = defaultdict(list)  # sheet -> [(first row, last row, table)], sorted
+    for sheet_name, sheet in meta_data.items():
+        for table_name, table in sheet.get("tables", {}).items():
+            rows = [a1_to_coords(row["source_cell"])[0] for row in table.get("rows", {}).values()
+                    if row.get("source_cell")]
+            for r in rows:
+                by_row.setdefault((sheet_name, r), table_name)
+            if rows:
+                spans[sheet_name].append((min(rows), max(rows), table_name))
+    starts = {}
+    for sheet_name in spans:
+        spans[sheet_name].sort()
+        starts[sheet_name] = [first for first, _, _ in spans[sheet_name]]
+
+    def locate(sheet_name, r):
+        table = by_row.get((sheet_name, r))
+        if table is not None:
+            return table
+        i = bisect_right(starts.get(sheet_name, []), r) - 1
+        if i >= 0 and spans[sheet_name][i][1] >= r:
+            return spans[sheet_name][i][2]
+        return OUTSIDE_TABLES
+    return locate
+
+def build_flow_graph(meta_data):
+    """
+    Condenses the row dependencies of meta_data into table- and sheet-level
+    flow graphs in one pass. Edges point from the precedent to the dependent
+    ("construction feeds debt") and are weighted by the number of cell links.
+
+    Returns:
+        dict: {"tables": [{"sheet", "table", "rows"}],
+               "table_edges": [{"from_sheet", "from_table", "to_sheet", "to_table", "links"}],
+               "sheet_edges": [{"from_sheet", "to_sheet", "links"}]}
+        Edges within one table or sheet are included, heaviest edges first.
+    """
+    locate = _table_locator(meta_data)
+    table_links = Counter()
+    nodes = {}
+    with stage("flow graph"):
+        for sheet_name, sheet in meta_data.items():
+            for table_name, table in sheet.get("tables", {}).items():
+                nodes[(sheet_name, table_name)] = len(table.get("rows", {}))
+                for row in table.get("rows", {}).values():
+                    for dep in row.get("dependencies", []):
+                        table_links[(dep["sheet"], locate(dep["sheet"], dep["row"]), sheet_name, table_name)] += 1
+
+    sheet_links = Counter()
+    for (from_sheet, from_table, to_sheet, to_table), links in table_links.items():
+        sheet_links[(from_sheet, to_sheet)] += links
+        # Referenced cells outside every table still need a node
+        nodes.setdefault((from_sheet, from_table), 0)
+    count("flow table edges", len(table_links))
+    count("flow sheet edges", len(sheet_links))
+
+    return {
+        "tables": [{"sheet": sheet, "table": table, "rows": rows} for (sheet, table), rows in nodes.items()],
+        "table_edges": [{"from_sheet": fs, "from_table": ft, "to_sheet": ts, "to_table": tt, "links": links}
+                        for (fs, ft, ts, tt), links in table_links.most_common()],
+        "sheet_edges": [{"from_sheet": fs, "to_sheet": ts, "links": links}
+                        for (fs, ts), links in sheet_links.most_common()],
+    }
+
+def _adjacency(flow, level, direction):
+    """node -> {neighbour: links}, skipping self-loops. Nodes are sheet names or (sheet, table)."""
+    adjacency = defaultdict(dict)
+    for edge in flow[f"{level}_edges"]:
+        if level == "sheet":
+            source, target = edge["from_sheet"], edge["to_sheet"]
+        else:
+            source, target = (edge["from_sheet"], edge["from_table"]), (edge["to_sheet"], edge["to_table"])
+        if source == target:
+            continue
+        if direction == "upstream":
+            source, target = target, source
+        adjacency[source][target] = edge["links"]
+    return adjacency
+
+def _walk(flow, start, level, direction, depth):
+    adjacency = _adjacency(flow, level, direction)
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        if depth is not None and distances[node] >= depth:
+            continue
+        for neighbour in adjacency.get(node, {}):
+            if neighbour not in distances:
+                distances[neighbour] = distances[node] + 1
+                queue.append(neighbour)
+    del distances[start]
+    return distances
+
+def upstream(flow, sheet, table=None, depth=None):
+    """
+    Everything that feeds a sheet (or one of its tables), directly or not.
+
+    Returns:
+        dict: sheet name (or (sheet, table) when a table is given) -> hops away.
+    """
+    if table is None:
+        return _walk(flow, sheet, "sheet", "upstream", depth)
+    return _walk(flow, (sheet, table), "table", "upstream", depth)
+
+def downstream(flow, sheet, table=None, depth=None):
+    """Everything a sheet (or one of its tables) feeds, directly or not; see upstream()."""
+    if table is None:
+        return _walk(flow, sheet, "sheet", "downstream", depth)
+    return _walk(flow, (sheet, table), "table", "downstream", depth)
+
+def links_between(flow, from_sheet, to_sheet):
+    """The table-level edges from one sheet into another, heaviest first."""
+    return [edge for edge in flow["table_edges"]
+            if edge["from_sheet"] == from_sheet and edge["to_sheet"] == to_sheet]
+
+def flow_path(flow, sheets):
+    """
+    Explains a chain of sheets, e.g. ["construction", "debt", "ratios"]: the
+    table edges for each consecutive pair, heaviest first.
+
+    Returns:
+        list: (from_sheet, to_sheet, edges) per hop; edges is empty when the
+        hop has no direct link.
+    """
+    return [(a, b, links_between(flow, a, b)) for a, b in zip(sheets, sheets[1:])]
+
+def save_flow_graph(flow, path):
+    with atomic_write(path) as f:
+        json.dump(flow, f, indent=2)
+
+def load_flow_graph(path):
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    project_root = PROJECT_ROOT
+    parser = argparse.ArgumentParser(description="Build or query the table/sheet flow graph.")
+    parser.add_argument("--meta-data", default=os.path.join(project_root, "meta_data.json"))
+    parser.add_argument("--flow-graph", default=os.path.join(project_root, "graph", "flow_graph.json"))
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the flow graph even if it exists")
+    parser.add_argument("--upstream", nargs="+", metavar=("SHEET", "TABLE"), help="What feeds a sheet or table")
+    parser.add_argument("--downstream", nargs="+", metavar=("SHEET", "TABLE"), help="What a sheet or table feeds")
+    parser.add_argument("--path", nargs="+", metavar="SHEET", help="How a chain of sheets feeds one another")
+    args = parser.parse_args()
+
+    # The flow graph is cached next to the cell graph and rebuilt when meta_data.json is newer
+    stale = (not os.path.exists(args.flow_graph)
+             or os.path.getmtime(args.meta_data) > os.path.getmtime(args.flow_graph))
+    if args.rebuild or stale:
+        with open(args.meta_data, "r", encoding='utf-8') as f:
+            meta_data = json.load(f)
+        flow = build_flow_graph(meta_data)
+        os.makedirs(os.path.dirname(args.flow_graph), exist_ok=True)
+        save_flow_graph(flow, args.flow_graph)
+        print(f"✅ Flow graph ({len(flow['tables'])} tables, {len(flow['table_edges'])} table edges) "
+              f"saved to {args.flow_graph}")
+    else:
+        flow = load_flow_graph(args.flow_graph)
+
+    for direction, target in (("upstream", args.upstream), ("downstream", args.downstream)):
+        if not target:
+            continue
+        found = (upstream if direction == "upstream" else downstream)(flow, *target[:2])
+        print(f"\n{direction.capitalize()} of {' / '.join(target[:2])}:")
+        for node, hops in sorted(found.items(), key=lambda item: item[1]):
+            print(f"  {hops} hop(s): {node if isinstance(node, str) else ' / '.join(node)}")
+
+    if args.path:
+        for from_sheet, to_sheet, edges in flow_path(flow, args.path):
+            print(f"\n{from_sheet} → {to_sheet}: {sum(e['links'] for e in edges)} links")
+            for edge in edges:
+                print(f"  {edge['from_table']} → {edge['to_table']} ({edge['links']})")
+
+if __name__ == "__main__":
+    main()
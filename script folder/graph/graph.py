@@ -1,5 +1,19 @@
 import json
 import os
+import sys
+
+# Project-root modules (profiling, compact_store, ...) when run as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from profiling import stage, count, configure_from_env, print_report, save_report
+from compact_store import save_document
+from formula_engine import strongly_connected_components
+
+# Formats the graph is written in: "json" (dependency_graph.json) and/or "compact" (dependency_graph.mdb,
+# for readers that load one sheet at a time with compact_store.CompactReader)
+OUTPUT_FORMATS = ("json",)
 
 def col_num_to_letter(col: int) -> str:
     """Convert column number (1-based) to Excel-style letters."""
@@ -15,7 +29,11 @@ def r1c1_to_a1(r: int, c: int) -> str:
 
 # --- Recursive function to get all dependencies ---
 def get_all_dependencies(cell, graph, visited):
-    """Recursively finds all dependencies for a cell using DFS."""
+    """
+    Recursively finds all dependencies for a cell using DFS. Cells already
+    visited are not followed again, so circular references end the walk
+    instead of recursing forever; find_circular_references reports them.
+    """
     if cell in visited:
         return []
     visited.add(cell)
@@ -28,59 +46,94 @@ def get_all_dependencies(cell, graph, visited):
         all_deps.extend(get_all_dependencies(dep, graph, visited))
     return all_deps
 
-def build_dependency_graph(meta_data):
-    """Builds direct and in-depth dependency graphs from Excel metadata JSON."""
+def find_circular_references(graph):
+    """
+    Finds every circular block of a direct dependency graph: each set of
+    cells that depend on each other, directly or through other cells.
 
-    # --- Direct dependency graph ---
+    Returns:
+        list: Sorted lists of cell names, one per circular block, largest first.
+    """
+    cells = sorted(set(graph) | {dep for deps in graph.values() for dep in deps})
+    position = {cell: i for i, cell in enumerate(cells)}
+    edges = [{position[dep] for dep in graph.get(cell, [])} for cell in cells]
+    blocks = [sorted(cells[i] for i in component) for component in strongly_connected_components(edges)
+              if len(component) > 1 or component[0] in edges[component[0]]]
+    return sorted(blocks, key=lambda block: (-len(block), block))
+
+def build_direct_graph(meta_data):
+    """Builds the direct dependency graph: 'Sheet!A1' of each row -> the cells its formula reads."""
     graph = {}
-    for sheet_name, sheet in meta_data.items():
-        if not isinstance(sheet, dict):
-            continue
-        for table_name, table in sheet.get("tables", {}).items():
-            if not isinstance(table, dict):
+    with stage("direct graph"):
+        for sheet_name, sheet in meta_data.items():
+            if not isinstance(sheet, dict):
                 continue
-            for row_id, row in table.get("rows", {}).items():
-                cell_a1 = row.get("cell_name")
-                if not cell_a1:
+            for table_name, table in sheet.get("tables", {}).items():
+                if not isinstance(table, dict):
                     continue
-                
-                # Standardize all cell names to 'SheetName!A1' format
-                full_cell_name = f"{sheet_name}!{cell_a1}"
-                graph[full_cell_name] = []
-                
-                for dep in row.get("dependencies", []):
-                    # meta_data has 0-indexed row/col, r1c1_to_a1 needs 1-indexed
-                    dep_a1 = r1c1_to_a1(dep['row'] + 1, dep['col'] + 1)
-                    dep_cell_name = f"{dep['sheet']}!{dep_a1}"
-                    graph[full_cell_name].append(dep_cell_name)
+                for row_id, row in table.get("rows", {}).items():
+                    cell_a1 = row.get("source_cell") or row.get("cell_name")
+                    if not cell_a1:
+                        continue
+                    
+                    # Standardize all cell names to 'SheetName!A1' format
+                    full_cell_name = f"{sheet_name}!{cell_a1}"
+                    graph[full_cell_name] = []
+                    
+                    for dep in row.get("dependencies", []):
+                        # meta_data has 0-indexed row/col, r1c1_to_a1 needs 1-indexed
+                        dep_a1 = r1c1_to_a1(dep['row'] + 1, dep['col'] + 1)
+                        dep_cell_name = f"{dep['sheet']}!{dep_a1}"
+                        graph[full_cell_name].append(dep_cell_name)
+    count("graph cells", len(graph))
+    count("graph edges", sum(len(deps) for deps in graph.values()))
+    return graph
+
+def build_dependency_graph(meta_data):
+    """Builds direct and in-depth dependency graphs from Excel metadata JSON."""
+
+    # --- Direct dependency graph ---
+    graph = build_direct_graph(meta_data)
 
     # --- Build in-depth dependency graph ---
     in_depth_graph = {}
-    for cell in graph.keys():
-        visited = set()
-        # Use set to remove duplicates from the final dependency list
-        in_depth_graph[cell] = sorted(list(set(get_all_dependencies(cell, graph, visited))))
+    with stage("in-depth graph"):
+        for cell in graph.keys():
+            visited = set()
+            # Use set to remove duplicates from the final dependency list
+            in_depth_graph[cell] = sorted(list(set(get_all_dependencies(cell, graph, visited))))
+    count("in-depth edges", sum(len(deps) for deps in in_depth_graph.values()))
 
     return in_depth_graph
 
 
 if __name__ == "__main__":
-    # Input & output paths
-    base_dir = "/Users/joshualevi/git_projects/playground_reg"
+    # Input & output paths: meta_data.json and graph/ in the project root, as pipeline.py writes them
+    base_dir = PROJECT_ROOT
     meta_data_path = os.path.join(base_dir, "meta_data.json")
     output_dir = os.path.join(base_dir, "graph")
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, "dependency_graph.json")
 
+    report_path = configure_from_env()
+
     # Load metadata
-    with open(meta_data_path, "r", encoding="utf-8") as f:
+    with stage("metadata load"), open(meta_data_path, "r", encoding="utf-8") as f:
         meta_data = json.load(f)
 
     # Build graph
     dependency_graph = build_dependency_graph(meta_data)
+    circular = find_circular_references(build_direct_graph(meta_data))
+    if circular:
+        print(f"⚠️ {len(circular)} circular block(s) found:")
+        for block in circular:
+            print(f"  - {', '.join(block[:8])}{' ...' if len(block) > 8 else ''}")
 
     # Save output JSON
-    with open(output_path, "w") as f:
-        json.dump(dependency_graph, f, indent=2)
+    with stage("save"):
+        save_document(dependency_graph, output_path, "graph", OUTPUT_FORMATS)
 
-    print(f"✅ Dependency graph saved to: {output_path}")
\ No newline at end of file
+    print(f"✅ Dependency graph saved to: {output_path}")
+    print_report()
+    if report_path:
+        print(f"Run report saved to {save_report(report_path)}")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# embedding_quantization lives in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from embedding_quantization import save_quantized_embeddings, load_quantized_index, quantized_search
+
+def load_kb_embeddings(json_path):
+    """Loads all knowledge base embeddings as a float32 matrix."""
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"Knowledge base file not found at: {json_path}")
+    with open(json_path, 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+    return np.array([item['embedding'] for item in knowledge_base], dtype=np.float32)
+
+def expand_embeddings(embeddings, target_size, noise=0.02, seed=0):
+    """
+    Grows a small set of embeddings to target_size rows with synthetic ones.
+
+    Each synthetic embedding is a random mix of three real ones plus noise, which
+    spreads the points out instead of stacking near-identical copies.
+    """
+    rng = np.random.default_rng(seed)
+    n_extra = target_size - len(embeddings)
+    picks = rng.integers(0, len(embeddings), size=(n_extra, 3))
+    weights = rng.dirichlet(np.ones(3), size=n_extra).astype(np.float32)
+    extra = np.einsum('nk,nkd->nd', weights, embeddings[picks])
+    extra += rng.normal(0, noise, size=extra.shape).astype(np.float32)
+    return np.vstack([embeddings, extra])
+
+def benchmark_quantization(embeddings, k=10, n_queries=100, rescore_multiplier=10, seed=0):
+    """
+    Measures memory saved and recall@k lost by the quantized search against exact search.
+
+    Queries are noisy copies of random knowledge base embeddings, so no embedding
+    model is needed to run the benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = embeddings[rng.integers(0, len(embeddings), size=n_queries)]
+    queries = queries + rng.normal(0, 0.02, size=queries.shape).astype(np.float32)
+
+    # Exact top-k with full precision
+    start = time.perf_counter()
+    exact_top = [set(np.argsort(-(normalized @ q))[:k].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+    results = {
+        "count": int(len(embeddings)),
+        "k": k,
+        "float32": {"bytes": int(embeddings.nbytes), "ms_per_query": round(exact_ms, 3), "recall_at_k": 1.0},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        save_quantized_embeddings(tmp_dir, embeddings)
+        for method in ("int8", "binary"):
+            index = load_quantized_index(tmp_dir, method=method)
+            start = time.perf_counter()
+            found = [quantized_search(q, index, top_k=k, rescore_multiplier=rescore_multiplier)[0] for q in queries]
+            elapsed_ms = (time.perf_counter() - start) * 1000 / n_queries
+            recall = np.mean([len(exact & set(f.tolist())) / k for exact, f in zip(exact_top, found)])
+            code_bytes = index["codes"].nbytes + sum(index[key].nbytes for key in ("offset", "scale") if key in index)
+            results[method] = {
+                "bytes": int(code_bytes),
+                "memory_saved": round(1 - code_bytes / embeddings.nbytes, 4),
+                "ms_per_query": round(elapsed_ms, 3),
+                "recall_at_k": round(float(recall), 4),
+            }
+            del index
+
+    return results
+
+if __name__ == "__main__":
+    kb_path = os.path.join(os.path.dirname(__file__), 'knowledge_base.json')
+    base_embeddings = load_kb_embeddings(kb_path)
+
+    for size in (len(base_embeddings), 10_000, 100_000):
+        embeddings = base_embeddings if size == len(base_embeddings) else expand_embeddings(base_embeddings, size)
+        report = benchmark_quantization(embeddings)
+        print(f"\n--- {report['count']} embeddings, recall@{report['k']} ---")
+        for method in ("float32", "int8", "binary"):
+            stats = report[method]
+            saved = f", saved {stats['memory_saved']:.1%}" if "memory_saved" in stats else ""
+            print(f"{method:>8}: {stats['bytes'] / 1e6:8.2f} MB{saved}, "
+                  f"recall {stats['recall_at_k']:.3f}, {stats['ms_per_query']:.2f} ms/query")
@@ -1,8 +1,15 @@
 import json
 import os
+import hashlib
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from itertools import combinations
+
+def knowledge_base_version(json_path):
+    """Returns a short content hash identifying a specific version of the knowledge base file."""
+    digest = hashlib.sha1()
+    with open(json_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
 
 def load_embeddings(json_path, terms_to_compare):
     """
@@ -31,6 +38,183 @@ def load_embeddings(json_path, terms_to_compare):
 
     return embeddings
 
+def load_embedding_matrix(json_path):
+    """
+    Loads every knowledge base entry as a single L2-normalized float32 matrix.
+
+    Returns:
+        tuple: (entries, matrix) where entries is a list of dicts with the term,
+        sheet, table and cell of each row of the (N, dim) matrix.
+    """
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"Knowledge base file not found at: {json_path}")
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+
+    entries = []
+    matrix = np.empty((len(knowledge_base), len(knowledge_base[0]['embedding']) if knowledge_base else 0), dtype=np.float32)
+    for i, item in enumerate(knowledge_base):
+        matrix[i] = item['embedding']
+        entries.append({
+            "term": item['term'],
+            "source_sheet": item.get('source_sheet'),
+            "source_table": item.get('source_table'),
+            "source_cell": item.get('source_cell'),
+        })
+
+    return entries, normalize_rows(matrix)
+
+def normalize_rows(matrix):
+    """L2-normalizes each row in place so that dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def top_k_neighbors(matrix, k=10, memory_budget_mb=256):
+    """
+    Finds the k most similar rows for every row of a normalized embedding matrix.
+
+    The similarity matrix is never materialized: rows are processed in blocks whose
+    (block_size x N) float32 score slab and the int64 index array argpartition
+    returns for it fit in memory_budget_mb together, so memory stays bounded
+    regardless of the knowledge base size.
+
+    Args:
+        matrix (np.ndarray): (N, dim) L2-normalized float32 embeddings.
+        k (int): The number of neighbors to keep per row (self excluded).
+        memory_budget_mb (int): Upper bound for the per-block scores and indices.
+
+    Returns:
+        tuple: (indices, scores), both of shape (N, k), sorted by descending score.
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+
+    # Per row of a block: N float32 scores plus the N int64 indices from argpartition
+    block_size = max(1, (memory_budget_mb * 1024 * 1024) // ((4 + 8) * n))
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block_scores = matrix[start:stop] @ matrix.T
+        # Exclude each row's similarity with itself
+        block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        # argpartition is O(N) per row, then only the k winners are sorted. Only
+        # their indices are kept, so the N-wide index array is freed right away
+        part = np.argpartition(block_scores, -k, axis=1)[:, -k:].copy()
+        part_scores = np.take_along_axis(block_scores, part, axis=1)
+        # Freed before the next block's scores are allocated
+        del block_scores
+        order = np.argsort(-part_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(part, order, axis=1)
+        scores[start:stop] = np.take_along_axis(part_scores, order, axis=1)
+
+    return indices, scores
+
+def cluster_near_duplicates(entries, indices, scores, threshold=0.92):
+    """
+    Groups entries whose neighbor similarity is at least `threshold` into clusters
+    (connected components over the top-k neighbor graph).
+
+    Returns:
+        list: Clusters with two or more members, largest first. Each cluster lists
+        its members and whether it spans more than one sheet.
+    """
+    parent = list(range(len(entries)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows, cols = np.nonzero(scores >= threshold)
+    for i, j in zip(rows.tolist(), indices[rows, cols].tolist()):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    groups = {}
+    for i in range(len(entries)):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        sheets = sorted({entries[i]["source_sheet"] for i in members if entries[i]["source_sheet"]})
+        clusters.append({
+            "terms": sorted({entries[i]["term"] for i in members}),
+            "sheets": sheets,
+            "cross_sheet": len(sheets) > 1,
+            "members": [entries[i] for i in members],
+        })
+
+    clusters.sort(key=lambda c: len(c["members"]), reverse=True)
+    return clusters
+
+def build_similarity_artifact(json_path, output_dir, k=10, threshold=0.92, memory_budget_mb=256):
+    """
+    Computes top-k neighbors and near-duplicate clusters for the whole knowledge base
+    and saves them next to it, so other scripts can reuse them without recomputing.
+
+    Writes `similarity_neighbors.npz` (indices and scores) and
+    `near_duplicate_clusters.json`. Both record the knowledge base version, k
+    and threshold they were built with.
+    """
+    version = knowledge_base_version(json_path)
+    entries, matrix = load_embedding_matrix(json_path)
+    print(f"Computing top-{k} neighbors for {len(entries)} entries...")
+    indices, scores = top_k_neighbors(matrix, k=k, memory_budget_mb=memory_budget_mb)
+    clusters = cluster_near_duplicates(entries, indices, scores, threshold=threshold)
+
+    os.makedirs(output_dir, exist_ok=True)
+    neighbors_path = os.path.join(output_dir, "similarity_neighbors.npz")
+    clusters_path = os.path.join(output_dir, "near_duplicate_clusters.json")
+
+    np.savez_compressed(neighbors_path, indices=indices, scores=scores, version=np.array(version),
+                        k=np.array(k), threshold=np.array(threshold))
+    with open(clusters_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "knowledge_base_version": version,
+            "threshold": threshold,
+            "k": k,
+            "clusters": clusters,
+        }, f, indent=2)
+
+    cross_sheet = sum(1 for c in clusters if c["cross_sheet"])
+    print(f"✅ Found {len(clusters)} near-duplicate clusters ({cross_sheet} across sheets).")
+    print(f"Neighbors saved to {neighbors_path}")
+    print(f"Clusters saved to {clusters_path}")
+    return indices, scores, clusters
+
+def load_similarity_artifact(json_path, output_dir, k=10, threshold=0.92):
+    """
+    Loads a previously saved neighbors artifact.
+
+    Returns:
+        tuple: (indices, scores), or None if the artifact or its clusters file
+        is missing, or it was built from a different version of the knowledge
+        base or with a different k or threshold.
+    """
+    neighbors_path = os.path.join(output_dir, "similarity_neighbors.npz")
+    clusters_path = os.path.join(output_dir, "near_duplicate_clusters.json")
+    if not os.path.exists(neighbors_path) or not os.path.exists(clusters_path):
+        return None
+    with np.load(neighbors_path) as artifact:
+        if "k" not in artifact.files or "threshold" not in artifact.files:
+            return None
+        if (str(artifact["version"]) != knowledge_base_version(json_path)
+                or int(artifact["k"]) != k or float(artifact["threshold"]) != threshold):
+            return None
+        return artifact["indices"], artifact["scores"]
+
 def calculate_and_display_similarity(embeddings):
     """
     Calculates and displays the cosine similarity between all pairs of embeddings.
@@ -39,25 +223,30 @@ def calculate_and_display_similarity(embeddings):
         print("Need at least two terms to calculate similarity.")
         return
 
-    # Use itertools.combinations to get all unique pairs of terms
-    term_pairs = combinations(embeddings.keys(), 2)
-
-    print("\n--- Cosine Similarity Scores (1 = most similar, 0 = unrelated) ---\n")
+    terms = list(embeddings.keys())
+    matrix = normalize_rows(np.stack([embeddings[term] for term in terms]).astype(np.float32))
 
-    for term1, term2 in term_pairs:
-        # Reshape vectors to be 2D arrays for the cosine_similarity function
-        vec1 = embeddings[term1].reshape(1, -1)
-        vec2 = embeddings[term2].reshape(1, -1)
+    # A single matrix product gives every pairwise cosine similarity at once
+    similarity = matrix @ matrix.T
 
-        # Calculate cosine similarity
-        sim_score = cosine_similarity(vec1, vec2)[0][0]
+    print("\n--- Cosine Similarity Scores (1 = most similar, 0 = unrelated) ---\n")
 
-        print(f"Similarity between '{term1}' and '{term2}': {sim_score:.4f}")
+    rows, cols = np.triu_indices(len(terms), k=1)
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        print(f"Similarity between '{terms[i]}' and '{terms[j]}': {similarity[i, j]:.4f}")
 
 if __name__ == "__main__":
-    kb_path = os.path.join(os.path.dirname(__file__), 'knowledge_base.json')
+    kb_dir = os.path.dirname(__file__)
+    kb_path = os.path.join(kb_dir, 'knowledge_base.json')
     terms = ["Start Date", "Construction Duration", "Tax Rate", "Concession Duration"]
     term_embeddings = load_embeddings(kb_path, terms)
 
     if term_embeddings:
-        calculate_and_display_similarity(term_embeddings)
\ No newline at end of file
+        calculate_and_display_similarity(term_embeddings)
+
+    # The neighbors are only recomputed when the knowledge base or the settings have changed
+    k, threshold = 10, 0.92
+    if load_similarity_artifact(kb_path, kb_dir, k=k, threshold=threshold) is None:
+        build_similarity_artifact(kb_path, kb_dir, k=k, threshold=threshold)
+    else:
+        print(f"Similarity artifact in {kb_dir} is up to date with the knowledge base.")
@@ -1,54 +1,189 @@
 import json
 import os
-import pandas as pd
+import re
+import sys
+from collections import Counter
+from openpyxl import Workbook
 
-def export_to_excel(json_path, excel_path):
+# metadata_store lives in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Column order used in the Excel file
+COLUMN_ORDER = [
+    "term",
+    "definition",
+    "source_sheet",
+    "source_table",
+    "source_cell"
+]
+DEPENDENCY_COLUMNS = ["dependencies", "dependents"]
+
+# Excel's hard limit, including the header row
+MAX_ROWS_PER_SHEET = 1_048_576
+
+def iter_knowledge_base(json_path, skip_embeddings=True, chunk_size=1 << 20):
+    """
+    Yields knowledge base entries one at a time without loading the whole file.
+
+    The top-level JSON array is decoded element by element from a rolling buffer.
+    With skip_embeddings, the 'embedding' key is dropped while each entry is
+    parsed and float literals are kept as their raw text instead of being
+    converted, so embeddings never become Python float lists.
+    """
+    if skip_embeddings:
+        decoder = json.JSONDecoder(
+            object_pairs_hook=lambda pairs: {k: v for k, v in pairs if k != 'embedding'},
+            parse_float=str,
+        )
+    else:
+        decoder = json.JSONDecoder()
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+        pos = buffer.find('[')
+        if pos == -1:
+            return
+        pos += 1
+        eof = False
+
+        while True:
+            # Skip whitespace and separators between array elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+
+            if pos >= len(buffer) or buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The element is cut off at the end of the buffer: read more and retry
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+
+            yield item
+            pos = end
+
+def load_dependency_counts(meta_data_path):
+    """
+    Counts direct precedents and dependents for every row in meta_data.json.
+
+    Returns:
+        dict: (sheet, source_cell) -> (number of dependencies, number of dependents).
     """
-    Reads a JSON file containing a list of dictionaries, removes the 'embedding' key
-    from each dictionary, and exports the data to an Excel file.
+    from metadata_store import MetadataStore, current_store
+    store_path = current_store(meta_data_path)
+    if store_path:
+        # The store counts dependents with one indexed GROUP BY
+        with MetadataStore(store_path) as store:
+            dependents = {(sheet, _a1(r + 1, c + 1)): n for (sheet, r, c), n in store.dependency_counts().items()}
+            dependencies = {(row["sheet"], row["source_cell"]): n for row, n in store.rows_with_dependency_counts()}
+        return {key: (dependencies.get(key, 0), dependents.get(key, 0)) for key in set(dependencies) | set(dependents)}
+
+    with open(meta_data_path, 'r', encoding='utf-8') as f:
+        meta_data = json.load(f)
+
+    dependencies = {}
+    dependents = Counter()
+    for sheet_name, sheet_data in meta_data.items():
+        for table_data in sheet_data.get("tables", {}).values():
+            for row_data in table_data.get("rows", {}).values():
+                deps = row_data.get("dependencies", [])
+                cell = row_data.get("source_cell") or row_data.get("cell_name")
+                if cell:
+                    dependencies[(sheet_name, cell)] = len(deps)
+                for dep in deps:
+                    dependents[(dep["sheet"], _a1(dep["row"] + 1, dep["col"] + 1))] += 1
+
+    return {key: (dependencies.get(key, 0), dependents.get(key, 0)) for key in set(dependencies) | set(dependents)}
+
+def _a1(r, c):
+    """Convert 1-based row/col indexes to an A1 reference."""
+    letters = ""
+    while c > 0:
+        c, remainder = divmod(c - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return f"{letters}{r}"
+
+def _sheet_title(name, existing):
+    """Return a valid, unique Excel worksheet title (max 31 chars, no []:*?/\\)."""
+    base = re.sub(r'[\[\]:*?/\\]', '_', name or "Unknown")[:31] or "Sheet"
+    title, i = base, 2
+    while title in existing:
+        suffix = f" ({i})"
+        title = base[:31 - len(suffix)] + suffix
+        i += 1
+    return title
+
+def export_to_excel(json_path, excel_path, meta_data_path=None, per_sheet_tabs=False):
+    """
+    Streams a knowledge base JSON file into an Excel file without the embeddings.
+
+    Entries are read one at a time and written through a write-only openpyxl
+    workbook, so memory use stays constant regardless of the number of rows.
+    Tabs that reach Excel's row limit continue in a new tab.
 
     Args:
         json_path (str): The path to the input knowledge_base.json file.
         excel_path (str): The path where the output Excel file will be saved.
+        meta_data_path (str): Optional meta_data.json; adds dependency and dependent counts.
+        per_sheet_tabs (bool): Also write one tab per source sheet.
     """
-    # --- 1. Load Data ---
+    # --- 1. Check Inputs ---
     if not os.path.exists(json_path):
         raise FileNotFoundError(f"Knowledge base file not found at: {json_path}")
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        knowledge_base = json.load(f)
-
-    # --- 2. Prepare Data for Export (Remove Embeddings) ---
-    data_for_export = []
-    for item in knowledge_base:
-        # Create a copy of the item dictionary without the 'embedding' key
-        item_copy = {key: value for key, value in item.items() if key != 'embedding'}
-        data_for_export.append(item_copy)
-    
-    if not data_for_export:
+    dependency_counts = load_dependency_counts(meta_data_path) if meta_data_path else None
+    header = COLUMN_ORDER + (DEPENDENCY_COLUMNS if dependency_counts is not None else [])
+
+    # --- 2. Stream Entries into a Write-Only Workbook ---
+    workbook = Workbook(write_only=True)
+    tabs = {}  # tab key -> [worksheet, rows written, tab base name]
+
+    def append(key, base_name, row):
+        tab = tabs.get(key)
+        if tab is None or tab[1] >= MAX_ROWS_PER_SHEET:
+            worksheet = workbook.create_sheet(_sheet_title(base_name, workbook.sheetnames))
+            worksheet.append(header)
+            tab = tabs[key] = [worksheet, 1, base_name]
+        tab[0].append(row)
+        tab[1] += 1
+
+    count = 0
+    for item in iter_knowledge_base(json_path):
+        row = [item.get(col) for col in COLUMN_ORDER]
+        if dependency_counts is not None:
+            row.extend(dependency_counts.get((item.get("source_sheet"), item.get("source_cell")), (0, 0)))
+
+        append(None, "Knowledge Base", row)
+        if per_sheet_tabs:
+            append(item.get("source_sheet"), item.get("source_sheet"), row)
+        count += 1
+
+    if not count:
         print("Warning: No data found to export.")
         return
 
-    # --- 3. Create DataFrame and Export to Excel ---
-    print(f"Exporting {len(data_for_export)} records to Excel...")
-    df = pd.DataFrame(data_for_export)
-
-    # Reorder columns for better readability in the Excel file
-    column_order = [
-        "term", 
-        "definition", 
-        "source_sheet", 
-        "source_table", 
-        "source_cell"
-    ]
-    df = df.reindex(columns=[col for col in column_order if col in df.columns])
-
-    df.to_excel(excel_path, index=False, engine='openpyxl')
+    # --- 3. Save ---
+    print(f"Exporting {count} records to Excel...")
+    workbook.save(excel_path)
     print(f"✅ Successfully exported data to {excel_path}")
 
 if __name__ == "__main__":
     project_root = os.path.dirname(__file__)
     kb_path = os.path.join(project_root, 'knowledge_base.json')
     output_excel_path = os.path.join(project_root, 'knowledge_base_export.xlsx')
-    
-    export_to_excel(kb_path, output_excel_path)
\ No newline at end of file
+    meta_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(project_root))), 'meta_data.json')
+
+    export_to_excel(kb_path, output_excel_path, meta_data_path=meta_path if os.path.exists(meta_path) else None)
@@ -1,60 +1,130 @@
+import argparse
 import json
 import os
-import torch
-from sentence_transformers import SentenceTransformer, util
+import sys
+import numpy as np
 
-def perform_semantic_search(query, knowledge_base, embedding_model, top_k=5):
+# Project-root modules (encoders, embedding_quantization, ...) when run as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from encoders import load_encoder, entry_backend
+from embedding_quantization import load_quantized_index, quantized_search
+from neighborhoods import load_neighborhoods, attach_neighborhoods
+
+def perform_semantic_search(query, knowledge_base, embedding_model, top_k=5, neighborhoods=None):
     """
     Performs a semantic search against the knowledge base.
 
     Args:
         query (str): The user's search query.
         knowledge_base (list): The list of knowledge base entries.
-        embedding_model: The loaded SentenceTransformer model.
+        embedding_model: The encoder from encoders.load_encoder.
         top_k (int): The number of top results to return.
+        neighborhoods (dict): Optional neighbourhood cache (neighborhoods.json);
+            adds each result's formula, precedents and dependents.
 
     Returns:
         list: A list of the top_k most relevant entries from the knowledge base.
     """
     # 1. Generate the embedding for the user's query
-    query_embedding = embedding_model.encode(query, convert_to_tensor=True)
+    query_embedding = np.asarray(embedding_model.encode(query), dtype=np.float32)
 
     # 2. Get all embeddings from the knowledge base
-    kb_embeddings = torch.tensor(
-        [item['embedding'] for item in knowledge_base], 
-        dtype=torch.float32
-    ).to(embedding_model.device)
+    kb_embeddings = np.array([item['embedding'] for item in knowledge_base], dtype=np.float32)
 
     # 3. Calculate cosine similarity between the query and all knowledge base entries
-    # The util.cos_sim function is highly optimized for this task
-    cosine_scores = util.cos_sim(query_embedding, kb_embeddings)
+    norms = np.linalg.norm(kb_embeddings, axis=1) * np.linalg.norm(query_embedding)
+    cosine_scores = kb_embeddings @ query_embedding / np.maximum(norms, 1e-12)
 
-    # 4. Find the top_k most similar entries
-    # We use torch.topk to get the highest scores and their indices.
-    # This is more efficient than converting to numpy and works on the GPU.
-    top_scores, top_indices = torch.topk(cosine_scores[0], k=top_k)
+    # 4. Find the top_k most similar entries: partition first, then sort only those
+    top_k = min(top_k, len(knowledge_base))
+    top_indices = np.argpartition(-cosine_scores, top_k - 1)[:top_k]
+    top_indices = top_indices[np.argsort(-cosine_scores[top_indices])]
 
     # 5. Format and return the results
     search_results = []
-    for score, idx in zip(top_scores, top_indices):
-        # .item() is used to get the integer value from the tensor
-        result = knowledge_base[idx.item()]
+    for idx in top_indices.tolist():
+        result = knowledge_base[idx]
         # Add the similarity score to the result for context
-        result['similarity_score'] = score.item()
+        result['similarity_score'] = float(cosine_scores[idx])
         search_results.append(result)
-    
+
+    if neighborhoods is not None:
+        attach_neighborhoods(search_results, neighborhoods)
+    return search_results
+
+def perform_quantized_search(query, knowledge_base, embedding_model, index, top_k=5, rescore_multiplier=4,
+                             neighborhoods=None):
+    """
+    Performs a semantic search using a quantized index built by build_knowledge_base.py.
+
+    The quantized codes are scanned first to shortlist top_k * rescore_multiplier
+    candidates, which are then re-ranked with the full-precision embeddings.
+
+    Args:
+        query (str): The user's search query.
+        knowledge_base (list): The list of knowledge base entries.
+        embedding_model: The encoder from encoders.load_encoder.
+        index (dict): The index returned by load_quantized_index.
+        top_k (int): The number of top results to return.
+        rescore_multiplier (int): How many candidates per result to re-rank.
+        neighborhoods (dict): Optional neighbourhood cache; see perform_semantic_search.
+
+    Returns:
+        list: A list of the top_k most relevant entries from the knowledge base.
+    """
+    query_embedding = embedding_model.encode(query)
+    top_indices, top_scores = quantized_search(query_embedding, index, top_k=top_k, rescore_multiplier=rescore_multiplier)
+
+    search_results = []
+    for idx, score in zip(top_indices.tolist(), top_scores.tolist()):
+        result = knowledge_base[idx]
+        result['similarity_score'] = score
+        search_results.append(result)
+
+    if neighborhoods is not None:
+        attach_neighborhoods(search_results, neighborhoods)
     return search_results
 
 if __name__ == "__main__":
     # --- Setup ---
-    project_root = os.path.dirname(os.path.dirname(__file__))
-    kb_path = os.path.join(project_root, 'knowledge_layer', 'knowledge_base.json')
+    # build_knowledge_base.py and pipeline.py write the knowledge base and its
+    # quantized index to <project root>/knowledge_layer
+    parser = argparse.ArgumentParser(description="Ask questions against the knowledge base.")
+    parser.add_argument("--kb-dir", default=os.path.join(PROJECT_ROOT, "knowledge_layer"),
+                        help="Folder with knowledge_base.json and its embeddings index")
+    args = parser.parse_args()
+    kb_path = os.path.join(args.kb_dir, 'knowledge_base.json')
 
     print("Loading knowledge base and embedding model...")
     with open(kb_path, 'r', encoding='utf-8') as f:
         knowledge_base_data = json.load(f)
     
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Queries must be encoded with the backend the knowledge base was built
+    # with: $EMBEDDING_BACKEND if set, else the one recorded in its entries
+    kb_backends = sorted({entry_backend(item) for item in knowledge_base_data})
+    if len(kb_backends) > 1:
+        print(f"Warning: the knowledge base mixes embeddings from {', '.join(kb_backends)}; "
+              "rerun build_knowledge_base.py to re-embed it with one backend.")
+    backend = os.getenv("EMBEDDING_BACKEND") or (kb_backends[0] if kb_backends else None)
+    if kb_backends and backend not in kb_backends:
+        print(f"Warning: queries are encoded with '{backend}' but the knowledge base was built with "
+              f"'{kb_backends[0]}'; scores will be off until it is rebuilt with the same backend.")
+    model = load_encoder(backend)
+
+    # Use the quantized index when build_knowledge_base.py has produced one
+    quantized_index = load_quantized_index(args.kb_dir, method="int8")
+    if quantized_index is not None and (len(quantized_index["codes"]) != len(knowledge_base_data)
+                                        or quantized_index["encoder"] not in (None, *kb_backends)):
+        print("Quantized index is out of date with the knowledge base; using exact search.")
+        quantized_index = None
+    # Precedents and dependents of every row, written next to the knowledge base
+    # by the pipeline's 'neighborhoods' stage
+    neighborhoods = load_neighborhoods(args.kb_dir)
+    if neighborhoods is None:
+        print(f"No neighborhoods.json in {args.kb_dir}; run pipeline.py to add formulas and precedents to results.")
     print("Model loaded. You can now ask questions.")
 
     # --- Interactive Search Loop ---
@@ -63,10 +133,21 @@ if __name__ == "__main__":
         if user_query.lower() == 'exit':
             break
         
-        results = perform_semantic_search(user_query, knowledge_base_data, model, top_k=3)
+        if quantized_index is not None:
+            results = perform_quantized_search(user_query, knowledge_base_data, model, quantized_index, top_k=3,
+                                               neighborhoods=neighborhoods)
+        else:
+            results = perform_semantic_search(user_query, knowledge_base_data, model, top_k=3,
+                                              neighborhoods=neighborhoods)
         
         print("\n--- Top 3 Relevant Terms ---")
         for res in results:
             print(f"\nTerm: {res['term']} (Score: {res['similarity_score']:.4f})")
             print(f"  Source: Sheet '{res['source_sheet']}', Table '{res['source_table']}'")
-            print(f"  Definition: {res['definition']}")
\ No newline at end of file
+            print(f"  Definition: {res['definition']}")
+            if res.get('formula'):
+                print(f"  Formula ({res['source_cell']}): {res['formula']}")
+            for label in ('precedents', 'dependents'):
+                for neighbour in res.get(label, [])[:5]:
+                    name = f"{neighbour['term']} ({neighbour['table']})" if neighbour['term'] else "unnamed cell"
+                    print(f"  {label[:-1].capitalize()} ({neighbour['hops']} hop): {neighbour['cell']} {name}")
\ No newline at end of file
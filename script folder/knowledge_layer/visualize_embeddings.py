@@ -1,53 +1,114 @@
 import json
 import os
 import numpy as np
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 import matplotlib.pyplot as plt
+from calculate_similarity import knowledge_base_version
 
-def visualize_embeddings(json_path, terms_to_visualize):
+# Above this many points, PCA is fitted incrementally and the plot switches to a density view
+LARGE_N_THRESHOLD = 5000
+# Maximum number of points that get an individual text label
+MAX_LABELS = 200
+
+def compute_projection(embeddings, batch_size=10000):
     """
-    Loads embeddings from a JSON file, reduces their dimensionality using PCA,
-    and creates a 2D scatter plot to visualize their semantic relationships.
+    Projects embeddings to 2D with PCA.
 
-    Args:
-        json_path (str): The path to the knowledge_base.json file.
-        terms_to_visualize (list): A list of exact term strings to plot.
+    Small inputs use randomized PCA; large ones use IncrementalPCA in batches so
+    the fit never needs more than one batch of centered data in memory.
+    """
+    if len(embeddings) <= LARGE_N_THRESHOLD:
+        pca = PCA(n_components=2, svd_solver='randomized', random_state=0)
+        return pca.fit_transform(embeddings).astype(np.float32)
+
+    pca = IncrementalPCA(n_components=2, batch_size=batch_size)
+    for start in range(0, len(embeddings), batch_size):
+        batch = embeddings[start:start + batch_size]
+        if len(batch) >= 2:
+            pca.partial_fit(batch)
+    projected = np.empty((len(embeddings), 2), dtype=np.float32)
+    for start in range(0, len(embeddings), batch_size):
+        projected[start:start + batch_size] = pca.transform(embeddings[start:start + batch_size])
+    return projected
+
+def load_projection(json_path, cache_path=None):
+    """
+    Returns the 2D projection of the whole knowledge base, fitting it only once
+    per knowledge base version.
+
+    The projection, terms and sheets are cached in `projection_2d.npz` next to the
+    knowledge base and reused as long as the knowledge base content is unchanged.
+
+    Returns:
+        tuple: (points, terms, sheets) as NumPy arrays.
     """
-    # --- 1. Load and Filter Data ---
     if not os.path.exists(json_path):
         raise FileNotFoundError(f"Knowledge base file not found at: {json_path}")
 
+    cache_path = cache_path or os.path.join(os.path.dirname(json_path), 'projection_2d.npz')
+    version = knowledge_base_version(json_path)
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached['version']) == version:
+                return cached['points'], cached['terms'], cached['sheets']
+
+    print("Projection cache is missing or stale, fitting PCA...")
     with open(json_path, 'r', encoding='utf-8') as f:
         knowledge_base = json.load(f)
 
-    # Filter for the specific terms and collect their embeddings and labels
-    embeddings = []
-    labels = []
-    for item in knowledge_base:
-        if item['term'] in terms_to_visualize:
-            embeddings.append(item['embedding'])
-            labels.append(item['term'])
+    embeddings = np.array([item['embedding'] for item in knowledge_base], dtype=np.float32)
+    terms = np.array([item['term'] for item in knowledge_base])
+    sheets = np.array([item.get('source_sheet') or '' for item in knowledge_base])
+    points = compute_projection(embeddings)
 
-    if not embeddings:
+    np.savez(cache_path, points=points, terms=terms, sheets=sheets, version=np.array(version))
+    return points, terms, sheets
+
+def visualize_embeddings(json_path, terms_to_visualize=None, sheet=None):
+    """
+    Plots the cached 2D projection of the knowledge base embeddings.
+
+    Small selections are drawn as a labelled scatter plot. Large ones are drawn
+    as a hexbin density map, with labels only for terms_to_visualize.
+
+    Args:
+        json_path (str): The path to the knowledge_base.json file.
+        terms_to_visualize (list): Exact term strings to plot and label. When
+            omitted, every term is plotted.
+        sheet (str): Optionally restrict the plot to one source sheet.
+    """
+    points, terms, sheets = load_projection(json_path)
+
+    mask = np.ones(len(terms), dtype=bool)
+    if sheet is not None:
+        mask &= sheets == sheet
+    if terms_to_visualize and len(terms) <= LARGE_N_THRESHOLD:
+        mask &= np.isin(terms, list(terms_to_visualize))
+
+    if not mask.any():
         print("Warning: None of the specified terms were found in the knowledge base.")
         print(f"Terms looked for: {terms_to_visualize}")
         return
 
-    # --- 2. Reduce Dimensionality ---
-    # Convert to a NumPy array for scikit-learn
-    X = np.array(embeddings, dtype=np.float32)
-
-    # Use PCA to reduce from 384 to 2 dimensions
-    pca = PCA(n_components=2)
-    X_reduced = pca.fit_transform(X)
+    selected_points = points[mask]
+    selected_terms = terms[mask]
 
-    # --- 3. Create the Plot ---
     plt.figure(figsize=(10, 8))
-    plt.scatter(X_reduced[:, 0], X_reduced[:, 1], alpha=0.7)
+    if len(selected_points) > LARGE_N_THRESHOLD:
+        plt.hexbin(selected_points[:, 0], selected_points[:, 1], gridsize=150, bins='log', cmap='viridis', mincnt=1)
+        plt.colorbar(label='Terms per cell (log)')
+        label_mask = np.isin(selected_terms, list(terms_to_visualize)) if terms_to_visualize else np.zeros(len(selected_terms), dtype=bool)
+    else:
+        plt.scatter(selected_points[:, 0], selected_points[:, 1], alpha=0.7)
+        label_mask = np.ones(len(selected_terms), dtype=bool)
 
-    # Add labels to each point
-    for i, label in enumerate(labels):
-        plt.annotate(label, (X_reduced[i, 0], X_reduced[i, 1]), textcoords="offset points", xytext=(0,10), ha='center')
+    # Label a bounded subset of points so the figure stays responsive
+    label_indices = np.flatnonzero(label_mask)[:MAX_LABELS]
+    if len(label_indices) and len(selected_points) > LARGE_N_THRESHOLD:
+        plt.scatter(selected_points[label_indices, 0], selected_points[label_indices, 1], c='red', s=12)
+    for i in label_indices:
+        plt.annotate(selected_terms[i], (selected_points[i, 0], selected_points[i, 1]), textcoords="offset points", xytext=(0,10), ha='center')
 
     plt.title('2D Visualization of Financial Term Embeddings (via PCA)')
     plt.xlabel('Principal Component 1')
@@ -60,4 +121,4 @@ if __name__ == "__main__":
     kb_path = os.path.join(os.path.dirname(__file__), 'knowledge_base.json')
     # Specify the terms you want to see on the map
     terms = ["Start Date", "Construction Duration", "Tax Rate"]
-    visualize_embeddings(kb_path, terms)
\ No newline at end of file
+    visualize_embeddings(kb_path, terms)
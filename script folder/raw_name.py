@@ -1,32 +1,29 @@
+import argparse
 import json
+import os
+import sys
 
-# Specify the input and output file paths
-input_file_path = r'D:\python projects\playground_reg\debug_20250819_225527_529016.json'
-output_file_path = r'D:\python projects\playground_reg\raw_name_results.json'
+# The extraction engine lives in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from extraction import scan_workbook, RowNameExtractor
+from xlsx_reader import load_workbook_source
 
-# Load the JSON file with UTF-8 encoding
-with open(input_file_path, 'r', encoding='utf-8') as file:
-    data = json.load(file)
+# Specify the input and output file paths
+parser = argparse.ArgumentParser(description="Collect the row titles in column B of every sheet.")
+parser.add_argument("input", nargs="?", default=os.path.join(PROJECT_ROOT, "jsonformatter.JSON"),
+                    help="Workbook export JSON or .xlsx file")
+parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "raw_name_results.json"))
+args = parser.parse_args()
+output_file_path = args.output
 
-# Initialize a dictionary to store raw names by sheet
-raw_names_by_sheet = {}
+# Load the workbook export (an .xlsx is streamed, one sheet at a time)
+data = load_workbook_source(args.input, streaming=True)
 
-# Iterate through each worksheet
-for worksheet in data['worksheets']:
-    sheet_name = worksheet['name']
-    raw_names = []
-    
-    # Iterate through cells in the worksheet
-    for cell_key, cell_data in worksheet['cells'].items():
-        # Check if the cell is in columnIndex: 1
-        if cell_data.get('columnIndex') == 1:
-            # Check if formulaR1C1 exists, is a string, and is not a formula
-            if 'formulaR1C1' in cell_data and isinstance(cell_data['formulaR1C1'], str) and not cell_data['formulaR1C1'].startswith('='):
-                raw_names.append(cell_data['formulaR1C1'])
-    
-    # Store the raw names for this sheet (only if non-empty to avoid clutter)
-    if raw_names:
-        raw_names_by_sheet[sheet_name] = raw_names
+# Collect the non-formula titles in column B (index 1) in a single pass over the cells
+raw_names_by_sheet = scan_workbook(data, [RowNameExtractor(column=1)])["row_names"]
 
 # Save the results to a new JSON file
 with open(output_file_path, 'w', encoding='utf-8') as file:
@@ -1,15 +1,27 @@
+import argparse
 import json
+import os
+import sys
 
-# Specify the input and output file paths
-input_file_path = r'D:\python projects\playground_reg\debug_20250819_225527_529016.json'
-output_file_path = r'D:\python projects\playground_reg\sheet_name_results.json'
+# The extraction engine lives in the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
-# Load the JSON file with UTF-8 encoding
-with open(input_file_path, 'r', encoding='utf-8') as file:
-    data = json.load(file)
+from extraction import scan_workbook, SheetListExtractor
+from xlsx_reader import load_workbook_source
+
+parser = argparse.ArgumentParser(description="Write a sheet name -> description template for a workbook.")
+parser.add_argument("input", nargs="?", default=os.path.join(PROJECT_ROOT, "jsonformatter.JSON"),
+                    help="Workbook export JSON or .xlsx file")
+parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "sheet_name_results.json"))
+args = parser.parse_args()
+
+# Load the workbook export (an .xlsx is streamed, one sheet at a time)
+data = load_workbook_source(args.input, streaming=True)
 
 # Extract the sheet names
-sheet_names = [worksheet['name'] for worksheet in data['worksheets']]
+sheet_names = scan_workbook(data, [SheetListExtractor()])["sheets"]
 
 # Create a dictionary for descriptions with sheet names as keys
 descriptions = {sheet_name: "Add" for sheet_name in sheet_names}
@@ -19,7 +31,7 @@ if sheet_names:  # Ensure there is at least one sheet
     descriptions[sheet_names[0]] = "xxxx"
 
 # Save the descriptions dictionary directly to the JSON file
-with open(output_file_path, 'w', encoding='utf-8') as file:
+with open(args.output, 'w', encoding='utf-8') as file:
     json.dump(descriptions, file, indent=4)
 
-print(f"Descriptions have been saved to {output_file_path}")
\ No newline at end of file
+print(f"Descriptions have been saved to {args.output}")
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import random
+
+from formula_engine import col_num_to_letter
+
+# Formatting used by the real export: table headers are white on blue
+HEADER_FORMAT = {
+    "font": {"name": "Arial", "size": 9, "bold": True, "italic": False, "underline": "Single", "color": "#FFFFFF"},
+    "numberFormat": "General",
+    "backgroundColor": "#3366FF",
+}
+BODY_FORMAT = {
+    "font": {"name": "Calibri", "size": 11, "bold": False, "italic": False, "underline": "None", "color": "#000000"},
+    "numberFormat": "#,##0_);[Red](#,##0)",
+    "backgroundColor": "#FFFFFF",
+}
+
+NAME_COLUMN = 1      # column B
+UNIT_COLUMN = 2      # column C
+TOTAL_COLUMN = 3     # column D
+TIMELINE_COLUMN = 5  # column F, where the real model's timelines start
+UNITS = ["k£", "%", "veh/year", "years", "£/veh", "x"]
+
+def estimate_cells(sheets, tables_per_sheet, rows_per_table, timeline_columns, **_):
+    """Number of cells generate_workbook produces for a configuration, without generating it."""
+    per_row = timeline_columns + 3
+    return sheets * (timeline_columns + 1 + tables_per_sheet * (1 + rows_per_table * per_row))
+
+def _cell(sheet, r, c, value, fmt=BODY_FORMAT):
+    address = f"{sheet}!{col_num_to_letter(c + 1)}{r + 1}"
+    return address, {"formulaR1C1": value, "address": address, "rowIndex": r, "columnIndex": c, "format": fmt}
+
+def _row_formula(rng, r, table_rows, earlier_rows, cross_sheet_fanout):
+    """
+    Builds the R1C1 formula copied across one row's timeline. It reads one to
+    three earlier rows of the same table (relative refs) and up to
+    cross_sheet_fanout rows on earlier sheets (absolute row, same column), so
+    the model stays acyclic.
+    """
+    terms = [f"R[{prev - r}]C" for prev in rng.sample(table_rows, min(len(table_rows), rng.randint(1, 3)))]
+    for _ in range(rng.randint(0, cross_sheet_fanout) if earlier_rows else 0):
+        other_sheet, other_row = rng.choice(earlier_rows)
+        terms.append(f"{other_sheet}!R{other_row + 1}C")
+    operators = ["+", "-", "*"]
+    formula = terms[0]
+    for term in terms[1:]:
+        formula += rng.choice(operators) + term
+    if rng.random() < 0.3:
+        formula = f"SUM(R[{table_rows[0] - r}]C:R[-1]C)+{formula}"
+    return "=" + formula
+
+def generate_workbook(sheets=10, tables_per_sheet=4, rows_per_table=12, timeline_columns=40,
+                      formula_density=0.8, cross_sheet_fanout=2, seed=0):
+    """
+    Generates a synthetic workbook export in the same worksheets[].cells schema
+    as jsonformatter.JSON.
+
+    Every sheet starts with a timeline header row, followed by tables whose
+    header cell in column B is white on blue. Each table row has a name in B,
+    a unit in C, a total in D, and either constant inputs or one formula copied
+    across the timeline (columns F onwards), like a real project finance model.
+
+    Args:
+        sheets (int): Number of worksheets.
+        tables_per_sheet (int): Tables per worksheet.
+        rows_per_table (int): Named rows per table.
+        timeline_columns (int): Width of each row's timeline.
+        formula_density (float): Share of rows that are formulas rather than inputs.
+        cross_sheet_fanout (int): Maximum references from a formula row to earlier sheets.
+        seed (int): Random seed, so a configuration always produces the same workbook.
+
+    Returns:
+        dict: {"worksheets": [{"name", "cells"}], "params": {...}}.
+    """
+    rng = random.Random(seed)
+    sheet_names = [f"sheet_{i + 1}" for i in range(sheets)]
+    last_column = TIMELINE_COLUMN + timeline_columns - 1
+    earlier_rows = []  # (sheet, row) of every data row on previous sheets
+    worksheets = []
+
+    for s, sheet in enumerate(sheet_names):
+        cells = {}
+
+        def put(r, c, value, fmt=BODY_FORMAT):
+            address, cell = _cell(sheet, r, c, value, fmt)
+            cells[address] = cell
+
+        # Timeline header on row 2: years on the first sheet, linked everywhere else
+        put(1, NAME_COLUMN, "Year", HEADER_FORMAT)
+        for c in range(TIMELINE_COLUMN, last_column + 1):
+            if s == 0:
+                value = 2025 if c == TIMELINE_COLUMN else "=RC[-1]+1"
+            else:
+                value = f"=+{sheet_names[0]}!RC"
+            put(1, c, value, HEADER_FORMAT)
+
+        sheet_rows = []
+        r = 3
+        for t in range(tables_per_sheet):
+            put(r, NAME_COLUMN, f"TABLE {s + 1}.{t + 1}", HEADER_FORMAT)
+            r += 1
+            table_rows = []
+            for i in range(rows_per_table):
+                put(r, NAME_COLUMN, f"Item {s + 1}.{t + 1}.{i + 1}")
+                put(r, UNIT_COLUMN, rng.choice(UNITS))
+                put(r, TOTAL_COLUMN, f"=SUM(RC[{TIMELINE_COLUMN - TOTAL_COLUMN}]:RC[{last_column - TOTAL_COLUMN}])")
+                if table_rows and rng.random() < formula_density:
+                    formula = _row_formula(rng, r, table_rows, earlier_rows, cross_sheet_fanout)
+                    for c in range(TIMELINE_COLUMN, last_column + 1):
+                        put(r, c, formula)
+                else:
+                    base = rng.uniform(1, 1000)
+                    for c in range(TIMELINE_COLUMN, last_column + 1):
+                        put(r, c, round(base * (1 + 0.02 * (c - TIMELINE_COLUMN)), 4))
+                table_rows.append(r)
+                sheet_rows.append((sheet, r))
+                r += 1
+            r += 1  # blank row between tables
+
+        worksheets.append({"name": sheet, "cells": cells})
+        earlier_rows.extend(sheet_rows)
+
+    params = {"sheets": sheets, "tables_per_sheet": tables_per_sheet, "rows_per_table": rows_per_table,
+              "timeline_columns": timeline_columns, "formula_density": formula_density,
+              "cross_sheet_fanout": cross_sheet_fanout, "seed": seed}
+    return {"worksheets": worksheets, "params": params}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic workbook export for benchmarking.")
+    parser.add_argument("output", help="Where to write the export JSON")
+    parser.add_argument("--sheets", type=int, default=10)
+    parser.add_argument("--tables-per-sheet", type=int, default=4)
+    parser.add_argument("--rows-per-table", type=int, default=12)
+    parser.add_argument("--timeline-columns", type=int, default=40)
+    parser.add_argument("--formula-density", type=float, default=0.8)
+    parser.add_argument("--cross-sheet-fanout", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = generate_workbook(args.sheets, args.tables_per_sheet, args.rows_per_table, args.timeline_columns,
+                             args.formula_density, args.cross_sheet_fanout, args.seed)
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump(data, f)
+    total = sum(len(ws["cells"]) for ws in data["worksheets"])
+    print(f"✅ Wrote {total:,} cells across {len(data['worksheets'])} sheets to {os.path.abspath(args.output)}")
+
+if __name__ == "__main__":
+    main()
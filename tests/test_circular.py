@@ -0,0 +1,51 @@
+import pytest
+
+import formula_engine as fe
+
+def balance_loop(periods, rate=0.05):
+    """closing = previous closing + interest + 10 and interest = rate * closing, in every period."""
+    cells = {}
+
+    def put(r, c, value):
+        address = f"d!{fe.col_num_to_letter(c + 1)}{r + 1}"
+        cells[address] = {"formulaR1C1": value, "address": address, "rowIndex": r, "columnIndex": c}
+
+    put(0, 0, rate)
+    put(1, 1, 0.0)
+    for c in range(2, 2 + periods):
+        put(1, c, "=RC[-1]+R[1]C+10")
+        put(2, c, "=R1C1*R[-1]C")
+    return {"worksheets": [{"name": "d", "cells": cells}]}
+
+def exact_closing(periods, rate=0.05):
+    closing = 0.0
+    for _ in range(periods):
+        closing = (closing + 10) / (1 - rate)
+    return closing
+
+@pytest.mark.parametrize("periods", [5, 50, 200])
+def test_balance_carried_through_a_cycle_converges_for_long_horizons(periods):
+    plan = fe.compile_workbook(balance_loop(periods))
+    iteration = {}
+    grids = fe.evaluate(plan, iteration=iteration)
+
+    assert iteration["report"]
+    assert all(result["converged"] for result in iteration["report"])
+    # Each period is settled before the next one reads it, so the work per
+    # period does not grow with the horizon
+    assert max(result["iterations"] for result in iteration["report"]) < 20
+    assert grids["d"][1, 1 + periods] == pytest.approx(exact_closing(periods), rel=1e-6)
+
+def test_independent_period_cycles_are_solved_as_one_vector():
+    cells = {}
+    for c in range(5, 45):
+        for r, value in ((0, 100.0), (1, "=R[-1]C+R[1]C"), (2, "=0.02*R[-1]C")):
+            address = f"d!{fe.col_num_to_letter(c + 1)}{r + 1}"
+            cells[address] = {"formulaR1C1": value, "address": address, "rowIndex": r, "columnIndex": c}
+    plan = fe.compile_workbook({"worksheets": [{"name": "d", "cells": cells}]})
+    iteration = {}
+    grids = fe.evaluate(plan, iteration=iteration)
+
+    assert len(plan["circular"]) == 1
+    assert iteration["report"][0]["converged"]
+    assert grids["d"][1, 5:45] == pytest.approx(100 / 0.98)
@@ -0,0 +1,21 @@
+import pytest
+
+import formula_engine as fe
+
+def evaluate_formula(formula):
+    """Evaluates one formula in cell A1 of a one-sheet workbook."""
+    cell = {"formulaR1C1": formula, "address": "d!A1", "rowIndex": 0, "columnIndex": 0}
+    plan = fe.compile_workbook({"worksheets": [{"name": "d", "cells": {"d!A1": cell}}]})
+    return fe.get_value(fe.evaluate(plan), "d", "A1")
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=ROUND(1.005,2)", 1.01),
+    ("=ROUND(-1.005,2)", -1.01),
+    ("=ROUND(2.5,0)", 3.0),
+    ("=ROUND(-2.5,0)", -3.0),
+    ("=ROUND(1.2345,3)", 1.235),
+    ("=ROUND(1.2344,3)", 1.234),
+    ("=ROUND(1250,-2)", 1300.0),
+])
+def test_round_matches_excel_decimal_rounding(formula, expected):
+    assert evaluate_formula(formula) == pytest.approx(expected, abs=1e-12)
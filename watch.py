@@ -0,0 +1,153 @@
+import argparse
+import os
+import threading
+import time
+import traceback
+
+import pipeline
+import profiling
+
+# How often the export files are checked, and how long a file must stay
+# unchanged before it is processed (exports are written in bursts)
+POLL_SECONDS = 0.5
+DEBOUNCE_SECONDS = 2.0
+
+def file_signature(path):
+    """(mtime, size) of a file, or None while it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ExportWatcher:
+    """
+    Watches workbook exports and reruns the pipeline when one settles after a
+    change.
+
+    Files are polled every POLL_SECONDS; a change is only acted on once the
+    file has kept the same mtime and size for DEBOUNCE_SECONDS, so a burst of
+    writes from one export triggers one run. Runs happen on a background
+    thread, one at a time; changes seen during a run are queued and
+    processed after it. The pipeline itself skips stages whose inputs did
+    not change and only rescans changed sheets, and every artifact it writes
+    is replaced atomically, so readers never see a half-written file.
+    """
+
+    def __init__(self, targets, force=(), poll_seconds=POLL_SECONDS, debounce_seconds=DEBOUNCE_SECONDS):
+        """
+        Args:
+            targets (dict): export path -> pipeline output directory.
+            force (iterable): Stage names to rerun on every change.
+        """
+        self.targets = targets
+        self.force = set(force)
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self._processed = {path: None for path in targets}  # signature the outputs were built from
+        self._seen = {}                                      # path -> (signature, first seen at)
+        self._queue = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._work, name="pipeline-worker", daemon=True)
+
+    def start(self, initial_run=True):
+        """Starts the worker; with initial_run, every export is processed once up front."""
+        self._worker.start()
+        for path in self.targets:
+            signature = file_signature(path)
+            if initial_run and signature is not None:
+                self._enqueue(path, signature)
+            else:
+                self._processed[path] = signature
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._worker.join()
+
+    def poll(self):
+        """Checks every export once and queues the ones that have settled since their last change."""
+        now = time.monotonic()
+        for path in self.targets:
+            signature = file_signature(path)
+            if signature is None or signature == self._processed[path]:
+                self._seen.pop(path, None)
+                continue
+            seen = self._seen.get(path)
+            if seen is None or seen[0] != signature:
+                # New or still being written: restart the debounce window
+                self._seen[path] = (signature, now)
+            elif now - seen[1] >= self.debounce_seconds:
+                del self._seen[path]
+                self._enqueue(path, signature)
+
+    def run_forever(self):
+        try:
+            while True:
+                self.poll()
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        finally:
+            self.stop()
+
+    def _enqueue(self, path, signature):
+        self._processed[path] = signature
+        with self._wakeup:
+            if path not in self._queue:
+                self._queue.append(path)
+            self._wakeup.notify()
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                while not self._queue and not self._stopping:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+                path = self._queue.pop(0)
+            self._process(path)
+
+    def _process(self, path):
+        print(f"\n[{time.strftime('%H:%M:%S')}] {os.path.basename(path)} changed; updating {self.targets[path]}")
+        try:
+            report = pipeline.run_pipeline(path, self.targets[path], self.force)
+        except Exception:
+            # Usually an export caught mid-write or an API failure; the next
+            # change to the file triggers another attempt
+            traceback.print_exc()
+            return
+        ran = [record["stage"] for record in report if record["status"] == "ran"]
+        seconds = sum(record["seconds"] for record in report)
+        print(f"[{time.strftime('%H:%M:%S')}] Done in {seconds:.1f}s; reran: {', '.join(ran) or 'nothing'}")
+
+def output_targets(exports, output_dir):
+    """One export writes straight to output_dir; several get output_dir/<export name> each."""
+    exports = [os.path.abspath(path) for path in exports]
+    if len(exports) == 1:
+        return {exports[0]: os.path.abspath(output_dir)}
+    return {path: os.path.join(os.path.abspath(output_dir), os.path.splitext(os.path.basename(path))[0])
+            for path in exports}
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch workbook exports and rerun the pipeline when they change.")
+    parser.add_argument("exports", nargs="*", default=[os.path.join(pipeline.PROJECT_ROOT, "jsonformatter.JSON")],
+                        help="Workbook export JSON or .xlsx files (default: jsonformatter.JSON)")
+    parser.add_argument("--output-dir", default=pipeline.PROJECT_ROOT, help="Where to write the pipeline outputs")
+    parser.add_argument("--force", nargs="*", default=[], choices=[s["name"] for s in pipeline.STAGES],
+                        help="Stages to rerun on every change")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is processed")
+    parser.add_argument("--no-initial-run", action="store_true", help="Only process exports once they change")
+    args = parser.parse_args()
+
+    profiling.reset()
+    watcher = ExportWatcher(output_targets(args.exports, args.output_dir), args.force, debounce_seconds=args.debounce)
+    watcher.start(initial_run=not args.no_initial_run)
+    print(f"Watching {len(watcher.targets)} export(s); press Ctrl+C to stop.")
+    watcher.run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import colorsys
+import datetime
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+# Colours the export reports for cells without an explicit font colour or fill
+DEFAULT_FONT_COLOR = "#000000"
+DEFAULT_BACKGROUND = "#FFFFFF"
+
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+
+# Theme colour index -> name in the theme's colour scheme. Excel swaps the
+# first two pairs: index 0 is lt1 (background 1) and 1 is dk1 (text 1).
+THEME_COLOR_ORDER = ["lt1", "dk1", "lt2", "dk2", "accent1", "accent2", "accent3",
+                     "accent4", "accent5", "accent6", "hlink", "folHlink"]
+DRAWINGML_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+# One side of an A1 reference: a cell, a whole column or a whole row
+CELL_PATTERN = re.compile(r"^(\$?)([A-Za-z]{1,3})(\$?)(\d+)$")
+COLUMN_PATTERN = re.compile(r"^(\$?)([A-Za-z]{1,3})$")
+ROW_PATTERN = re.compile(r"^(\$?)(\d+)$")
+# Sheet names the export leaves unquoted in addresses; others are wrapped in quotes
+PLAIN_SHEET_PATTERN = re.compile(r"^[A-Za-z_][\w\.]*$")
+
+def _column_index(letters):
+    col = 0
+    for char in letters.upper():
+        col = col * 26 + (ord(char) - ord('A') + 1)
+    return col
+
+def sheet_prefix(name):
+    """'cash flow' -> "'cash flow'!", debt -> 'debt!', as in the export's addresses."""
+    if PLAIN_SHEET_PATTERN.match(name):
+        return f"{name}!"
+    return "'" + name.replace("'", "''") + "'!"
+
+def _r1c1_part(prefix, absolute, value, base):
+    """One axis of an R1C1 reference: R5 (absolute), R[-2] (relative) or R (same row)."""
+    if absolute:
+        return f"{prefix}{value}"
+    return f"{prefix}[{value - base}]" if value != base else prefix
+
+def _a1_side_to_r1c1(side, row, col):
+    """Converts 'B$7', 'C' or '12' to R1C1 for a formula in (row, col), both 1-based; None if it isn't a reference."""
+    match = CELL_PATTERN.match(side)
+    if match:
+        col_abs, letters, row_abs, digits = match.groups()
+        return (_r1c1_part("R", row_abs, int(digits), row) +
+                _r1c1_part("C", col_abs, _column_index(letters), col))
+    match = COLUMN_PATTERN.match(side)
+    if match:
+        return _r1c1_part("C", match.group(1), _column_index(match.group(2)), col)
+    match = ROW_PATTERN.match(side)
+    if match:
+        return _r1c1_part("R", match.group(1), int(match.group(2)), row)
+    return None
+
+def a1_reference_to_r1c1(reference, row, col):
+    """
+    Converts one A1 range operand ('p and l'!$D$3, F8:O8, A:A) to R1C1, or
+    returns it unchanged when it isn't a cell reference (defined names, etc.).
+    """
+    # Each side can carry its own sheet (Sheet1!A1:Sheet1!B2); sheet names can't contain ':'
+    sides = []
+    for side in reference.split(":"):
+        sheet, bang, address = side.rpartition("!")
+        converted = _a1_side_to_r1c1(address, row, col)
+        if converted is None:
+            return reference
+        sides.append(f"{sheet}{bang}{converted}")
+    return ":".join(sides)
+
+def a1_formula_to_r1c1(formula, row, col):
+    """
+    Rewrites an A1 formula, as stored in the .xlsx, in the R1C1 notation of the
+    JSON export. row and col are the formula cell's 1-based position.
+    """
+    from openpyxl.formula.tokenizer import Tokenizer, Token
+
+    tokenizer = Tokenizer(formula)
+    for token in tokenizer.items:
+        if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+            token.value = a1_reference_to_r1c1(token.value, row, col)
+        elif token.type == Token.FUNC and token.subtype == Token.OPEN:
+            # Newer functions are stored with a compatibility prefix
+            token.value = token.value.replace("_xlfn.", "").replace("_xlws.", "")
+    return tokenizer.render()
+
+def load_theme_colors(workbook):
+    """Reads the workbook theme's colour scheme as a list in theme index order."""
+    if not getattr(workbook, "loaded_theme", None):
+        return []
+    root = ET.fromstring(workbook.loaded_theme)
+    scheme = root.find(f".//{DRAWINGML_NS}clrScheme")
+    if scheme is None:
+        return []
+    by_name = {}
+    for element in scheme:
+        name = element.tag.replace(DRAWINGML_NS, "")
+        for color in element:
+            value = color.get("val") if color.tag.endswith("srgbClr") else color.get("lastClr")
+            if value:
+                by_name[name] = value.upper()
+    return [by_name.get(name) for name in THEME_COLOR_ORDER]
+
+def _apply_tint(rgb, tint):
+    """Lightens (tint > 0) or darkens (tint < 0) a colour the way Excel applies theme tints."""
+    r, g, b = (int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+    l = l * (1 + tint) if tint < 0 else l * (1 - tint) + tint
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+    return "".join(f"{round(v * 255):02X}" for v in (r, g, b))
+
+def resolve_color(color, theme_colors, default):
+    """Turns an openpyxl Color (rgb, theme + tint or indexed) into '#RRGGBB'."""
+    from openpyxl.styles.colors import COLOR_INDEX
+
+    if color is None:
+        return default
+    rgb = None
+    if color.type == "rgb" and isinstance(color.rgb, str):
+        rgb = color.rgb[-6:]
+    elif color.type == "theme" and color.theme is not None and color.theme < len(theme_colors):
+        rgb = theme_colors[color.theme]
+    elif color.type == "indexed" and color.indexed is not None and color.indexed < len(COLOR_INDEX):
+        rgb = COLOR_INDEX[color.indexed][-6:]
+    if not rgb:
+        return default
+    if color.tint:
+        rgb = _apply_tint(rgb, color.tint)
+    return f"#{rgb.upper()}"
+
+def _cell_format(cell, theme_colors):
+    font, fill = cell.font, cell.fill
+    background = DEFAULT_BACKGROUND
+    if getattr(fill, "patternType", None) == "solid":
+        background = resolve_color(fill.fgColor, theme_colors, DEFAULT_BACKGROUND)
+    return {
+        "font": {
+            "name": font.name,
+            "size": int(font.sz) if font.sz is not None and font.sz == int(font.sz) else font.sz,
+            "bold": bool(font.b),
+            "italic": bool(font.i),
+            "underline": (font.u or "none").capitalize(),
+            "color": resolve_color(font.color, theme_colors, DEFAULT_FONT_COLOR),
+        },
+        "numberFormat": cell.number_format,
+        "backgroundColor": background,
+    }
+
+def _cell_value(cell):
+    """The cell's value as the export reports it: formulas in R1C1, dates as serial numbers."""
+    from openpyxl.utils.datetime import to_excel
+    from openpyxl.worksheet.formula import ArrayFormula
+
+    value = cell.value
+    if isinstance(value, ArrayFormula):
+        value = value.text
+    if isinstance(value, str) and value.startswith("="):
+        return a1_formula_to_r1c1(value, cell.row, cell.column)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return to_excel(value)
+    return value
+
+def iter_worksheets(path, sheets=None):
+    """
+    Streams an .xlsx file one worksheet at a time, in read-only mode, yielding
+    {"name", "cells"} dicts in the JSON export's format. Only one sheet's
+    cells are held in memory at once.
+
+    Args:
+        path (str): The .xlsx/.xlsm file.
+        sheets (iterable): Optional sheet names to read; all sheets by default.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = load_workbook(path, read_only=True, data_only=False)
+    try:
+        theme_colors = load_theme_colors(workbook)
+        format_cache = {}  # style ids -> format dict; most cells share a handful of styles
+        for ws in workbook.worksheets:
+            if sheets is not None and ws.title not in sheets:
+                continue
+            prefix = sheet_prefix(ws.title)
+            cells = {}
+            for row in ws.iter_rows():
+                for cell in row:
+                    if cell.value is None:
+                        continue
+                    style = cell.style_array
+                    key = (style.fontId, style.fillId, style.numFmtId)
+                    if key not in format_cache:
+                        format_cache[key] = _cell_format(cell, theme_colors)
+                    address = f"{prefix}{get_column_letter(cell.column)}{cell.row}"
+                    cells[address] = {
+                        "formulaR1C1": _cell_value(cell),
+                        "address": address,
+                        "rowIndex": cell.row - 1,
+                        "columnIndex": cell.column - 1,
+                        "format": format_cache[key],
+                    }
+            yield {"name": ws.title, "cells": cells}
+    finally:
+        workbook.close()
+
+def read_xlsx(path, sheets=None):
+    """Reads a whole .xlsx file into the JSON export's {"worksheets": [...]} layout."""
+    return {"worksheets": list(iter_worksheets(path, sheets)), "params": {}}
+
+def is_xlsx(path):
+    return path.lower().endswith(XLSX_EXTENSIONS)
+
+def load_workbook_source(path, streaming=False):
+    """
+    Loads a workbook from either a JSON export or an .xlsx file.
+
+    Args:
+        path (str): A JSON export or an .xlsx/.xlsm workbook.
+        streaming (bool): For .xlsx, return {"worksheets": <generator>} so
+            single-pass consumers (extraction.scan_workbook) never hold more
+            than one sheet. The worksheets can then only be iterated once.
+    """
+    if is_xlsx(path):
+        if streaming:
+            return {"worksheets": iter_worksheets(path), "params": {}}
+        return read_xlsx(path)
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Read an .xlsx workbook into the JSON export format.")
+    parser.add_argument("workbook", help="The .xlsx/.xlsm file")
+    parser.add_argument("--output", help="Where to write the JSON (default: next to the workbook)")
+    parser.add_argument("--sheets", nargs="*", help="Only read these sheets")
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.splitext(args.workbook)[0] + ".json"
+    data = read_xlsx(args.workbook, set(args.sheets) if args.sheets else None)
+    with open(output_path, "w", encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    total = sum(len(ws["cells"]) for ws in data["worksheets"])
+    print(f"✅ {total:,} cells from {len(data['worksheets'])} sheets saved to {output_path}")
+
+if __name__ == "__main__":
+    main()